@@ -0,0 +1,112 @@
+"""
+Low-stock alerts for staff, coalesced into digests.
+
+Medicine.save() calls stock_written() with the stock it loaded from the
+database, so spotting a threshold crossing is one comparison on values
+already in memory: no query and no polling of the catalog. Only a write
+that takes stock from above the medicine's threshold to at or below it
+raises an alert; further sales below the threshold do not.
+
+Alerts go into a Coalescer, which sends the first one straight away and
+then at most one digest per LOW_STOCK_ALERT_SECONDS, holding the latest
+alert per medicine. A medicine restocked before the digest goes out is
+dropped from it. Digests are sent by SMS to LOW_STOCK_ALERT_PHONE from a
+timer thread, never on the request path. Each worker process has its own
+buffer.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class Coalescer:
+    """
+    Buffers alerts by key and hands them to ``send`` as one list, at most
+    once per ``window`` seconds.
+
+    ``schedule(delay, func)`` arranges for func to run after delay seconds;
+    by default on a daemon threading.Timer.
+    """
+
+    def __init__(self, window, send, clock=time.monotonic, schedule=None):
+        self.window = window
+        self.send = send
+        self.clock = clock
+        self.schedule = schedule or self._start_timer
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._scheduled = False
+        self._last_sent = None
+
+    @staticmethod
+    def _start_timer(delay, func):
+        timer = threading.Timer(delay, func)
+        timer.daemon = True
+        timer.start()
+
+    def add(self, key, alert):
+        with self._lock:
+            self._pending[key] = alert
+            if self._scheduled:
+                return
+            self._scheduled = True
+            delay = 0 if self._last_sent is None else max(0, self._last_sent + self.window - self.clock())
+        self.schedule(delay, self.flush)
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self):
+        with self._lock:
+            alerts, self._pending = list(self._pending.values()), {}
+            self._scheduled = False
+            if not alerts:
+                return
+            self._last_sent = self.clock()
+        try:
+            self.send(alerts)
+        except Exception:
+            logger.exception('Failed to send %d alerts', len(alerts))
+
+
+def low_stock_threshold(medicine):
+    if medicine.low_stock_threshold is not None:
+        return medicine.low_stock_threshold
+    return settings.LOW_STOCK_THRESHOLD
+
+
+def send_low_stock_digest(alerts):
+    """Text one digest of (name, stock, threshold) alerts to LOW_STOCK_ALERT_PHONE."""
+    from .messages import MessageHandler
+
+    lines = [f"{name}: {stock} left (threshold {threshold})" for name, stock, threshold in alerts]
+    text = f"Low stock on {len(alerts)} medicine{'s' if len(alerts) != 1 else ''}:\n" + "\n".join(lines)
+    result = MessageHandler(settings.LOW_STOCK_ALERT_PHONE).send_notification(text)
+    if not result['success']:
+        logger.error('Low stock digest not sent: %s', result['error'])
+
+
+low_stock_alerts = Coalescer(settings.LOW_STOCK_ALERT_SECONDS, send_low_stock_digest)
+
+
+def stock_written(medicine, previous, using=None):
+    """
+    Compare a saved Medicine's stock with ``previous``, the stock it was
+    loaded with, and queue or withdraw an alert once the write commits.
+    """
+    if previous is None or not settings.LOW_STOCK_ALERT_PHONE:
+        return
+    threshold = low_stock_threshold(medicine)
+    current = medicine.stock_quantity
+    if previous > threshold >= current:
+        alert = (medicine.name, current, threshold)
+        transaction.on_commit(lambda: low_stock_alerts.add(medicine.pk, alert), using=using)
+    elif previous <= threshold < current:
+        transaction.on_commit(lambda: low_stock_alerts.discard(medicine.pk), using=using)
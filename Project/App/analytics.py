@@ -0,0 +1,257 @@
+"""
+Time-bucketed sales analytics backed by rollup tables.
+
+GROUP BY over the raw SaleRecord table gets slower every day, so sales are
+folded into HourlySales and DailySales by roll_up_sales, which only reads
+SaleRecord ids above the 'sales' RollupWatermark and advances it in the same
+transaction as the upsert. Run it from cron or ``rollup_sales --loop``.
+
+sales_series answers from the rollups for everything up to the watermark and
+aggregates only the raw rows above it (a primary key range scan), so closed
+buckets never touch SaleRecord. Weekly buckets are summed from DailySales.
+
+Sequences hand out ids before the inserting transaction commits, so a job
+that rolled up to the current max id could skip a row committed a moment
+later with a lower id. roll_up_sales only goes up to the max id it saw on a
+previous run at least ``settle`` ago.
+
+Closed months of SaleRecord below the watermark are moved out to files by
+App/archive.py. Rollups keep counting them, so sales_series and
+with_total_sold are unaffected; App.archive.load_sales reads the raw rows
+from both places.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Count, F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Trunc, TruncWeek
+from django.utils import timezone
+
+from .models import DailySales, HourlySales, RollupWatermark, SaleRecord
+
+BUCKETS = ('hour', 'day', 'week')
+WATERMARK = 'sales'
+SETTLE = timedelta(seconds=10)
+
+# Largest range one request may ask for, in buckets.
+MAX_BUCKETS = {'hour': 24 * 31, 'day': 2 * 366, 'week': 520}
+
+
+class AnalyticsError(Exception):
+    """Invalid analytics query. The message is user facing."""
+
+
+# ========== Rolling up ==========
+def roll_up_sales(batch_size=50000, settle=SETTLE, now=None):
+    """
+    Fold settled sales above the watermark into the hourly and daily rollups.
+
+    Works through the id range in ``batch_size`` chunks, one transaction
+    each, so a large backlog never holds one long transaction.
+
+    Returns:
+        int: the number of sales rolled up.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        max_id = SaleRecord.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        if not settle:
+            target = max_id
+        elif watermark.pending_seen_at and watermark.pending_seen_at <= now - settle:
+            target = watermark.pending_id
+        else:
+            target = watermark.last_id
+        # An outstanding pending id keeps the time it was first seen, so
+        # settling is measured from the first sighting and continuous sales
+        # cannot keep pushing it back. A new max id is only taken once the
+        # previous one has been rolled up.
+        if max_id != watermark.pending_id and watermark.pending_id <= target:
+            watermark.pending_id, watermark.pending_seen_at = max_id, now
+            watermark.save(update_fields=['pending_id', 'pending_seen_at', 'updated_at'])
+
+    rolled = 0
+    while True:
+        with transaction.atomic():
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+            low = watermark.last_id
+            if target <= low:
+                break
+            # Skip straight over gaps in the id sequence.
+            next_id = SaleRecord.objects.filter(id__gt=low, id__lte=target).aggregate(next_id=Min('id'))['next_id']
+            high = min(next_id - 1 + batch_size, target) if next_id else target
+            rolled += _fold(low, high) if next_id else 0
+            watermark.last_id = high
+            watermark.save(update_fields=['last_id', 'updated_at'])
+    return rolled
+
+
+def _fold(low, high):
+    """Add SaleRecords with low < id <= high to both rollups and return how many there were."""
+    rows = (
+        SaleRecord.objects.filter(id__gt=low, id__lte=high)
+        .order_by()
+        .annotate(bucket=Trunc('timestamp', 'hour'))
+        .values_list('medicine_id', 'bucket')
+        .annotate(quantity=Sum('quantity_sold'), sales=Count('id'))
+    )
+    hourly = {}
+    daily = {}
+    for medicine_id, hour, quantity, sales in rows:
+        hourly[medicine_id, hour] = (quantity, sales)
+        day_key = (medicine_id, timezone.localtime(hour).date())
+        day_quantity, day_sales = daily.get(day_key, (0, 0))
+        daily[day_key] = (day_quantity + quantity, day_sales + sales)
+    _add(HourlySales, 'hour', hourly)
+    _add(DailySales, 'day', daily)
+    return sum(sales for _, sales in hourly.values())
+
+
+def _add(model, bucket_field, totals):
+    """Upsert that adds to existing counters; bulk_create can only overwrite them."""
+    if not totals:
+        return
+    meta = model._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    medicine = quote(meta.get_field('medicine').column)
+    bucket = meta.get_field(bucket_field)
+    sql = (
+        f'INSERT INTO {table} ({medicine}, {quote(bucket.column)}, quantity, sales) '
+        f'VALUES (%s, %s, %s, %s) '
+        f'ON CONFLICT ({medicine}, {quote(bucket.column)}) DO UPDATE SET '
+        f'quantity = {table}.quantity + EXCLUDED.quantity, sales = {table}.sales + EXCLUDED.sales'
+    )
+    params = [
+        (medicine_id, bucket.get_db_prep_value(key, connection), quantity, sales)
+        for (medicine_id, key), (quantity, sales) in totals.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+# ========== Querying ==========
+def bucket_range(bucket, start, end):
+    """
+    Widen [start, end] to whole buckets.
+
+    Returns (first, last) bucket keys, inclusive: aware datetimes for hours,
+    dates for days and weeks (weeks start on Monday).
+    """
+    if bucket == 'hour':
+        first = timezone.localtime(start).replace(minute=0, second=0, microsecond=0)
+        last = timezone.localtime(end).replace(minute=0, second=0, microsecond=0)
+        count = (last - first) // timedelta(hours=1) + 1
+    else:
+        first, last = timezone.localdate(start), timezone.localdate(end)
+        if bucket == 'week':
+            first -= timedelta(days=first.weekday())
+            last -= timedelta(days=last.weekday())
+        count = (last - first).days // (7 if bucket == 'week' else 1) + 1
+    if count > MAX_BUCKETS[bucket]:
+        raise AnalyticsError(f'At most {MAX_BUCKETS[bucket]} {bucket} buckets per request')
+    return first, last
+
+
+def _range_end(bucket, last):
+    """First moment after the ``last`` bucket."""
+    if bucket == 'hour':
+        return last + timedelta(hours=1)
+    days = 7 if bucket == 'week' else 1
+    return timezone.make_aware(datetime.combine(last + timedelta(days=days), time.min))
+
+
+def _rollup_rows(bucket, first, last, medicine_ids):
+    if bucket == 'hour':
+        rows = HourlySales.objects.filter(hour__gte=first, hour__lte=last).annotate(bucket=F('hour'))
+    else:
+        rows = DailySales.objects.filter(day__gte=first, day__lte=last)
+        rows = rows.annotate(bucket=TruncWeek('day') if bucket == 'week' else F('day'))
+    if medicine_ids:
+        rows = rows.filter(medicine_id__in=medicine_ids)
+    return rows.order_by().values_list('bucket', 'medicine_id', 'medicine__name').annotate(
+        total_quantity=Sum('quantity'), total_sales=Sum('sales'),
+    )
+
+
+def _tail_rows(bucket, first, last, medicine_ids, watermark):
+    start = first if bucket == 'hour' else timezone.make_aware(datetime.combine(first, time.min))
+    rows = SaleRecord.objects.filter(
+        id__gt=watermark, timestamp__gte=start, timestamp__lt=_range_end(bucket, last),
+    )
+    if medicine_ids:
+        rows = rows.filter(medicine_id__in=medicine_ids)
+    return rows.order_by().annotate(bucket=Trunc('timestamp', bucket)).values_list(
+        'bucket', 'medicine_id', 'medicine__name',
+    ).annotate(total_quantity=Sum('quantity_sold'), total_sales=Count('id'))
+
+
+def _bucket_key(bucket, value):
+    if bucket == 'hour':
+        return timezone.localtime(value)
+    return timezone.localtime(value).date() if isinstance(value, datetime) else value
+
+
+def sales_series(bucket, start, end, medicine_ids=None):
+    """
+    Sales per medicine per bucket for every bucket overlapping [start, end].
+
+    Returns:
+        dict: { 'watermark': int, 'results': [{bucket, medicine, medicine_name,
+        quantity, sales}, ...] } ordered by bucket, then medicine.
+    """
+    if bucket not in BUCKETS:
+        raise AnalyticsError(f'bucket must be one of {", ".join(BUCKETS)}')
+    first, last = bucket_range(bucket, start, end)
+
+    # The watermark and rollups are read in separate statements; if the
+    # rollup job moved in between, the tail would double count, so retry.
+    for _ in range(3):
+        watermark = rolled_up_through()
+        rollups = list(_rollup_rows(bucket, first, last, medicine_ids))
+        if rolled_up_through() == watermark:
+            break
+
+    totals = {}
+    for rows in (rollups, _tail_rows(bucket, first, last, medicine_ids, watermark)):
+        for key, medicine_id, name, quantity, sales in rows:
+            entry = totals.setdefault(
+                (_bucket_key(bucket, key), medicine_id),
+                {'medicine_name': name, 'quantity': 0, 'sales': 0},
+            )
+            entry['quantity'] += quantity
+            entry['sales'] += sales
+
+    return {
+        'watermark': watermark,
+        'results': [
+            {'bucket': key, 'medicine': medicine_id, **entry}
+            for (key, medicine_id), entry in sorted(totals.items(), key=lambda item: item[0])
+        ],
+    }
+
+
+def rolled_up_through():
+    """Highest SaleRecord id counted in the rollups."""
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('last_id', flat=True).first() or 0
+
+
+def with_total_sold(medicines):
+    """
+    Annotate ``total_sold`` on a Medicine queryset.
+
+    Counts DailySales up to the watermark plus the raw sales above it, so
+    archived sales still count and the raw table is only read for its tail.
+    """
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).values('last_id')[:1]
+    rolled_up = DailySales.objects.filter(medicine=OuterRef('pk')).order_by().values('medicine').annotate(
+        total=Sum('quantity'),
+    ).values('total')
+    tail = SaleRecord.objects.filter(
+        medicine=OuterRef('pk'), id__gt=Coalesce(Subquery(watermark), Value(0)),
+    ).order_by().values('medicine').annotate(total=Sum('quantity_sold')).values('total')
+    return medicines.annotate(total_sold=(
+        Coalesce(Subquery(rolled_up), Value(0), output_field=BigIntegerField())
+        + Coalesce(Subquery(tail), Value(0), output_field=BigIntegerField())
+    ))
@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class AppConfig(AppConfig):
     name = 'App'
+
+    def ready(self):
+        from .cache_versions import bump_on_save
+        from .changelog import log_delete
+        from .db_pool import register_pool_gauges
+        from .instrumentation import track_transactions
+        from .models import SaleRecord, TrackedModel
+
+        connection_created.connect(track_transactions, dispatch_uid='App.track_transactions')
+        register_pool_gauges()
+        # Per sender: a receiver for every model would stop Django from
+        # fast-deleting untracked rows such as sales.
+        for model in self.get_models():
+            if issubclass(model, TrackedModel):
+                post_delete.connect(log_delete, sender=model, dispatch_uid=f'App.log_delete.{model._meta.label_lower}')
+        # Recent sales on the dashboard are cached by SaleRecord's version.
+        post_save.connect(bump_on_save, sender=SaleRecord, dispatch_uid='App.bump_on_save.salerecord')
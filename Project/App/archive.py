@@ -0,0 +1,263 @@
+"""
+Archival of closed months of SaleRecord into compressed columnar files.
+
+SaleRecord only ever grows. archive_sales moves every month that ended
+before the last settings.SALES_ARCHIVE_KEEP_MONTHS into a NumPy .npz file
+under settings.SALES_ARCHIVE_DIR (one zlib-compressed array per column),
+records it in a SaleArchive row and then deletes the archived rows from the
+table in batches.
+
+Only sales at or below the rollup watermark (App/analytics.py) are
+archived, so every archived sale is already counted in HourlySales and
+DailySales and the analytics totals do not change. Sales above the
+watermark stay in the table until a later run picks them up.
+
+A file is written and recorded before anything is deleted, and deletion
+covers exactly the id range recorded for it, so a run that stops half way
+is finished by the next one. load_sales and iter_sales read archived and
+live sales together.
+"""
+
+import os
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .analytics import rolled_up_through
+from .models import SaleArchive, SaleRecord
+
+COLUMNS = ('id', 'medicine_id', 'quantity_sold', 'timestamp')
+
+
+class ArchiveError(Exception):
+    """An archive file is missing or does not match its SaleArchive row."""
+
+
+# ========== Months ==========
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _month_rows(month):
+    """SaleRecords timestamped in the month starting on the date ``month``."""
+    return SaleRecord.objects.filter(
+        timestamp__gte=_aware(month), timestamp__lt=_aware(_next_month(month)),
+    ).order_by()
+
+
+def archive_cutoff(keep_months, now=None):
+    """First day of the oldest month that stays in the database."""
+    month = _month_start(timezone.localdate(now or timezone.now()))
+    for _ in range(keep_months):
+        month = _month_start(month - timedelta(days=1))
+    return month
+
+
+# ========== Writing ==========
+def _read_columns(queryset):
+    """Columns of the SaleRecords in ``queryset``, ordered by id."""
+    ids, medicine_ids, quantities, timestamps = [], [], [], []
+    rows = queryset.order_by('id').values_list(*COLUMNS)
+    for pk, medicine_id, quantity, timestamp in rows.iterator(chunk_size=20000):
+        ids.append(pk)
+        medicine_ids.append(medicine_id)
+        quantities.append(quantity)
+        timestamps.append(timestamp.astimezone(dt_timezone.utc).replace(tzinfo=None))
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'medicine_id': np.array(medicine_ids, dtype=np.int64),
+        'quantity_sold': np.array(quantities, dtype=np.int64),
+        'timestamp': np.array(timestamps, dtype='datetime64[us]'),
+    }
+
+
+def _path(filename):
+    return os.path.join(settings.SALES_ARCHIVE_DIR, filename)
+
+
+def _write(filename, columns):
+    """Write ``columns`` to ``filename`` so it is either complete or absent."""
+    os.makedirs(settings.SALES_ARCHIVE_DIR, exist_ok=True)
+    path = _path(filename)
+    partial = path + '.partial'
+    with open(partial, 'wb') as handle:
+        np.savez_compressed(handle, **columns)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(partial, path)
+
+
+def _archive_month(month, watermark):
+    """Write the month's not yet archived sales up to ``watermark`` to a new file."""
+    previous_id = SaleArchive.objects.filter(month=month).aggregate(last=Max('through_id'))['last'] or 0
+    if previous_id >= watermark:
+        return None
+    rows = _month_rows(month).filter(id__gt=previous_id, id__lte=watermark)
+    columns = _read_columns(rows)
+    if not len(columns['id']):
+        return None
+
+    # The rows are immutable, but check before anything gets deleted.
+    totals = rows.aggregate(rows=Count('id'), quantity=Sum('quantity_sold'))
+    quantity = int(columns['quantity_sold'].sum())
+    if (totals['rows'], totals['quantity']) != (len(columns['id']), quantity):
+        raise ArchiveError(f'Sales for {month:%Y-%m} changed while being archived')
+
+    filename = f'sales-{month:%Y-%m}-{previous_id}-{watermark}.npz'
+    _write(filename, columns)
+    return SaleArchive.objects.create(
+        month=month, filename=filename, previous_id=previous_id, through_id=watermark,
+        rows=len(columns['id']), quantity=quantity,
+    )
+
+
+def _purge(archive, batch_size):
+    """Delete the archived rows from SaleRecord, ``batch_size`` at a time."""
+    read_archive(archive)  # Never delete rows whose file cannot be read back
+    rows = _month_rows(archive.month).filter(id__gt=archive.previous_id, id__lte=archive.through_id)
+    deleted = 0
+    while True:
+        ids = list(rows.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += rows.filter(id__lte=ids[-1]).delete()[0]
+    archive.purged_at = timezone.now()
+    archive.save(update_fields=['purged_at'])
+    return deleted
+
+
+def archive_sales(keep_months=None, batch_size=10000, now=None):
+    """
+    Archive and delete the sales of every month before the last ``keep_months``.
+
+    Returns:
+        dict: { 'archived': [SaleArchive, ...] written by this run,
+        'deleted': int rows deleted from SaleRecord }
+    """
+    if keep_months is None:
+        keep_months = settings.SALES_ARCHIVE_KEEP_MONTHS
+    cutoff = archive_cutoff(keep_months, now)
+    watermark = rolled_up_through()
+
+    archived = []
+    oldest = SaleRecord.objects.filter(
+        timestamp__lt=_aware(cutoff), id__lte=watermark,
+    ).aggregate(oldest=Min('timestamp'))['oldest']
+    if oldest is not None:
+        month = _month_start(timezone.localdate(oldest))
+        while month < cutoff:
+            archive = _archive_month(month, watermark)
+            if archive is not None:
+                archived.append(archive)
+            month = _next_month(month)
+
+    deleted = 0
+    for archive in SaleArchive.objects.filter(purged_at__isnull=True).order_by('id'):
+        deleted += _purge(archive, batch_size)
+    return {'archived': archived, 'deleted': deleted}
+
+
+def delete_archive_files():
+    """Remove the file of every SaleArchive row; deleting the rows is up to the caller."""
+    for filename in SaleArchive.objects.values_list('filename', flat=True):
+        try:
+            os.remove(_path(filename))
+        except FileNotFoundError:
+            pass
+
+
+# ========== Reading ==========
+def read_archive(archive):
+    """The columns stored in one SaleArchive's file, as NumPy arrays."""
+    try:
+        with np.load(_path(archive.filename)) as data:
+            columns = {name: data[name] for name in COLUMNS}
+    except FileNotFoundError:
+        raise ArchiveError(f'Archive file {archive.filename} is missing')
+    if len(columns['id']) != archive.rows or int(columns['quantity_sold'].sum()) != archive.quantity:
+        raise ArchiveError(f'Archive file {archive.filename} does not match its totals')
+    return columns
+
+
+def _utc64(moment):
+    return np.datetime64(moment.astimezone(dt_timezone.utc).replace(tzinfo=None), 'us')
+
+
+def iter_sales(start=None, end=None, medicine_ids=None, using=None, chunk_size=2000):
+    """
+    Stream every sale with start <= timestamp < end, archived or not.
+
+    Yields (id, medicine_id, quantity_sold, timestamp) tuples: archived
+    months first, oldest first, then the table by id. Only one archive file
+    is in memory at a time and the table is read through a server-side
+    cursor, so memory does not grow with the number of sales.
+    """
+    archives = SaleArchive.objects.using(using).order_by('month', 'id')
+    live = SaleRecord.objects.using(using).order_by('id')
+    if start:
+        archives = archives.filter(month__gte=_month_start(timezone.localdate(start)))
+        live = live.filter(timestamp__gte=start)
+    if end:
+        archives = archives.filter(month__lte=timezone.localdate(end))
+        live = live.filter(timestamp__lt=end)
+    if medicine_ids:
+        live = live.filter(medicine_id__in=medicine_ids)
+
+    for archive in list(archives):
+        columns = read_archive(archive)
+        keep = np.ones(len(columns['id']), dtype=bool)
+        if start:
+            keep &= columns['timestamp'] >= _utc64(start)
+        if end:
+            keep &= columns['timestamp'] < _utc64(end)
+        if medicine_ids:
+            keep &= np.isin(columns['medicine_id'], list(medicine_ids))
+        for pk, medicine_id, quantity, timestamp in zip(*(columns[name][keep].tolist() for name in COLUMNS)):
+            yield pk, medicine_id, quantity, timestamp.replace(tzinfo=dt_timezone.utc)
+        if archive.purged_at is None:
+            # Not deleted from the table yet; do not yield those rows twice.
+            live = live.exclude(
+                timestamp__gte=_aware(archive.month), timestamp__lt=_aware(_next_month(archive.month)),
+                id__gt=archive.previous_id, id__lte=archive.through_id,
+            )
+    yield from live.values_list(*COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def load_sales(start, end, medicine_ids=None):
+    """
+    Every sale with start <= timestamp < end, archived or still in SaleRecord.
+
+    Returns:
+        dict of NumPy arrays keyed by column: id, medicine_id, quantity_sold
+        and timestamp (UTC, datetime64[us]), ordered by timestamp then id.
+    """
+    archives = SaleArchive.objects.filter(
+        month__gte=_month_start(timezone.localdate(start)), month__lt=timezone.localdate(end) + timedelta(days=1),
+    )
+    parts = [read_archive(archive) for archive in archives]
+    archived_ids = np.concatenate([part['id'] for part in parts]) if parts else np.empty(0, np.int64)
+
+    live = SaleRecord.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if medicine_ids:
+        live = live.filter(medicine_id__in=medicine_ids)
+    live = _read_columns(live)
+    # Rows of an archive whose purge has not finished are in both places.
+    parts.append({name: column[~np.isin(live['id'], archived_ids)] for name, column in live.items()})
+
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+    keep = (columns['timestamp'] >= _utc64(start)) & (columns['timestamp'] < _utc64(end))
+    if medicine_ids:
+        keep &= np.isin(columns['medicine_id'], list(medicine_ids))
+    order = np.lexsort((columns['id'][keep], columns['timestamp'][keep]))
+    return {name: column[keep][order] for name, column in columns.items()}
@@ -0,0 +1,239 @@
+"""
+Native async variants of the OTP and booking endpoints.
+
+Under ASGI the DRF function views in views.py run in a thread pool, and a
+thread stays parked for the whole Twilio round trip. These views await the
+async ORM and AsyncMessageHandler instead, so one worker can keep thousands
+of OTP requests in flight. Request parsing, validation and response bodies
+mirror the sync views; they are served under /api/async/, or in place of the
+sync views when settings.ASYNC_OTP_VIEWS is on.
+"""
+
+import json
+import math
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+
+from .idempotency import idempotent
+from .messages import AsyncMessageHandler
+from .models import Appointment, Doctor, OTP
+from .serializers import AppointmentSerializer, CustomerSerializer
+from .services import OTPVerificationError, customer_login
+from .throttling import check as check_rate_limits, client_ip
+from .transactions import db_section
+from .views import generate_otp
+
+
+def request_data(request):
+    """JSON or form body as a dict, like DRF's request.data."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+def field(data, name):
+    value = data.get(name) or ''
+    return value.strip() if isinstance(value, str) else str(value)
+
+
+def error(message, status_code=status.HTTP_400_BAD_REQUEST):
+    return JsonResponse({'error': message}, status=status_code)
+
+
+async def throttled(request, kind, phone_number):
+    """Apply the OTP rate limits, answering like DRF's Throttled exception, or None."""
+    # The cache calls block (the SQLite cache has no async API), so they run
+    # in the sync thread rather than on the event loop.
+    wait = await sync_to_async(check_rate_limits)(kind, phone_number, client_ip(request))
+    if not wait:
+        return None
+    wait = math.ceil(wait)
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {wait} second{"" if wait == 1 else "s"}.'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    response['Retry-After'] = str(wait)
+    return response
+
+
+async def issue_otp(request):
+    """Shared body of send_otp and customer_send_otp."""
+    phone_number = field(request_data(request), 'phone_number')
+
+    # Rate limits run before any DB work, as the DRF throttles do
+    limited = await throttled(request, 'send', phone_number)
+    if limited:
+        return limited
+
+    if not phone_number:
+        return error('Phone number is required')
+
+    # Validate phone number format (basic validation)
+    if not phone_number.isdigit() or len(phone_number) < 10:
+        return error('Invalid phone number format')
+
+    # Delete previous OTPs for this phone number
+    await OTP.objects.filter(phone_number=phone_number).adelete()
+
+    otp_code = generate_otp()
+    await OTP.objects.acreate(
+        phone_number=phone_number,
+        otp_code=otp_code,
+        expires_at=timezone.now() + timedelta(minutes=10)
+    )
+
+    result = await AsyncMessageHandler(phone_number, otp_code).send_otp_to_phone()
+
+    if result['success']:
+        return JsonResponse({
+            'message': f'OTP sent to {phone_number}',
+            'phone_number': phone_number,
+            'message_sid': result['message_sid']
+        })
+    return error(f'Failed to send OTP: {result["error"]}')
+
+
+@csrf_exempt
+@require_POST
+@idempotent
+async def send_otp(request):
+    """Generate and send OTP to phone number"""
+    return await issue_otp(request)
+
+
+@csrf_exempt
+@require_POST
+@idempotent
+async def customer_send_otp(request):
+    """Send OTP for customer login"""
+    return await issue_otp(request)
+
+
+@csrf_exempt
+@require_POST
+async def verify_otp(request):
+    """Verify OTP for phone number"""
+    data = request_data(request)
+    phone_number = field(data, 'phone_number')
+    otp_code = field(data, 'otp_code')
+
+    limited = await throttled(request, 'verify', phone_number)
+    if limited:
+        return limited
+
+    if not phone_number or not otp_code:
+        return error('Phone number and OTP are required')
+
+    try:
+        otp = await OTP.objects.aget(phone_number=phone_number, otp_code=otp_code)
+    except OTP.DoesNotExist:
+        return error('Invalid OTP')
+
+    if timezone.now() > otp.expires_at:
+        await otp.adelete()
+        return error('OTP has expired')
+
+    otp.is_verified = True
+    await otp.asave(update_fields=['is_verified'])
+
+    return JsonResponse({
+        'message': 'OTP verified successfully',
+        'phone_number': phone_number,
+        'is_verified': True
+    })
+
+
+@csrf_exempt
+@require_POST
+async def customer_verify_otp(request):
+    """Verify OTP and login customer"""
+    data = request_data(request)
+    phone_number = field(data, 'phone_number')
+    otp_code = field(data, 'otp_code')
+    customer_name = field(data, 'customer_name')
+
+    limited = await throttled(request, 'verify', phone_number)
+    if limited:
+        return limited
+
+    if not phone_number or not otp_code:
+        return error('Phone number and OTP are required')
+
+    # The async ORM has no transactions yet, so the atomic login runs in the
+    # sync thread; it is a handful of fast queries with no external I/O.
+    try:
+        login = await sync_to_async(customer_login)(phone_number, otp_code, customer_name)
+    except OTPVerificationError as e:
+        return error(str(e))
+
+    return JsonResponse({
+        'message': 'Login successful',
+        'token': login['token'],
+        'customer': CustomerSerializer(login['customer']).data,
+        'is_new_customer': login['is_new_customer']
+    })
+
+
+def book_appointment(doctor, customer_name, phone_number, appointment_date):
+    """
+    db_section of create_appointment: consume the verified OTP and create the
+    appointment, or return None if there was no verified OTP to consume.
+    """
+    with db_section():
+        consumed, _ = OTP.objects.filter(phone_number=phone_number, is_verified=True).delete()
+        if not consumed:
+            return None
+        return Appointment.objects.create(
+            doctor=doctor,
+            customer_name=customer_name,
+            phone_number=phone_number,
+            date=appointment_date,
+            is_verified=True
+        )
+
+
+@csrf_exempt
+@require_POST
+@idempotent
+async def create_appointment(request):
+    """Create appointment with OTP-verified phone number"""
+    data = request_data(request)
+    phone_number = field(data, 'phone_number')
+    customer_name = field(data, 'customer_name')
+    doctor_id = data.get('doctor')
+    appointment_date = data.get('date')
+
+    if not all([phone_number, customer_name, doctor_id, appointment_date]):
+        return error('All fields are required')
+
+    try:
+        doctor = await Doctor.objects.aget_cached(doctor_id)
+    except Doctor.DoesNotExist:
+        return error('Doctor not found', status.HTTP_404_NOT_FOUND)
+
+    # As in the sync view: the OTP is consumed and the appointment created in
+    # one transaction, in the sync thread, and the SMS is sent after commit.
+    appointment = await sync_to_async(book_appointment)(doctor, customer_name, phone_number, appointment_date)
+    if appointment is None:
+        return error('Phone number not verified. Please verify OTP first.')
+
+    await AsyncMessageHandler(phone_number).send_appointment_confirmation(
+        doctor_name=doctor.name,
+        appointment_date=appointment_date,
+        appointment_id=appointment.id
+    )
+
+    return JsonResponse({
+        'message': 'Appointment booked successfully',
+        'appointment': AppointmentSerializer(appointment).data
+    }, status=status.HTTP_201_CREATED)
@@ -0,0 +1,908 @@
+"""
+Micro-benchmarks for the performance work on this app.
+
+Run them with ``python manage.py benchmark [name ...]``. Each benchmark is a
+function taking a Report and a workload size; register it with the
+@benchmark decorator. They run against a throwaway database and replace
+Twilio with fakes that only sleep, so they never send a real SMS.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import close_old_connections, connections
+from django.test import AsyncClient, Client, override_settings
+
+BENCHMARKS = {}
+
+# Typical Twilio API round trip from our hosts.
+FAKE_SMS_LATENCY = 0.1
+SMS_OK = {'success': True, 'message_sid': 'SMbenchmark', 'error': None}
+
+
+def benchmark(default_size):
+    def register(func):
+        func.default_size = default_size
+        BENCHMARKS[func.__name__] = func
+        return func
+    return register
+
+
+class Report:
+    """Uniform result lines so runs are easy to compare."""
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def line(self, text):
+        self.stdout.write(f'  {text}')
+
+    def timing(self, label, seconds, count, unit='op'):
+        rate = count / seconds if seconds else float('inf')
+        per_op = seconds / count * 1e6 if count else 0
+        self.line(f'{label:<44} {rate:>12,.0f} {unit}/s {per_op:>12,.1f} µs/{unit}')
+
+
+@contextmanager
+def timed():
+    """Yield a dict whose 'seconds' is filled in when the block exits."""
+    result = {}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - started
+
+
+@contextmanager
+def fake_sms(latency=FAKE_SMS_LATENCY):
+    """Swap both message handlers for fakes that only wait ``latency`` seconds."""
+
+    def sync_send(*args, **kwargs):
+        time.sleep(latency)
+        return SMS_OK
+
+    async def async_send(*args, **kwargs):
+        await asyncio.sleep(latency)
+        return SMS_OK
+
+    with mock.patch('App.views.MessageHandler') as sync_handler, \
+            mock.patch('App.async_views.AsyncMessageHandler') as async_handler, \
+            mock.patch('App.messages.AsyncMessageHandler') as batch_handler:
+        for name in ('send_otp_to_phone', 'send_appointment_confirmation', 'send_notification'):
+            setattr(sync_handler.return_value, name, sync_send)
+            setattr(async_handler.return_value, name, async_send)
+            setattr(batch_handler.return_value, name, async_send)
+        yield
+
+
+def no_rate_limits():
+    """Lift the OTP rate limits, which would otherwise reject most of a benchmark's requests."""
+    return override_settings(OTP_RATE_LIMITS={})
+
+
+def run_in_threads(threads, count, func):
+    """Call func(i) for i in range(count) spread over ``threads`` worker threads."""
+
+    def worker(offset):
+        try:
+            for i in range(offset, count, threads):
+                func(i)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+# ========== Benchmarks ==========
+@benchmark(default_size=200)
+def otp_views(report, size):
+    """send_otp: sync views on an 8-thread worker vs async views on one event loop."""
+    threads = 8
+    report.line(f'{size} concurrent requests, fake Twilio latency {FAKE_SMS_LATENCY * 1000:.0f} ms')
+
+    def sync_request(i):
+        Client().post('/api/send-otp/', {'phone_number': f'98{i:08d}'}, content_type='application/json')
+
+    async def async_requests():
+        client = AsyncClient()
+        await asyncio.gather(*(
+            client.post('/api/async/send-otp/', {'phone_number': f'97{i:08d}'}, content_type='application/json')
+            for i in range(size)
+        ))
+
+    with fake_sms(), no_rate_limits():
+        with timed() as sync_time:
+            run_in_threads(threads, size, sync_request)
+        report.timing(f'sync views, {threads} threads', sync_time['seconds'], size, 'req')
+
+        with timed() as async_time:
+            asyncio.run(async_requests())
+        report.timing('async views, 1 event loop', async_time['seconds'], size, 'req')
+
+
+@benchmark(default_size=100000)
+def otp_throttle(report, size):
+    """Overhead of the OTP send rate limits per request; the budget is 100 µs."""
+    from django.conf import settings
+    from django.core.cache import cache
+
+    from .throttling import check
+
+    backend = settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]
+    report.line(f'{size} checks of 3 sliding-window limits on {backend}, 1000 numbers, 250 IPs')
+    cache.clear()
+    with timed() as elapsed:
+        for i in range(size):
+            check('send', f'98{i % 1000:08d}', f'10.0.{i % 250}.1')
+    report.timing('throttling.check("send", ...)', elapsed['seconds'], size, 'req')
+    cache.clear()
+
+
+def _incr_worker(location, count):
+    """Process body for cache_backends: hammer one shared counter."""
+    from .cache_backends import SQLiteCache
+
+    cache = SQLiteCache(location, {'OPTIONS': {'EVICTION_INTERVAL': 0}})
+    for _ in range(count):
+        cache.incr('shared-counter')
+
+
+@benchmark(default_size=5000)
+def cache_backends(report, size):
+    """SQLiteCache vs LocMemCache vs FileBasedCache: get, set, incr, and a 4-process incr race."""
+    import multiprocessing
+    import shutil
+    import tempfile
+
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.core.cache.backends.locmem import LocMemCache
+
+    from .cache_backends import SQLiteCache
+
+    tmpdir = tempfile.mkdtemp(prefix='cache-benchmark-')
+    sqlite_location = f'{tmpdir}/cache.sqlite3'
+    backends = {
+        'SQLiteCache': SQLiteCache(sqlite_location, {'OPTIONS': {'EVICTION_INTERVAL': 0}}),
+        'LocMemCache': LocMemCache('benchmark', {'OPTIONS': {'MAX_ENTRIES': size * 2}}),
+        'FileBasedCache': FileBasedCache(f'{tmpdir}/files', {'OPTIONS': {'MAX_ENTRIES': size * 2}}),
+    }
+    payload = {'id': 1, 'name': 'Paracetamol 500mg', 'price': '12.50', 'stock': 140}
+    report.line(f'{size} keys per operation, small dict payload')
+    try:
+        for name, cache in backends.items():
+            with timed() as elapsed:
+                for i in range(size):
+                    cache.set(f'key:{i}', payload)
+            report.timing(f'{name}.set', elapsed['seconds'], size)
+
+            with timed() as elapsed:
+                for i in range(size):
+                    cache.get(f'key:{i}')
+            report.timing(f'{name}.get (hit)', elapsed['seconds'], size)
+
+            cache.set('counter', 0)
+            with timed() as elapsed:
+                for _ in range(size):
+                    cache.incr('counter')
+            report.timing(f'{name}.incr', elapsed['seconds'], size)
+
+        # Only the SQLite cache is shared, so only it can count across workers.
+        processes, per_process = 4, size // 4
+        backends['SQLiteCache'].set('shared-counter', 0)
+        workers = [
+            multiprocessing.Process(target=_incr_worker, args=(sqlite_location, per_process))
+            for _ in range(processes)
+        ]
+        with timed() as elapsed:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        total = processes * per_process
+        report.timing(f'SQLiteCache.incr, {processes} processes', elapsed['seconds'], total)
+        report.line(f'shared counter {backends["SQLiteCache"].get("shared-counter")} / expected {total}')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@benchmark(default_size=50)
+def transaction_policy(report, size):
+    """Transaction time held per request: ATOMIC_REQUESTS vs the per-view policies."""
+    from .instrumentation import metrics
+    from .models import Doctor, Medicine
+
+    Doctor.objects.create(name='Dr. Benchmark', specialty='General')
+    Medicine.objects.create(
+        name='Benchmark Tablet', image='medicines/x.png', description='d', stock_quantity=10, price=1,
+    )
+    settings_dict = connections['default'].settings_dict
+    requests = {
+        'home': lambda client, i: client.get('/'),
+        'medicine-list': lambda client, i: client.get('/api/medicines/'),
+        'send_otp': lambda client, i: client.post(
+            '/api/send-otp/', {'phone_number': f'98{i:08d}'}, content_type='application/json',
+        ),
+    }
+    report.line(f'{size} requests per route, fake Twilio latency {FAKE_SMS_LATENCY * 1000:.0f} ms')
+    try:
+        with fake_sms(), no_rate_limits():
+            for atomic_requests, label in ((True, 'ATOMIC_REQUESTS'), (False, 'policies')):
+                settings_dict['ATOMIC_REQUESTS'] = atomic_requests
+                for route, request in requests.items():
+                    metrics.reset()
+                    client = Client()
+                    for i in range(size):
+                        request(client, i)
+                    held = metrics.timing('db.transaction_held') or {'count': 0, 'mean_ms': 0, 'max_ms': 0}
+                    report.line(
+                        f'{label:<16} {route:<14} {held["count"] / size:>5.1f} txn/req '
+                        f'{held["count"] * held["mean_ms"] / size:>9.2f} ms held/req '
+                        f'{held["max_ms"]:>9.2f} ms max'
+                    )
+    finally:
+        settings_dict['ATOMIC_REQUESTS'] = False
+
+
+@benchmark(default_size=2000)
+def db_pool(report, size):
+    """PostgreSQL requests/s with psycopg pooling off (new or persistent connections) and on."""
+    from .instrumentation import metrics
+    from .models import Medicine
+
+    connection = connections['default']
+    if connection.vendor != 'postgresql':
+        report.line(f'skipped: needs PostgreSQL, the default database is {connection.vendor}')
+        return
+
+    threads = 16
+    settings_dict = connection.settings_dict
+    options = settings_dict['OPTIONS']
+    pool_options = options.get('pool') or {'min_size': 4, 'max_size': 8, 'timeout': 30}
+    for i in range(20):
+        Medicine.objects.create(
+            name=f'Benchmark {i}', image='medicines/x.png', description='d', stock_quantity=i, price=1,
+        )
+    modes = [
+        ('no pool, CONN_MAX_AGE=0', None, 0),
+        ('no pool, CONN_MAX_AGE=600', None, 600),
+        (f'pool {pool_options.get("min_size", 4)}-{pool_options.get("max_size", "")}', pool_options, 0),
+    ]
+    report.line(f'{size} GET /api/medicines/ over {threads} threads')
+    try:
+        for label, pool, max_age in modes:
+            connections.close_all()
+            connection.close_pool()
+            options.pop('pool', None)
+            if pool:
+                options['pool'] = pool
+            settings_dict['CONN_MAX_AGE'] = max_age
+            metrics.reset()
+
+            def request(i):
+                Client().get('/api/medicines/')
+                # The test client skips the end-of-request cleanup that
+                # returns the connection to the pool or closes it.
+                close_old_connections()
+
+            with timed() as elapsed:
+                run_in_threads(threads, size, request)
+            report.timing(label, elapsed['seconds'], size, 'req')
+            wait = metrics.timing('db.pool.wait')
+            if wait:
+                report.line(f'{"":<44} pool wait p50 {wait["p50_ms"]:.2f} ms, p95 {wait["p95_ms"]:.2f} ms, '
+                            f'max {wait["max_ms"]:.2f} ms')
+    finally:
+        connections.close_all()
+        connection.close_pool()
+        options.pop('pool', None)
+        options['pool'] = pool_options
+        settings_dict['CONN_MAX_AGE'] = 0
+
+
+@benchmark(default_size=1000000)
+def sales_analytics(report, size):
+    """Daily sales per medicine for 30 days: raw GROUP BY vs rollups, plus the rollup job itself."""
+    import random
+    from datetime import timedelta
+
+    from django.db.models import Count, Sum
+    from django.db.models.functions import Trunc
+    from django.utils import timezone
+
+    from .analytics import roll_up_sales, sales_series
+    from .models import Medicine, SaleRecord
+
+    days, medicines = 180, 500
+    rng = random.Random(35)
+    Medicine.objects.bulk_create(
+        Medicine(name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=0, price=1)
+        for i in range(medicines)
+    )
+    medicine_ids = list(Medicine.objects.values_list('id', flat=True))
+    now = timezone.now()
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / size
+    for offset in range(0, size, 50000):
+        SaleRecord.objects.bulk_create(
+            SaleRecord(medicine_id=rng.choice(medicine_ids), quantity_sold=rng.randint(1, 5),
+                       timestamp=start + step * i)
+            for i in range(offset, min(offset + 50000, size))
+        )
+    report.line(f'{size} sales over {days} days, {medicines} medicines')
+
+    with timed() as elapsed:
+        rolled = roll_up_sales(settle=None)
+    report.timing('roll_up_sales (full backlog)', elapsed['seconds'], rolled, 'sale')
+
+    recent = 5000
+    SaleRecord.objects.bulk_create(
+        SaleRecord(medicine_id=rng.choice(medicine_ids), quantity_sold=1) for _ in range(recent)
+    )
+    with timed() as elapsed:
+        rolled = roll_up_sales(settle=None)
+    report.timing(f'roll_up_sales ({recent} new sales)', elapsed['seconds'], rolled, 'sale')
+    SaleRecord.objects.bulk_create(
+        SaleRecord(medicine_id=rng.choice(medicine_ids), quantity_sold=1) for _ in range(recent)
+    )
+
+    repeats = 5
+    month_ago = now - timedelta(days=30)
+    with timed() as elapsed:
+        for _ in range(repeats):
+            list(SaleRecord.objects.filter(timestamp__gte=month_ago).order_by()
+                 .annotate(day=Trunc('timestamp', 'day')).values('day', 'medicine_id')
+                 .annotate(quantity=Sum('quantity_sold'), sales=Count('id')))
+    report.timing('raw GROUP BY, 30 days', elapsed['seconds'], repeats, 'query')
+    with timed() as elapsed:
+        for _ in range(repeats):
+            sales_series('day', month_ago, now)
+    report.timing(f'sales_series, 30 days (+{recent} unrolled)', elapsed['seconds'], repeats, 'query')
+
+
+@benchmark(default_size=100000)
+def reorder_points(report, size):
+    """Reorder points for ``size`` medicines x 365 days: one vectorized pass vs a per-medicine loop."""
+    import math
+    from statistics import NormalDist
+
+    import numpy as np
+
+    from .forecasting import reorder_points as vectorized
+
+    days, loop_sample = 365, 1000
+    rng = np.random.default_rng(36)
+    # Zipf-like catalog: most medicines sell a little, a few sell a lot.
+    rates = rng.pareto(1.5, size=(size, 1))
+    matrix = rng.poisson(rates, size=(size, days)).astype(float)
+    stock = rng.integers(0, 200, size=size)
+    report.line(f'{size} medicines x {days} days ({matrix.nbytes / 2 ** 20:.0f} MiB)')
+
+    for method in ('sma', 'ewma'):
+        with timed() as elapsed:
+            plan = vectorized(matrix, stock, method=method)
+        report.timing(f'vectorized {method}, whole catalog', elapsed['seconds'], size, 'med')
+    report.line(f'{int(plan["needs_reorder"].sum())} medicines need reordering (ewma)')
+
+    # The same ewma computation one medicine at a time, on a sample.
+    z = NormalDist().inv_cdf(0.95)
+    weights = [0.1 * 0.9 ** (days - 1 - day) for day in range(days)]
+    total = sum(weights)
+    weights = [w / total for w in weights]
+    rows = matrix[:loop_sample].tolist()
+    with timed() as elapsed:
+        for history, units in zip(rows, stock[:loop_sample].tolist()):
+            demand = sum(w * q for w, q in zip(weights, history))
+            sigma = math.sqrt(sum(w * (q - demand) ** 2 for w, q in zip(weights, history)))
+            reorder_point = demand * 7 + z * sigma * math.sqrt(7)
+            units <= reorder_point
+    report.timing(f'python loop ewma, {loop_sample} medicines', elapsed['seconds'], loop_sample, 'med')
+    report.line(f'python loop, extrapolated to {size}: {elapsed["seconds"] * size / loop_sample:.1f} s')
+
+
+@benchmark(default_size=500000)
+def sales_archive(report, size):
+    """Archive ``size`` sales over 180 days to files, then read 90 days back across archive and table."""
+    import os
+    import random
+    import shutil
+    import tempfile
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from .analytics import roll_up_sales
+    from .archive import archive_sales, load_sales
+    from .models import Medicine, SaleRecord
+
+    days, medicines = 180, 500
+    rng = random.Random(37)
+    Medicine.objects.bulk_create(
+        Medicine(name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=0, price=1)
+        for i in range(medicines)
+    )
+    medicine_ids = list(Medicine.objects.values_list('id', flat=True))
+    now = timezone.now()
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / size
+    for offset in range(0, size, 50000):
+        SaleRecord.objects.bulk_create(
+            SaleRecord(medicine_id=rng.choice(medicine_ids), quantity_sold=rng.randint(1, 5),
+                       timestamp=start + step * i)
+            for i in range(offset, min(offset + 50000, size))
+        )
+    roll_up_sales(settle=None)
+    report.line(f'{size} sales over {days} days, {medicines} medicines')
+
+    directory = tempfile.mkdtemp()
+    try:
+        with override_settings(SALES_ARCHIVE_DIR=directory):
+            with timed() as elapsed:
+                result = archive_sales(keep_months=1)
+            report.timing('archive_sales (write + delete)', elapsed['seconds'], result['deleted'], 'sale')
+            size_on_disk = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+            report.line(
+                f"{len(result['archived'])} files, {size_on_disk / 2 ** 20:.1f} MiB, "
+                f"{size_on_disk / max(result['deleted'], 1):.1f} bytes/sale; "
+                f'{SaleRecord.objects.count()} sales left in the table'
+            )
+            with timed() as elapsed:
+                sales = load_sales(now - timedelta(days=90), now)
+            report.timing('load_sales, 90 days (archive + table)', elapsed['seconds'], len(sales['id']), 'sale')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@benchmark(default_size=200000)
+def exports(report, size):
+    """Export ``size`` sales: streamed CSV/JSONL vs serializing the whole queryset, time to first byte and peak memory."""
+    import random
+    import tracemalloc
+
+    from rest_framework.renderers import JSONRenderer
+
+    from .exports import export_stream
+    from .models import Medicine, SaleRecord
+    from .serializers import SaleRecordSerializer
+
+    rng = random.Random(38)
+    Medicine.objects.bulk_create(
+        Medicine(name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=0, price=1)
+        for i in range(500)
+    )
+    medicine_ids = list(Medicine.objects.values_list('id', flat=True))
+    for offset in range(0, size, 50000):
+        SaleRecord.objects.bulk_create(
+            SaleRecord(medicine_id=rng.choice(medicine_ids), quantity_sold=rng.randint(1, 5))
+            for _ in range(min(50000, size - offset))
+        )
+    report.line(f'{size} sales')
+
+    def measure(label, produce):
+        tracemalloc.start()
+        started = time.perf_counter()
+        chunks = iter(produce())
+        first = next(chunks)
+        first_byte = time.perf_counter() - started
+        total = len(first) + sum(len(chunk) for chunk in chunks)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report.timing(label, elapsed, size, 'row')
+        report.line(f'  first byte {first_byte * 1000:.1f} ms, peak {peak / 2 ** 20:.1f} MiB, {total / 2 ** 20:.1f} MiB sent')
+
+    measure('viewset-style: serialize all, render JSON', lambda: [JSONRenderer().render(
+        SaleRecordSerializer(SaleRecord.objects.all(), many=True).data,
+    )])
+    measure('streamed CSV', lambda: export_stream('sales', 'csv'))
+    measure('streamed JSONL', lambda: export_stream('sales', 'jsonl'))
+    measure('streamed CSV, gzip', lambda: export_stream('sales', 'csv', compress=True))
+
+
+@benchmark(default_size=5000)
+def change_sync(report, size):
+    """Admin dashboard refresh after one edit: reload three full lists vs fetch /api/changes/ deltas."""
+    from datetime import timedelta
+
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    from .models import Appointment, Doctor, Medicine
+
+    Medicine.objects.bulk_create(
+        Medicine(name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=i, price=1)
+        for i in range(size)
+    )
+    doctors = Doctor.objects.bulk_create(Doctor(name=f'Doctor {i}', specialty='GP') for i in range(size // 10))
+    now = timezone.now()
+    Appointment.objects.bulk_create(
+        Appointment(doctor=doctors[i % len(doctors)], customer_name=f'Customer {i}', phone_number='9876543210',
+                    date=now + timedelta(hours=i))
+        for i in range(size)
+    )
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='bench', password='x', is_staff=True))
+    report.line(f'{size} medicines, {len(doctors)} doctors, {size} appointments')
+
+    repeats = 20
+    seq = client.get('/api/changes/').data['seq']
+    medicine = Medicine.objects.first()
+    full = delta = 0
+    with timed() as full_time:
+        for i in range(repeats):
+            for feed in ('medicines', 'doctors', 'appointments'):
+                full += len(client.get(f'/api/{feed}/').content)
+    report.timing('reload medicines + doctors + appointments', full_time['seconds'], repeats, 'refresh')
+    with timed() as delta_time:
+        for i in range(repeats):
+            medicine.stock_quantity = i
+            medicine.save()
+            response = client.get('/api/changes/', {'after': seq})
+            delta += len(response.content)
+            seq = response.data['seq']
+    report.timing('save one medicine + fetch changes', delta_time['seconds'], repeats, 'refresh')
+    report.line(f'bytes per refresh: {full // repeats:,} full vs {delta // repeats:,} delta')
+
+
+@benchmark(default_size=5000)
+def dashboard_summary(report, size):
+    """Admin dashboard load: three full lists vs /api/dashboard/summary/, cold and cached."""
+    from datetime import timedelta
+
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    from .models import Appointment, Doctor, Medicine, SaleRecord
+
+    medicines = Medicine.objects.bulk_create(
+        Medicine(name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=i % 200, price=1)
+        for i in range(size)
+    )
+    doctors = Doctor.objects.bulk_create(Doctor(name=f'Doctor {i}', specialty='GP') for i in range(size // 10))
+    now = timezone.now()
+    Appointment.objects.bulk_create(
+        Appointment(doctor=doctors[i % len(doctors)], customer_name=f'Customer {i}', phone_number='9876543210',
+                    date=now + timedelta(minutes=i))
+        for i in range(size)
+    )
+    SaleRecord.objects.bulk_create(
+        SaleRecord(medicine=medicines[i % size], quantity_sold=1) for i in range(size * 4)
+    )
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='bench', password='x', is_staff=True))
+    report.line(f'{size} medicines, {len(doctors)} doctors, {size} appointments, {size * 4} sales')
+
+    repeats = 20
+    full = summary = 0
+    with timed() as full_time:
+        for i in range(repeats):
+            for feed in ('medicines', 'doctors', 'appointments'):
+                full += len(client.get(f'/api/{feed}/').content)
+    report.timing('fetch medicines + doctors + appointments', full_time['seconds'], repeats, 'load')
+    with timed() as cold_time:
+        for i in range(repeats):
+            cache.clear()
+            summary += len(client.get('/api/dashboard/summary/').content)
+    report.timing('summary, cold cache', cold_time['seconds'], repeats, 'load')
+    with timed() as warm_time:
+        for i in range(repeats):
+            client.get('/api/dashboard/summary/')
+    report.timing('summary, cached', warm_time['seconds'], repeats, 'load')
+    report.line(f'bytes per load: {full // repeats:,} full lists vs {summary // repeats:,} summary')
+
+
+@benchmark(default_size=1_000_000)
+def reminders(report, size):
+    """Appointment reminders: scan every appointment per minute vs the in-memory scheduler."""
+    import heapq
+    import random
+    import uuid
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from .models import Appointment, Doctor
+    from .reminders import ReminderScheduler
+
+    now = timezone.now()
+    days = 30
+    doctors = Doctor.objects.bulk_create(Doctor(name=f'Doctor {i}', specialty='GP') for i in range(100))
+    booked = now - timedelta(days=1)
+    with timed() as insert_time:
+        for offset in range(0, size, 50000):
+            Appointment.objects.bulk_create(
+                Appointment(doctor=doctors[i % 100], customer_name=f'Customer {i}', phone_number='9876543210',
+                            is_verified=True, created_at=booked, date=now + timedelta(seconds=i * days * 86400 / size))
+                for i in range(offset, min(offset + 50000, size))
+            )
+    report.line(f'{size:,} appointments over {days} days, inserted in {insert_time["seconds"]:.1f}s')
+
+    with timed() as scan_time:
+        upcoming = Appointment.objects.filter(date__gt=now, is_verified=True).values_list('id', 'date', 'created_at')
+        scanned = sum(1 for _ in upcoming.iterator(chunk_size=10000))
+    report.timing(f'naive per-minute scan ({scanned:,} rows)', scan_time['seconds'], 1, 'scan')
+
+    scheduler = ReminderScheduler(batch_size=200, concurrency=20)
+    with timed() as start_time:
+        scheduler.start(now)
+    report.timing(f'scheduler start ({len(scheduler.heap):,} reminders in window)', start_time['seconds'], 1, 'load')
+    with timed() as tick_time:
+        for _ in range(20):
+            scheduler.sync(now)
+            scheduler.pop_due(now)
+    report.timing('idle tick (change log + heap check)', tick_time['seconds'], 20, 'tick')
+
+    entries = [(now + timedelta(seconds=random.random() * days * 86400), now, uuid.uuid4(), '24h')
+               for _ in range(size)]
+    heap = []
+    with timed() as push_time:
+        for entry in entries:
+            heapq.heappush(heap, entry)
+    report.timing(f'heap push, {size:,} reminders', push_time['seconds'], size, 'push')
+    with timed() as pop_time:
+        while heap:
+            heapq.heappop(heap)
+    report.timing(f'heap pop, {size:,} reminders', pop_time['seconds'], size, 'pop')
+
+    due_at = now + timedelta(hours=1)  # Every 24 hour reminder for the next hour falls due
+    with fake_sms():
+        with timed() as send_time:
+            totals = scheduler.tick(due_at)
+    report.timing(f"batched send ({totals['sent']:,} reminders, 20 in flight)", send_time['seconds'],
+                  totals['sent'], 'sms')
+    report.line(f"one at a time at {FAKE_SMS_LATENCY * 1000:.0f} ms per SMS would take "
+                f"{totals['sent'] * FAKE_SMS_LATENCY:,.0f}s")
+    scheduler.close()
+
+
+@benchmark(default_size=20000)
+def message_status(report, size):
+    """SMS status callbacks: a transaction per callback vs the buffered bulk flush."""
+    import uuid
+
+    from django.db import transaction
+    from django.test import Client
+    from django.utils import timezone
+
+    from .message_status import STATUS_RANKS, StatusBuffer, flush_statuses, sign_callback
+    from .models import MessageLog
+
+    def logged(count):
+        sids = [f'SM{uuid.uuid4().hex}' for _ in range(count)]
+        MessageLog.objects.bulk_create(
+            [MessageLog(sid=sid, phone_number='9876543210', kind='otp', sent_at=timezone.now()) for sid in sids],
+            batch_size=1000,
+        )
+        return sids
+
+    sids = logged(size)
+    with timed() as single_time:
+        for sid in sids:
+            with transaction.atomic():
+                MessageLog.objects.filter(sid=sid, status_rank__lt=STATUS_RANKS['delivered']).update(
+                    status='delivered', status_rank=STATUS_RANKS['delivered'], status_at=timezone.now(),
+                )
+    report.timing('transaction per callback', single_time['seconds'], size, 'callback')
+
+    sids = logged(size)
+    buffer = StatusBuffer(None, 2000, flush_statuses)
+    with timed() as buffered_time:
+        for i, sid in enumerate(sids, 1):
+            buffer.add_status(sid, 'delivered')
+            if i % buffer.max_pending == 0:
+                buffer.flush_now()
+        buffer.flush_now()
+    report.timing(f'buffered, flushed per {buffer.max_pending}', buffered_time['seconds'], size, 'callback')
+
+    url = 'http://testserver/api/messages/status/'
+    client = Client()
+    requests = min(size, 2000)
+    with override_settings(TWILIO_AUTH_TOKEN='benchmark'), \
+            mock.patch('App.message_status.status_buffer', StatusBuffer(None, 2000, flush_statuses)):
+        with timed() as webhook_time:
+            for sid in sids[:requests]:
+                params = {'MessageSid': sid, 'MessageStatus': 'read'}
+                client.post(url, params, HTTP_X_TWILIO_SIGNATURE=sign_callback(url, params))
+    report.timing('webhook: validate and buffer', webhook_time['seconds'], requests, 'request')
+
+
+@benchmark(default_size=50000)
+def logging_overhead(report, size):
+    """Cost of a log call on the request path: eager vs lazy formatting, direct vs queued handlers."""
+    import logging
+    import logging.handlers
+    import os
+    import queue
+    import shutil
+    import tempfile
+
+    from .log_queue import BoundedQueueHandler
+
+    logger = logging.getLogger('App.benchmarks.logging')
+    logger.propagate = False
+    phone, sid = '9876543210', 'SM' + '0' * 32
+
+    logger.setLevel(logging.WARNING)
+    with timed() as eager_time:
+        for _ in range(size):
+            logger.info(f"Notification sent to {phone}. Message SID: {sid}")
+    report.timing('disabled level, f-string', eager_time['seconds'], size, 'call')
+    with timed() as lazy_time:
+        for _ in range(size):
+            logger.info("Notification sent to %s. Message SID: %s", phone, sid)
+    report.timing('disabled level, lazy %-args', lazy_time['seconds'], size, 'call')
+
+    logger.setLevel(logging.INFO)
+    directory = tempfile.mkdtemp()
+    formatter = logging.Formatter('{levelname} {asctime} {module} {process:d} {thread:d} {message}', style='{')
+
+    def file_handler(name):
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(directory, name), maxBytes=15 * 1024 * 1024, backupCount=2,
+        )
+        handler.setFormatter(formatter)
+        return handler
+
+    def queued(*handlers, maxsize=10000):
+        handler = BoundedQueueHandler(queue.Queue(maxsize))
+        handler.name = 'benchmark'
+        handler.listener = logging.handlers.QueueListener(handler.queue, *handlers, respect_handler_level=True)
+        return handler
+
+    class SlowMail(logging.Handler):
+        """Stands in for AdminEmailHandler talking to a slow SMTP server."""
+
+        def emit(self, record):
+            time.sleep(0.2)
+
+    try:
+        for label, handler in (('file, in the request thread', file_handler('direct.log')),
+                               ('file, queued', queued(file_handler('queued.log')))):
+            logger.addHandler(handler)
+            with timed() as enabled_time:
+                for _ in range(size):
+                    logger.info("Notification sent to %s. Message SID: %s", phone, sid)
+            report.timing(label, enabled_time['seconds'], size, 'call')
+            logger.removeHandler(handler)
+            if isinstance(handler, BoundedQueueHandler):
+                handler.stop()
+                report.line(f'  dropped {handler.dropped} of {size} (queue of {handler.queue.maxsize})')
+            handler.close()
+
+        errors = 10
+        for label, handler in (('error mail, in the request thread', SlowMail()),
+                               ('error mail, queued', queued(SlowMail(), maxsize=100))):
+            logger.addHandler(handler)
+            with timed() as mail_time:
+                for _ in range(errors):
+                    logger.error('Internal Server Error: /api/send-otp/')
+            report.timing(label, mail_time['seconds'], errors, 'error')
+            logger.removeHandler(handler)
+            if isinstance(handler, BoundedQueueHandler):
+                handler.stop()
+    finally:
+        shutil.rmtree(directory)
+
+
+@benchmark(default_size=20000)
+def home_page(report, size):
+    """Home page with every medicine in the table vs its first page, then the rows fetched on scroll."""
+    import tracemalloc
+
+    from django.shortcuts import render
+    from django.test import RequestFactory
+
+    from Project.views import home
+
+    from .models import Medicine
+
+    Medicine.objects.bulk_create(
+        Medicine(name=f'Medicine {i}', image='medicines/x.png', description='Ayurvedic remedy ' * 20,
+                 stock_quantity=i % 200, price=1)
+        for i in range(size)
+    )
+    report.line(f'{size} medicines')
+    request = RequestFactory().get('/')
+
+    def measure(label, view):
+        tracemalloc.start()
+        with timed() as elapsed:
+            length = len(view().content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report.timing(label, elapsed['seconds'], 1, 'page')
+        report.line(f'  {length:,} bytes, peak {peak / 2**20:,.1f} MiB')
+
+    # The page as it was: the whole catalog rendered into one table
+    measure('every medicine in the table', lambda: render(request, 'home.html', {
+        'medicines': Medicine.objects.all(), 'top_medicines': [], 'doctors': [],
+    }))
+    measure('first page, rest on scroll', lambda: home(request))
+    client = Client()
+    after, pages = '0', 0
+    with timed() as scroll_time:
+        while after:
+            after = client.get('/catalog/rows/', {'after': after})['X-Next-After']
+            pages += 1
+    report.timing('scrolling through every page', scroll_time['seconds'], pages, 'page')
+
+
+@benchmark(default_size=20000)
+def object_cache(report, size):
+    """Hot Medicine lookups by pk: the database vs the shared cache vs both tiers."""
+    import random
+
+    from django.core.cache import cache
+
+    from .models import Medicine
+
+    medicines = Medicine.objects.bulk_create(
+        Medicine(name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=100, price=1)
+        for i in range(200)
+    )
+    # Most lookups go to a few rows, as bookings and detail views do
+    pks = [medicine.pk for medicine in random.choices(medicines, weights=[1 / (i + 1) for i in range(200)], k=size)]
+    object_cache = Medicine.objects.object_cache
+    cache.clear()
+    object_cache.clear_local()
+
+    with timed() as db_time:
+        for pk in pks:
+            Medicine.objects.get(pk=pk)
+    report.timing('Medicine.objects.get', db_time['seconds'], size, 'lookup')
+    with override_settings(OBJECT_CACHE_LOCAL_SIZE=0):
+        with timed() as shared_time:
+            for pk in pks:
+                Medicine.objects.get_cached(pk)
+    report.timing('get_cached, shared cache only', shared_time['seconds'], size, 'lookup')
+    with timed() as local_time:
+        for pk in pks:
+            Medicine.objects.get_cached(pk)
+    report.timing('get_cached, both tiers', local_time['seconds'], size, 'lookup')
+    report.line(f'hit ratio {object_cache.hit_ratio():.1%}')
+
+
+@benchmark(default_size=2000)
+def bulk_writes(report, size):
+    """Creating, updating and deleting ``size`` doctors one request each vs one bulk request."""
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+
+    from .models import Doctor
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='bench', password='x', is_staff=True))
+    items = [{'name': f'Doctor {i}', 'specialty': 'Ayurveda'} for i in range(size)]
+
+    with timed() as create_time:
+        pks = [client.post('/api/doctors/', item, format='json').data['id'] for item in items]
+    report.timing('POST /api/doctors/ per item', create_time['seconds'], size, 'item')
+    with timed() as update_time:
+        for pk in pks:
+            client.patch(f'/api/doctors/{pk}/', {'is_available': False}, format='json')
+    report.timing('PATCH /api/doctors/<id>/ per item', update_time['seconds'], size, 'item')
+    with timed() as delete_time:
+        for pk in pks:
+            client.delete(f'/api/doctors/{pk}/')
+    report.timing('DELETE /api/doctors/<id>/ per item', delete_time['seconds'], size, 'item')
+
+    with timed() as create_time:
+        pks = [result['id'] for result in client.post('/api/doctors/bulk/', items, format='json').data['results']]
+    report.timing('POST /api/doctors/bulk/', create_time['seconds'], size, 'item')
+    with timed() as update_time:
+        client.patch('/api/doctors/bulk/', [{'id': pk, 'is_available': False} for pk in pks], format='json')
+    report.timing('PATCH /api/doctors/bulk/', update_time['seconds'], size, 'item')
+    with timed() as delete_time:
+        client.delete('/api/doctors/bulk/', pks, format='json')
+    report.timing('DELETE /api/doctors/bulk/', delete_time['seconds'], size, 'item')
+    report.line(f'{Doctor.objects.count()} doctors left')
@@ -0,0 +1,255 @@
+"""
+Host-wide shared cache backend on a SQLite database in WAL mode.
+
+LocMemCache gives every gunicorn worker its own private copy, so rate limit
+counters, OTP state and token lookups disagree between workers and start
+cold after every restart. This backend keeps entries in one SQLite file that
+every worker on the host opens: WAL mode lets readers run alongside the
+single writer, the file is memory-mapped, and it survives restarts.
+
+- incr/decr and add are single atomic statements (UPDATE ... RETURNING and
+  INSERT ... ON CONFLICT DO UPDATE ... WHERE expired), so counters are
+  exact across processes.
+- Integers are stored as SQLite integers, everything else is pickled.
+- Expired entries are dropped lazily on read and by a background thread
+  every EVICTION_INTERVAL seconds, which also trims the least recently used
+  entries once the table holds more than MAX_ENTRIES.
+
+Configuration:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'App.cache_backends.SQLiteCache',
+            'LOCATION': '/var/cache/pharmacy/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'EVICTION_INTERVAL': 30},
+        }
+    }
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+# Recording every read as a write would serialise readers on the WAL write
+# lock, so the LRU clock only advances when it is this many seconds stale.
+ACCESS_RESOLUTION = 1.0
+
+# Also trim the table from the writing process after this many sets, so a
+# burst of writes cannot outrun the background thread by much.
+CULL_EVERY = 1000
+
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._eviction_interval = options.get('EVICTION_INTERVAL', 60)
+        self._mmap_size = options.get('MMAP_SIZE', 64 * 1024 * 1024)
+        self._local = threading.local()
+        self._evictor_pid = None
+        self._sets = 0
+
+    # ========== Connections ==========
+    def _connection(self):
+        """One connection per thread and process; a forked worker opens its own."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._connect()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._start_evictor()
+        return connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: autocommit, explicit BEGIN where needed
+        connection = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(f'PRAGMA mmap_size={int(self._mmap_size)}')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _start_evictor(self):
+        if not self._eviction_interval or self._evictor_pid == os.getpid():
+            return
+        self._evictor_pid = os.getpid()
+        thread = threading.Thread(target=self._evict_forever, name='sqlite-cache-evictor', daemon=True)
+        thread.start()
+
+    def _evict_forever(self):
+        while True:
+            time.sleep(self._eviction_interval)
+            try:
+                self.evict()
+            except sqlite3.Error:
+                # Busy or locked; the next round will catch up.
+                pass
+
+    # ========== Values ==========
+    def _encode(self, value):
+        # bool is an int subclass but has to come back as a bool
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _decode(self, value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    # ========== Cache API ==========
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?', (key,),
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            connection.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now))
+            return default
+        if now - accessed > ACCESS_RESOLUTION:
+            connection.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self._decode(value)
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND {NOT_EXPIRED}',
+            (*key_map, now),
+        ).fetchall()
+        return {key_map[key]: self._decode(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            (key, self._encode(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        self._count_set()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)', rows,
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._count_set(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, self._encode(value), self.get_backend_timeout(timeout), now, now),
+        )
+        added = cursor.rowcount == 1
+        if added:
+            self._count_set()
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._connection().execute(
+            f'UPDATE cache SET value = value + ?, accessed = ? '
+            f"WHERE key = ? AND typeof(value) = 'integer' AND {NOT_EXPIRED} RETURNING value",
+            (delta, now, key, now),
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            f'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND {NOT_EXPIRED}',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {NOT_EXPIRED}', (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ', '.join('?' * len(keys))
+            self._connection().execute(f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    # ========== Eviction ==========
+    def _count_set(self, count=1):
+        self._sets += count
+        if self._sets >= CULL_EVERY:
+            self._sets = 0
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used beyond MAX_ENTRIES."""
+        connection = self._connection()
+        connection.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        excess = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self._max_entries
+        if excess > 0:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,),
+            )
+
+    def close(self, **kwargs):
+        # Connections are reused across requests; Django calls close() at the
+        # end of every request, which must not throw them away.
+        pass
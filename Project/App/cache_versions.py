@@ -0,0 +1,64 @@
+"""
+Per-model version numbers for cache keys.
+
+A value cached from some tables is stored under a key that includes the
+current version of each of them. Every committed write to a table bumps its
+version, so entries computed from older data are simply never read again
+and expire on their own; nothing has to find and delete them.
+
+Bumps run on commit. A reader that computes after reading the new version
+therefore sees the write, and one that read the old version stores its
+result under a key nobody asks for any more.
+
+Versions live in the default cache without expiry. One that gets evicted
+restarts from the current time in nanoseconds rather than from 1, so it can
+never come back to a number an older entry was stored under.
+
+TrackedModel writes bump through ChangeLog.record; SaleRecord inserts
+through the post_save receiver bump_on_save, connected in AppConfig.ready().
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _key(model):
+    return f'model-version:{model._meta.label_lower}'
+
+
+def versions(models):
+    """Current version of each model in ``models``, with one cache read."""
+    keys = {model: _key(model) for model in models}
+    found = cache.get_many(list(keys.values()))
+    for key in set(keys.values()) - set(found):
+        # add() so that a concurrent bump is not overwritten
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key, 0)
+    return {model: found[key] for model, key in keys.items()}
+
+
+def versioned_key(prefix, models, current):
+    """Cache key for a value computed from ``models`` at versions ``current``."""
+    return f"{prefix}:{'.'.join(str(current[model]) for model in models)}"
+
+
+def bump(model):
+    """Invalidate every cached value computed from ``model``."""
+    key = _key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted: any number no entry was stored under will do
+        cache.add(key, time.time_ns(), None)
+
+
+def bump_on_commit(model, using=None):
+    """bump() once the current transaction on ``using`` commits."""
+    transaction.on_commit(lambda: bump(model), using=using)
+
+
+def bump_on_save(sender, using, **kwargs):
+    """post_save receiver for untracked models that cached values depend on."""
+    bump_on_commit(sender, using)
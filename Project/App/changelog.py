@@ -0,0 +1,136 @@
+"""
+Incremental sync of tracked tables from the ChangeLog.
+
+Every create, update and delete of a TrackedModel (App/models.py) appends a
+ChangeLog row in the writing transaction. changes_since(after) turns the
+rows past a client's cursor into compacted deltas: each changed object
+appears once, as its current serialized row, or as a deleted id if it no
+longer exists. Deltas are state, not history, so applying one twice is
+harmless.
+
+Sequence numbers are handed out at insert, not at commit, so a row with a
+lower seq can become visible after a higher one. The cursor returned to the
+client therefore only moves past a gap in ``seq`` once the rows after it
+have settled (CHANGE_LOG_SETTLE_SECONDS); everything past the cursor is
+sent again next time. Gaps come from rolled back transactions and from
+compaction.
+
+compact_changes keeps the log small: entries older than a few minutes are
+collapsed to the latest one per object, and entries older than the
+retention period are dropped. A client whose cursor is older than the
+dropped range gets ``reset`` and reloads the full lists.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Appointment, ChangeLog, ChangeLogHorizon, Customer, Doctor, Medicine
+
+# Response key, model and serializer (in App.serializers) for every tracked
+# table. Serializers are looked up when used: AppConfig.ready() imports this
+# module, and loading DRF's serializers there would slow down every
+# django.setup(), management commands included.
+FEEDS = {
+    'medicines': (Medicine, 'MedicineSerializer'),
+    'doctors': (Doctor, 'DoctorSerializer'),
+    'appointments': (Appointment, 'AppointmentSerializer'),
+    'customers': (Customer, 'CustomerSerializer'),
+}
+PAGE_SIZE = 1000
+
+
+def log_delete(sender, instance, using, origin=None, **kwargs):
+    """post_delete receiver for TrackedModels; runs inside the delete's transaction."""
+    ChangeLog.record_delete(sender, instance.pk, using)
+
+
+def head():
+    """Cursor a client starting from a full load should sync from."""
+    return max(ChangeLog.objects.aggregate(seq=Max('seq'))['seq'] or 0, _horizon())
+
+
+def _horizon():
+    return ChangeLogHorizon.objects.values_list('seq', flat=True).first() or 0
+
+
+def changes_since(after, feeds=None, request=None, limit=PAGE_SIZE, now=None):
+    """
+    Compacted deltas for the changes with seq > ``after``.
+
+    Returns:
+        dict: { 'seq': int cursor to pass as ``after`` next time,
+        'reset': bool, 'more': bool, 'changes': { feed: {'upserted':
+        [row, ...], 'deleted': [id, ...]} } }. With ``reset`` the client's
+        cursor predates the retained log: it must reload everything and
+        continue from ``seq``.
+    """
+    from . import serializers
+
+    feeds = feeds or list(FEEDS)
+    if after < _horizon():
+        return {'seq': head(), 'reset': True, 'more': False, 'changes': {}}
+
+    settled = (now or timezone.now()) - timedelta(seconds=settings.CHANGE_LOG_SETTLE_SECONDS)
+    entries = ChangeLog.objects.filter(seq__gt=after).order_by('seq')
+    entries = list(entries.values_list('seq', 'model', 'object_id', 'created_at')[:limit])
+    cursor = after
+    for seq, _, _, created_at in entries:
+        if seq != cursor + 1 and created_at > settled:
+            break  # A lower seq may still commit
+        cursor = seq
+
+    labels = {FEEDS[feed][0]._meta.label_lower: feed for feed in feeds}
+    changed = {feed: set() for feed in feeds}
+    for _, label, object_id, _ in entries:
+        if label in labels:
+            changed[labels[label]].add(object_id)
+
+    changes = {}
+    for feed, object_ids in changed.items():
+        if not object_ids:
+            continue
+        model, serializer = FEEDS[feed]
+        serializer = getattr(serializers, serializer)
+        pk = model._meta.pk
+        rows = model.objects.filter(pk__in=[pk.to_python(object_id) for object_id in object_ids])
+        upserted = serializer(rows, many=True, context={'request': request}).data
+        present = {str(row['id']) for row in upserted}
+        changes[feed] = {
+            'upserted': upserted,
+            'deleted': sorted((pk.to_python(i) for i in object_ids - present), key=str),
+        }
+    return {'seq': cursor, 'reset': False, 'more': len(entries) == limit, 'changes': changes}
+
+
+def compact_changes(collapse_after=None, retention=None, now=None):
+    """
+    Collapse entries older than ``collapse_after`` to the latest per object
+    and drop entries older than ``retention``.
+
+    Returns:
+        dict: { 'collapsed': int, 'dropped': int }
+    """
+    now = now or timezone.now()
+    collapse_after = collapse_after or timedelta(seconds=settings.CHANGE_LOG_COLLAPSE_SECONDS)
+    retention = retention or timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+
+    with transaction.atomic():
+        old = ChangeLog.objects.filter(created_at__lt=now - collapse_after)
+        latest = old.values('model', 'object_id').annotate(seq=Max('seq')).values('seq')
+        collapsed, _ = old.exclude(seq__in=latest).delete()
+
+    with transaction.atomic():
+        horizon, _ = ChangeLogHorizon.objects.select_for_update().get_or_create(pk=1)
+        dropped_through = ChangeLog.objects.filter(
+            created_at__lt=now - retention,
+        ).aggregate(seq=Max('seq'))['seq']
+        dropped = 0
+        if dropped_through:
+            dropped, _ = ChangeLog.objects.filter(seq__lte=dropped_through).delete()
+            horizon.seq = max(horizon.seq, dropped_through)
+            horizon.save(update_fields=['seq', 'updated_at'])
+    return {'collapsed': collapsed, 'dropped': dropped}
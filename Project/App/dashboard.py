@@ -0,0 +1,166 @@
+"""
+Summary for the admin dashboard behind /api/dashboard/summary/.
+
+Counts, low-stock medicines, today's appointments per doctor and the latest
+sales, each computed with one or two aggregate queries instead of the
+browser fetching every list to count it.
+
+Each section is cached under the versions of the models it reads
+(App/cache_versions.py), so a write to a medicine recomputes the sections
+that read medicines on the next request and leaves the others cached. Reads
+go to the primary: a lagging replica would fill a new version's entry with
+data from before the write.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_versions import versioned_key, versions
+from .instrumentation import metrics
+from .models import Appointment, Customer, Doctor, Medicine, SaleRecord
+
+LOW_STOCK_LIMIT = 20
+RECENT_SALES_LIMIT = 10
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _threshold():
+    """Each medicine's low-stock threshold, falling back to the default."""
+    return Coalesce('low_stock_threshold', Value(settings.LOW_STOCK_THRESHOLD))
+
+
+# ========== Sections ==========
+def _medicine_counts(day):
+    return Medicine.objects.aggregate(
+        total=Count('id'),
+        low_stock=Count('id', filter=Q(stock_quantity__lte=_threshold())),
+        out_of_stock=Count('id', filter=Q(stock_quantity__lte=0)),
+    )
+
+
+def _doctor_counts(day):
+    return Doctor.objects.aggregate(total=Count('id'), available=Count('id', filter=Q(is_available=True)))
+
+
+def _appointment_counts(day):
+    start, _ = _day_bounds(day)
+    return Appointment.objects.aggregate(
+        total=Count('id'),
+        upcoming=Count('id', filter=Q(date__gte=start)),
+        unverified=Count('id', filter=Q(date__gte=start, is_verified=False)),
+    )
+
+
+def _customer_counts(day):
+    return Customer.objects.aggregate(total=Count('id'))
+
+
+def _low_stock(day):
+    items = Medicine.objects.annotate(threshold=_threshold()).filter(
+        stock_quantity__lte=F('threshold'),
+    ).order_by('stock_quantity', 'id')
+    return {
+        'threshold': settings.LOW_STOCK_THRESHOLD,
+        'items': list(items.values('id', 'name', 'stock_quantity', 'threshold')[:LOW_STOCK_LIMIT]),
+    }
+
+
+def _appointments_today(day):
+    start, end = _day_bounds(day)
+    rows = Appointment.objects.filter(date__gte=start, date__lt=end).values(
+        'doctor_id', 'doctor__name', 'doctor__specialty',
+    ).annotate(
+        appointments=Count('id'), verified=Count('id', filter=Q(is_verified=True)),
+    ).order_by('doctor__name', 'doctor_id')
+    return [
+        {
+            'doctor_id': row['doctor_id'], 'doctor': row['doctor__name'],
+            'specialty': row['doctor__specialty'], 'appointments': row['appointments'],
+            'verified': row['verified'],
+        }
+        for row in rows
+    ]
+
+
+def _recent_sales(day):
+    start, _ = _day_bounds(day)
+    today = SaleRecord.objects.filter(timestamp__gte=start).aggregate(
+        sales=Count('id'), quantity=Sum('quantity_sold'),
+    )
+    latest = SaleRecord.objects.order_by('-timestamp', '-id').values(
+        'id', 'medicine_id', 'medicine__name', 'quantity_sold', 'timestamp',
+    )[:RECENT_SALES_LIMIT]
+    return {
+        'today': {'sales': today['sales'], 'quantity': today['quantity'] or 0},
+        'latest': [
+            {
+                'id': row['id'], 'medicine_id': row['medicine_id'], 'medicine': row['medicine__name'],
+                'quantity_sold': row['quantity_sold'], 'timestamp': row['timestamp'],
+            }
+            for row in latest
+        ],
+    }
+
+
+# Response key, or (key, subkey): (models the section reads, function
+# computing it for a day). Counts are cached per model so that a write to
+# one table leaves the others' counts cached.
+SECTIONS = {
+    ('counts', 'medicines'): ((Medicine,), _medicine_counts),
+    ('counts', 'doctors'): ((Doctor,), _doctor_counts),
+    ('counts', 'appointments'): ((Appointment,), _appointment_counts),
+    ('counts', 'customers'): ((Customer,), _customer_counts),
+    'low_stock': ((Medicine,), _low_stock),
+    'appointments_today': ((Doctor, Appointment), _appointments_today),
+    'recent_sales': ((Medicine, SaleRecord), _recent_sales),
+}
+
+
+def _section_name(section):
+    return '.'.join(section) if isinstance(section, tuple) else section
+
+
+def dashboard_summary(now=None):
+    """
+    Every dashboard section, from the cache where the models it reads have
+    not changed since it was computed.
+
+    Returns:
+        dict: { 'date': 'YYYY-MM-DD', 'counts': {...}, 'low_stock':
+        {'threshold', 'items'}, 'appointments_today': [per doctor, ...],
+        'recent_sales': {'today', 'latest'} }
+    """
+    day = timezone.localdate(now or timezone.now())
+    current = versions({model for models, _ in SECTIONS.values() for model in models})
+    keys = {
+        section: versioned_key(f'dashboard:{_section_name(section)}:{day.isoformat()}', models, current)
+        for section, (models, _) in SECTIONS.items()
+    }
+    cached = cache.get_many(list(keys.values()))
+
+    summary = {'date': day.isoformat()}
+    computed = {}
+    for section, (_, compute) in SECTIONS.items():
+        key = keys[section]
+        if key in cached:
+            value = cached[key]
+            metrics.increment('dashboard.cache_hit')
+        else:
+            value = computed[key] = compute(day)
+            metrics.increment('dashboard.cache_miss')
+        if isinstance(section, tuple):
+            summary.setdefault(section[0], {})[section[1]] = value
+        else:
+            summary[section] = value
+    if computed:
+        cache.set_many(computed, settings.DASHBOARD_CACHE_SECONDS)
+    return summary
@@ -0,0 +1,38 @@
+"""
+Django's PostgreSQL backend with connection pool timings.
+
+Identical to django.db.backends.postgresql except that, when OPTIONS['pool']
+is set, it times how long each checkout waited for the pool and how long
+the connection was held; see App/db_pool.py.
+"""
+
+import time
+
+from django.db.backends.postgresql import base
+
+from App.instrumentation import metrics
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _checked_out_at = None
+
+    def get_new_connection(self, conn_params):
+        if not self.pool:
+            return super().get_new_connection(conn_params)
+        from psycopg_pool import PoolTimeout
+
+        started = time.perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except PoolTimeout:
+            metrics.increment('db.pool.timeout')
+            raise
+        self._checked_out_at = time.perf_counter()
+        metrics.observe('db.pool.wait', self._checked_out_at - started)
+        return connection
+
+    def _close(self):
+        if self.pool and self.connection is not None and self._checked_out_at is not None:
+            metrics.observe('db.pool.held', time.perf_counter() - self._checked_out_at)
+            self._checked_out_at = None
+        return super()._close()
@@ -0,0 +1,39 @@
+"""
+Connection pool metrics for PostgreSQL.
+
+Production uses psycopg's native pool through the ``pool`` entry of the
+database OPTIONS (see settings_production.py) together with the
+App.db_backends.postgresql engine, which records:
+
+db.pool.wait
+    Time a request waited for pool.getconn(), the number to watch when the
+    pool is too small.
+db.pool.held
+    Time a connection stayed checked out before going back to the pool.
+db.pool.timeout
+    Requests that gave up waiting for a connection.
+
+With CONN_HEALTH_CHECKS on, Django has the pool pre-ping every connection
+as it is handed out (the time is part of db.pool.wait). The pool's own
+counters (size, available, queued, errors, connections_lost from failed
+pre-pings) are exposed as the ``db.pool`` gauge by register_pool_gauges.
+"""
+
+from .instrumentation import metrics
+
+
+def pool_stats():
+    """psycopg pool statistics for every pooled database alias."""
+    from django.db import connections
+
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        if connection.settings_dict.get('OPTIONS', {}).get('pool'):
+            pool = connection.pool
+            stats[alias] = pool.get_stats() if pool is not None else {}
+    return stats
+
+
+def register_pool_gauges():
+    metrics.gauge('db.pool', pool_stats)
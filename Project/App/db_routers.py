@@ -0,0 +1,115 @@
+"""
+Primary/replica routing for catalog and reporting reads.
+
+Writes, and every read not explicitly marked, go to ``default`` (the
+primary). Reads made inside a view marked with @replica_reads, or a viewset
+action listed in ReplicaReadMixin.replica_actions, go to one of the aliases
+in settings.DATABASE_REPLICAS.
+
+A client that has just written is pinned to the primary for
+settings.REPLICA_PIN_SECONDS, so it never reads its own write back stale
+from a lagging replica. ReplicaPinMiddleware (App/middleware.py) sets the
+pin after any unsafe request: a cookie for browsers, plus a cache entry
+keyed by the auth token for API clients that drop cookies.
+
+With DATABASE_REPLICAS empty everything reads from the primary, which is
+what tests and a single-database deployment get.
+"""
+
+import functools
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_COOKIE = 'db_pin'
+
+reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def choose_replica():
+    replicas = settings.DATABASE_REPLICAS
+    return random.choice(replicas) if replicas else None
+
+
+class PrimaryReplicaRouter:
+    """Send marked reads to a replica; everything else uses the default rules."""
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica.get():
+            return choose_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+# ========== Pinning ==========
+def _token_pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not authorization:
+        return None
+    return 'db-pin:' + hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+
+def is_pinned(request):
+    """True if this client wrote recently and must read from the primary."""
+    pinned_until = request.COOKIES.get(PIN_COOKIE, '')
+    if pinned_until.isdigit() and int(pinned_until) > time.time():
+        return True
+    key = _token_pin_key(request)
+    return bool(key and cache.get(key))
+
+
+def pin(request, response):
+    """Pin the client behind ``request`` to the primary for REPLICA_PIN_SECONDS."""
+    seconds = settings.REPLICA_PIN_SECONDS
+    response.set_cookie(
+        PIN_COOKIE, str(int(time.time()) + seconds), max_age=seconds, httponly=True, samesite='Lax',
+    )
+    key = _token_pin_key(request)
+    if key:
+        cache.set(key, 1, seconds)
+
+
+# ========== Marking reads ==========
+def _run_on_replica(request, func, *args, **kwargs):
+    if is_pinned(request):
+        return func(*args, **kwargs)
+    token = reading_from_replica.set(True)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        reading_from_replica.reset(token)
+
+
+def replica_reads(view):
+    """Let a function view read from a replica unless the client is pinned."""
+
+    @functools.wraps(view)
+    def wrapped(request, *args, **kwargs):
+        return _run_on_replica(request, view, request, *args, **kwargs)
+
+    return wrapped
+
+
+class ReplicaReadMixin:
+    """Run the viewset actions in ``replica_actions`` against a replica."""
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if getattr(self, 'action', None) not in self.replica_actions:
+            return
+        method = request.method.lower()
+        handler = getattr(self, method, None)
+        if handler is not None:
+            setattr(self, method, functools.partial(_run_on_replica, request, handler))
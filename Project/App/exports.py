@@ -0,0 +1,142 @@
+"""
+Streaming CSV and JSON Lines exports of appointments, sales and the catalog.
+
+Exporting through the viewsets loaded the whole table, serialized it and
+built one response body. Here rows come off a server-side cursor
+(``.iterator(chunk_size=...)``) and are encoded and sent in chunks of about
+FLUSH_BYTES as they arrive, optionally through gzip, so memory stays flat at
+any table size and the header line goes out before the first query runs.
+
+Sales include archived months (App/archive.py), streamed one file at a time.
+"""
+
+import csv
+import io
+import itertools
+import json
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Appointment, Medicine
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 2000  # rows per fetch from the server-side cursor
+FLUSH_BYTES = 64 * 1024
+
+
+class ExportError(Exception):
+    """Invalid export request. The message is user facing."""
+
+
+# ========== Datasets ==========
+# Each returns (columns, rows) where rows is a lazy iterator of tuples. The
+# queries only run once the response body is iterated.
+def _appointments(using, start, end, ids):
+    rows = Appointment.objects.using(using).order_by('date', 'id')
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lt=end)
+    if ids:
+        rows = rows.filter(doctor_id__in=ids)
+    columns = ('id', 'doctor_id', 'doctor__name', 'customer_name', 'phone_number', 'date', 'is_verified', 'created_at')
+    return (
+        ('id', 'doctor_id', 'doctor', 'customer_name', 'phone_number', 'date', 'is_verified', 'created_at'),
+        rows.values_list(*columns).iterator(chunk_size=CHUNK_SIZE),
+    )
+
+
+def _sales(using, start, end, ids):
+    # NumPy (for the archive files) is only loaded by the exports that need it
+    from .archive import iter_sales
+
+    def rows():
+        # Archived sales only keep the medicine id. The catalog is far
+        # smaller than the sales, so its names are looked up in memory.
+        names = dict(Medicine.objects.using(using).values_list('id', 'name').iterator(chunk_size=CHUNK_SIZE))
+        for pk, medicine_id, quantity, timestamp in iter_sales(start, end, ids, using, CHUNK_SIZE):
+            yield pk, medicine_id, names.get(medicine_id, ''), quantity, timestamp
+
+    return ('id', 'medicine_id', 'medicine', 'quantity_sold', 'timestamp'), rows()
+
+
+def _catalog(using, start, end, ids):
+    if start or end:
+        raise ExportError("The catalog has no dates; drop 'from' and 'to'")
+    rows = Medicine.objects.using(using).order_by('id')
+    if ids:
+        rows = rows.filter(id__in=ids)
+    columns = ('id', 'name', 'description', 'stock_quantity', 'price')
+    return columns, rows.values_list(*columns).iterator(chunk_size=CHUNK_SIZE)
+
+
+DATASETS = {
+    'appointments': _appointments,
+    'sales': _sales,
+    'catalog': _catalog,
+}
+
+
+# ========== Encoding ==========
+def _cell(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return value
+
+
+def _csv_lines(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in itertools.chain([columns], ([_cell(value) for value in row] for row in rows)):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _jsonl_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_cell, row))), cls=DjangoJSONEncoder) + '\n'
+
+
+def _chunks(lines, compress):
+    """Group encoded lines into ~FLUSH_BYTES chunks; the first line goes out alone."""
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data):
+        if gzip is None:
+            return data
+        # A sync flush makes every chunk decodable as soon as it arrives.
+        return gzip.compress(data) + gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    pending, size, first = [], 0, True
+    for line in lines:
+        data = line.encode()
+        pending.append(data)
+        size += len(data)
+        if first or size >= FLUSH_BYTES:
+            yield emit(b''.join(pending))
+            pending, size, first = [], 0, False
+    if pending:
+        yield emit(b''.join(pending))
+    if gzip is not None:
+        yield gzip.flush()
+
+
+def export_stream(dataset, fmt, start=None, end=None, ids=None, using=None, compress=False):
+    """
+    Encoded chunks of ``dataset`` as ``fmt`` ('csv' or 'jsonl').
+
+    ``ids`` filters appointments by doctor, sales by medicine and the
+    catalog by medicine. Raises ExportError for an unknown dataset or format.
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f'dataset must be one of {", ".join(DATASETS)}')
+    if fmt not in FORMATS:
+        raise ExportError(f'format must be one of {", ".join(FORMATS)}')
+    columns, rows = DATASETS[dataset](using, start, end, ids)
+    lines = _csv_lines(columns, rows) if fmt == 'csv' else _jsonl_lines(columns, rows)
+    return _chunks(lines, compress)
@@ -0,0 +1,209 @@
+"""
+Demand forecasting and reorder points for the whole catalog at once.
+
+Daily sales come from the DailySales rollup, plus the raw sales above its
+watermark, into one NumPy matrix with a row per medicine and a column per
+day (oldest first). The last column is yesterday: today is not over, and
+counting its partial sales as a full day would bias demand low. Demand, its spread, safety
+stock and reorder point are then computed for every medicine in a handful of
+array operations instead of a Python loop per medicine.
+
+Demand per day is either a simple moving average over the last ``window``
+days ('sma') or an exponentially weighted average over the whole history
+('ewma', weight ``alpha`` on the most recent day). With a lead time of L
+days and service level p:
+
+    safety stock  = z(p) * sigma * sqrt(L)
+    reorder point = demand * L + safety stock
+
+and a medicine needs reordering once its stock is at or below its reorder
+point. The suggested order brings stock up to the reorder point plus
+``cover_days`` of demand.
+"""
+
+import math
+from datetime import datetime, time, timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .analytics import rolled_up_through
+from .models import DailySales, Medicine, SaleRecord
+
+METHODS = ('sma', 'ewma')
+
+DEFAULTS = {
+    'method': 'ewma',
+    'history_days': 90,
+    'window': 28,
+    'alpha': 0.1,
+    'lead_time_days': 7,
+    'service_level': 0.95,
+    'cover_days': 14,
+}
+# Upper bounds: the demand matrix is medicines x history_days floats.
+MAX_HISTORY_DAYS = 730
+MAX_LIMIT = 10000
+
+
+class ForecastError(Exception):
+    """Invalid forecast parameters. The message is user facing."""
+
+
+def load_demand(days, end=None):
+    """
+    Daily quantities sold for every medicine over the ``days`` days up to
+    ``end``, yesterday by default.
+
+    Returns:
+        (ids, stock, matrix): medicine ids in ascending order, their current
+        stock, and a float matrix of shape (len(ids), days), oldest day first.
+        Days without sales are zero.
+    """
+    end = end or timezone.localdate() - timedelta(days=1)
+    start = end - timedelta(days=days - 1)
+
+    catalog = np.array(Medicine.objects.order_by('id').values_list('id', 'stock_quantity'), dtype=np.int64)
+    catalog = catalog.reshape(-1, 2)
+    ids, stock = catalog[:, 0], catalog[:, 1]
+
+    # As in analytics.sales_series: retry if the rollup job moved the
+    # watermark between the reads, or the tail would double count.
+    for _ in range(3):
+        watermark = rolled_up_through()
+        rolled_up = list(DailySales.objects.filter(day__gte=start, day__lte=end).order_by().values_list(
+            'medicine_id', 'day', 'quantity',
+        ).iterator(chunk_size=20000))
+        if rolled_up_through() == watermark:
+            break
+    # Sales not rolled up yet: the tail of SaleRecord above the watermark
+    tail = SaleRecord.objects.filter(
+        id__gt=watermark,
+        timestamp__gte=timezone.make_aware(datetime.combine(start, time.min)),
+        timestamp__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    ).annotate(day=TruncDate('timestamp')).order_by().values_list('medicine_id', 'day').annotate(
+        quantity=Sum('quantity_sold'),
+    )
+
+    medicine_ids, day_numbers, quantities = [], [], []
+    for medicine_id, day, quantity in [*rolled_up, *tail]:
+        medicine_ids.append(medicine_id)
+        day_numbers.append(day.toordinal())
+        quantities.append(quantity)
+
+    matrix = np.zeros((len(ids), days))
+    if quantities and len(ids):
+        medicine_ids = np.array(medicine_ids, dtype=np.int64)
+        rows = np.searchsorted(ids, medicine_ids).clip(max=len(ids) - 1)
+        # The reads are not one snapshot: sales of a medicine created after
+        # the catalog read have no row, and are left to the next report.
+        known = ids[rows] == medicine_ids
+        columns = np.array(day_numbers, dtype=np.int64) - start.toordinal()
+        # add.at, as a day can have both a rollup row and tail sales
+        np.add.at(matrix, (rows[known], columns[known]), np.array(quantities)[known])
+    return ids, stock, matrix
+
+
+def demand_estimate(matrix, method='ewma', window=28, alpha=0.1):
+    """Per-row (mean daily demand, standard deviation) for a demand matrix."""
+    if method == 'sma':
+        recent = matrix[:, -window:]
+        return recent.mean(axis=1), recent.std(axis=1)
+    if method == 'ewma':
+        days = matrix.shape[1]
+        # Weight alpha * (1 - alpha)^k for the day k days ago, normalised so
+        # a short history is not biased towards zero.
+        weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1)
+        weights /= weights.sum()
+        mean = matrix @ weights
+        variance = ((matrix - mean[:, None]) ** 2) @ weights
+        return mean, np.sqrt(variance)
+    raise ForecastError(f'method must be one of {", ".join(METHODS)}')
+
+
+def reorder_points(matrix, stock, method='ewma', window=28, alpha=0.1,
+                   lead_time_days=7, service_level=0.95, cover_days=14):
+    """
+    Safety stock, reorder point and suggested order for every row of ``matrix``.
+
+    Returns:
+        dict of arrays: demand, sigma, safety_stock, reorder_point,
+        days_of_cover (inf when there is no demand), needs_reorder and
+        order_quantity (whole units).
+    """
+    if not 0 < service_level < 1:
+        raise ForecastError('service_level must be between 0 and 1')
+    if lead_time_days <= 0 or window <= 0 or not 0 < alpha <= 1:
+        raise ForecastError('lead_time_days and window must be positive and alpha in (0, 1]')
+
+    demand, sigma = demand_estimate(matrix, method, window, alpha)
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * sigma * math.sqrt(lead_time_days)
+    reorder_point = demand * lead_time_days + safety_stock
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(demand > 0, stock / demand, np.inf)
+    needs_reorder = (stock <= reorder_point) & (demand > 0)
+    order_quantity = np.where(
+        needs_reorder, np.ceil(reorder_point + demand * cover_days - stock), 0,
+    ).astype(np.int64)
+    return {
+        'demand': demand,
+        'sigma': sigma,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'days_of_cover': days_of_cover,
+        'needs_reorder': needs_reorder,
+        'order_quantity': order_quantity,
+    }
+
+
+def reorder_plan(limit=None, include_all=False, **parameters):
+    """
+    Load the catalog's history and compute its reorder points in one pass.
+
+    Returns:
+        dict: { 'parameters': dict, 'count': int, 'results': [dict, ...] }
+        where results are the medicines needing a reorder (every medicine
+        with ``include_all``), least days of cover first.
+    """
+    unknown = set(parameters) - set(DEFAULTS)
+    if unknown:
+        raise ForecastError(f'Unknown parameter(s): {", ".join(sorted(unknown))}')
+    parameters = {**DEFAULTS, **parameters}
+    if not 0 < parameters['history_days'] <= MAX_HISTORY_DAYS:
+        raise ForecastError(f'history_days must be between 1 and {MAX_HISTORY_DAYS}')
+    if not 0 < parameters['window'] <= MAX_HISTORY_DAYS:
+        raise ForecastError(f'window must be between 1 and {MAX_HISTORY_DAYS}')
+    if limit is not None and not 0 < limit <= MAX_LIMIT:
+        raise ForecastError(f'limit must be between 1 and {MAX_LIMIT}')
+
+    ids, stock, matrix = load_demand(parameters['history_days'])
+    plan = reorder_points(matrix, stock, **{k: v for k, v in parameters.items() if k != 'history_days'})
+
+    selected = np.arange(len(ids)) if include_all else np.flatnonzero(plan['needs_reorder'])
+    selected = selected[np.argsort(plan['days_of_cover'][selected], kind='stable')]
+    count = len(selected)
+    if limit is not None:
+        selected = selected[:limit]
+
+    names = dict(Medicine.objects.filter(id__in=ids[selected].tolist()).values_list('id', 'name'))
+    results = [
+        {
+            'medicine': int(ids[i]),
+            'name': names.get(int(ids[i]), ''),
+            'stock': int(stock[i]),
+            'daily_demand': round(float(plan['demand'][i]), 3),
+            'safety_stock': round(float(plan['safety_stock'][i]), 1),
+            'reorder_point': round(float(plan['reorder_point'][i]), 1),
+            'days_of_cover': (
+                round(float(plan['days_of_cover'][i]), 1) if np.isfinite(plan['days_of_cover'][i]) else None
+            ),
+            'needs_reorder': bool(plan['needs_reorder'][i]),
+            'order_quantity': int(plan['order_quantity'][i]),
+        }
+        for i in selected
+    ]
+    return {'parameters': parameters, 'count': count, 'results': results}
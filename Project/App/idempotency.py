@@ -0,0 +1,177 @@
+"""
+Idempotency-Key support for POST endpoints that clients retry.
+
+A client that sends an ``Idempotency-Key`` header gets the response of the
+first request with that key on every retry, replayed byte for byte with an
+``Idempotent-Replayed: true`` header, instead of the view running again
+(and booking twice or sending another paid SMS).
+
+Responses live in the default cache, which is shared between workers when
+it is the SQLite cache (App/cache_backends.py), for IDEMPOTENCY_TTL seconds.
+While the first request runs it holds a lock entry. A duplicate arriving
+meanwhile gets a 409 with Retry-After at once on a sync view, which would
+otherwise park a worker thread; on an async view it waits up to
+IDEMPOTENCY_WAIT_SECONDS for the result first. Only successful (2xx)
+responses are stored: a 400 such as "Failed to send OTP" after a transient
+Twilio error must not be replayed for a day, so retrying any other response
+runs the view again. Reusing a key with a different body is rejected with
+a 422.
+
+Decorate DRF function views above @api_view, so the response is final and
+rendered when it is stored::
+
+    @idempotent
+    @api_view(['POST'])
+    def send_otp(request): ...
+
+Native async views are supported too.
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+def _cache_keys(request, key):
+    """(response key, lock key) for an Idempotency-Key on this endpoint."""
+    digest = hashlib.sha256(f'{request.path}\n{key}'.encode()).hexdigest()
+    return f'idempotency:{digest}', f'idempotency-lock:{digest}'
+
+
+def _fingerprint(request):
+    return hashlib.sha256(request.method.encode() + b'\n' + request.body).hexdigest()
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _invalid(key):
+    if len(key) > MAX_KEY_LENGTH:
+        return _error(f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters', 400)
+    return None
+
+
+def _mismatch():
+    return _error('Idempotency-Key was already used for a different request', 422)
+
+
+def _in_progress():
+    response = _error('A request with this Idempotency-Key is still being processed', 409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _replay(entry, fingerprint):
+    if entry['fingerprint'] != fingerprint:
+        return _mismatch()
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for name, value in entry['headers']:
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _entry(response, fingerprint):
+    """What to store for ``response``, or None if a retry should run the view again."""
+    if response.streaming or not 200 <= response.status_code < 300:
+        return None
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return {
+        'fingerprint': fingerprint,
+        'status': response.status_code,
+        'headers': list(response.items()),
+        'content': response.content,
+    }
+
+
+def idempotent(view):
+    """Honour the Idempotency-Key header on ``view``."""
+    if inspect.iscoroutinefunction(view):
+        return _idempotent_async(view)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER, '').strip()
+        if not key:
+            return view(request, *args, **kwargs)
+        invalid = _invalid(key)
+        if invalid:
+            return invalid
+        response_key, lock_key = _cache_keys(request, key)
+        fingerprint = _fingerprint(request)
+
+        entry = cache.get(response_key)
+        if entry is not None:
+            return _replay(entry, fingerprint)
+        if not cache.add(lock_key, fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS):
+            # Another request with this key is running. Not waited for here:
+            # sleeping would hold a worker thread; the client retries.
+            entry = cache.get(response_key)
+            if entry is not None:
+                return _replay(entry, fingerprint)
+            holder = cache.get(lock_key)
+            if holder is not None and holder != fingerprint:
+                return _mismatch()
+            return _in_progress()
+
+        try:
+            response = view(request, *args, **kwargs)
+            entry = _entry(response, fingerprint)
+            if entry is not None:
+                cache.set(response_key, entry, settings.IDEMPOTENCY_TTL)
+        finally:
+            cache.delete(lock_key)
+        return response
+
+    return wrapper
+
+
+def _idempotent_async(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER, '').strip()
+        if not key:
+            return await view(request, *args, **kwargs)
+        invalid = _invalid(key)
+        if invalid:
+            return invalid
+        response_key, lock_key = _cache_keys(request, key)
+        fingerprint = _fingerprint(request)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            entry = await cache.aget(response_key)
+            if entry is not None:
+                return _replay(entry, fingerprint)
+            if await cache.aadd(lock_key, fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS):
+                break
+            holder = await cache.aget(lock_key)
+            if holder is not None and holder != fingerprint:
+                return _mismatch()
+            if time.monotonic() >= deadline:
+                return _in_progress()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            response = await view(request, *args, **kwargs)
+            entry = _entry(response, fingerprint)
+            if entry is not None:
+                await cache.aset(response_key, entry, settings.IDEMPOTENCY_TTL)
+        finally:
+            await cache.adelete(lock_key)
+        return response
+
+    return wrapper
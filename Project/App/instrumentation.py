@@ -0,0 +1,123 @@
+"""
+In-process counters and timings for the performance work.
+
+Code records what it wants to watch with ``metrics.increment(name)`` or
+``metrics.observe(name, seconds)``; staff read a snapshot at /api/metrics/.
+Each worker process keeps its own numbers, and they reset on restart.
+
+Timings keep count, total and max plus the most recent samples, from which
+the snapshot derives p50/p95/p99.
+
+Database transactions are timed here too: track_transactions is connected to
+connection_created, and every outermost transaction on every connection is
+observed as ``db.transaction_held`` (seconds from BEGIN to COMMIT/ROLLBACK),
+whoever opened it: ATOMIC_REQUESTS, a transaction policy or plain atomic().
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+
+# Recent samples kept per timing for the percentiles.
+SAMPLES = 1000
+
+
+class Timing:
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000 if ordered else 0
+
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0,
+            'max_ms': self.max * 1000,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = defaultdict(Timing)
+        self._gauges = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._timings[name].add(seconds)
+
+    def gauge(self, name, func):
+        """Register a callable whose current value is read at snapshot time."""
+        self._gauges[name] = func
+
+    def counter(self, name):
+        return self._counters.get(name, 0)
+
+    def timing(self, name):
+        with self._lock:
+            return self._timings[name].summary() if name in self._timings else None
+
+    def snapshot(self):
+        with self._lock:
+            data = {
+                'counters': dict(self._counters),
+                'timings': {name: timing.summary() for name, timing in self._timings.items()},
+            }
+        data['gauges'] = {name: func() for name, func in self._gauges.items()}
+        return data
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+metrics = Metrics()
+
+
+# ========== Transaction timing ==========
+def track_transactions(sender, connection, **kwargs):
+    """
+    connection_created receiver timing every outermost transaction.
+
+    Atomic turns autocommit off when it opens the outermost block and back on
+    once it has committed or rolled back, so the time between the two calls
+    is how long the transaction held its connection.
+    """
+    if getattr(connection, '_transaction_timing', False):
+        return
+    connection._transaction_timing = True
+    set_autocommit = connection.set_autocommit
+    started = [None]
+
+    def timed_set_autocommit(autocommit, *args, **kwargs):
+        if not autocommit:
+            started[0] = time.perf_counter()
+        elif started[0] is not None:
+            metrics.observe('db.transaction_held', time.perf_counter() - started[0])
+            started[0] = None
+        return set_autocommit(autocommit, *args, **kwargs)
+
+    connection.set_autocommit = timed_set_autocommit
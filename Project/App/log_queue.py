@@ -0,0 +1,104 @@
+"""
+Logging off the request path.
+
+Handlers that do I/O (the rotating log file, AdminEmailHandler's SMTP send)
+sit behind a BoundedQueueHandler in LOGGING (settings_production.py). A log
+call in a request thread only puts the record on a bounded queue; a
+QueueListener thread owns the real handlers and does the writing. A slow
+SMTP server therefore delays the mail, not the request that failed.
+
+When a queue is full the record is dropped, counted as
+``logging.dropped.<handler name>`` and never blocks the caller. The queue
+depth is a ``logging.queued.<handler name>`` gauge; both are at
+/api/metrics/.
+
+Configure it with dictConfig's QueueHandler support (Python 3.12 or
+later), naming the handlers the listener owns and a bounded queue::
+
+    'file_queue': {
+        'class': 'App.log_queue.BoundedQueueHandler',
+        'handlers': ['file'],
+        'queue': {'()': 'queue.Queue', 'maxsize': 10000},
+        'respect_handler_level': True,
+    },
+
+The listener thread starts with the first record in each process, so it
+also runs in workers forked after logging was configured.
+"""
+
+import atexit
+import copy
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+from .instrumentation import metrics
+
+# Seconds stop() waits for the listener to make room in a full queue.
+STOP_TIMEOUT = 5
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops and counts records when its queue is full, and
+    starts its listener on first use.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+        self.listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+
+    def prepare(self, record):
+        """
+        Freeze the message now, as the arguments may change once the call
+        returns, but leave exc_info and any ``request`` attribute in place:
+        the listener runs in this process and AdminEmailHandler reports both.
+        The traceback is formatted on the listener thread.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.increment(f'logging.dropped.{self.name}')
+
+    def _start_listener(self):
+        if self.listener is None or self._listener_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            # A thread started before a fork does not exist in the child.
+            self.listener._thread = None
+            self.listener.start()
+            self._listener_pid = os.getpid()
+        metrics.gauge(f'logging.queued.{self.name}', self.queue.qsize)
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write out what is queued and stop the listener thread."""
+        if self._listener_pid != os.getpid():
+            return
+        self._listener_pid = None
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while True:
+            try:
+                self.listener.stop()
+                return
+            except queue.Full:
+                # No room for the stop sentinel until the listener catches up
+                if time.monotonic() >= deadline:
+                    return  # The daemon thread dies with the process
+                time.sleep(0.01)
@@ -0,0 +1,40 @@
+"""
+Move closed months of SaleRecord into compressed files and delete them.
+
+Only sales already counted in the rollups are archived, so run rollup_sales
+first; sales above the rollup watermark wait for a later run. Safe to rerun:
+an interrupted run is finished by the next one.
+
+Usage:
+    python manage.py archive_sales
+    python manage.py archive_sales --keep-months 6 --batch-size 5000
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from App.archive import ArchiveError, archive_sales
+
+
+class Command(BaseCommand):
+    help = 'Archive closed months of sales to compressed files and delete them from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months', type=int, default=settings.SALES_ARCHIVE_KEEP_MONTHS,
+            help='Full months to keep in the database besides the current one',
+        )
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per DELETE')
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--keep-months must not be negative and --batch-size must be positive')
+        try:
+            result = archive_sales(keep_months=options['keep_months'], batch_size=options['batch_size'])
+        except ArchiveError as e:
+            raise CommandError(str(e))
+        for archive in result['archived']:
+            self.stdout.write(f'{archive.month:%Y-%m}: {archive.rows} sales -> {archive.filename}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {len(result['archived'])} file(s), deleted {result['deleted']} rows"
+        ))
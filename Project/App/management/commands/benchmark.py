@@ -0,0 +1,78 @@
+"""
+Run the micro-benchmarks registered in App/benchmarks.py.
+
+By default every benchmark runs against a throwaway test database (an
+on-disk SQLite file for SQLite, so worker threads can share it), created
+and destroyed the same way the test runner does.
+
+Usage:
+    python manage.py benchmark --list
+    python manage.py benchmark otp_views --size 500
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from App.benchmarks import BENCHMARKS, Report
+
+
+class Command(BaseCommand):
+    help = 'Run micro-benchmarks from App/benchmarks.py against a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+        parser.add_argument(
+            '--size', type=int, default=None,
+            help="Workload size, overriding each benchmark's default",
+        )
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help='Run against the configured databases instead of throwaway copies',
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, func in BENCHMARKS.items():
+                summary = (func.__doc__ or '').strip().split('\n')[0]
+                self.stdout.write(f'{name:<24} {summary}')
+            return
+
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f'Unknown benchmark(s): {", ".join(unknown)}. Try --list.')
+
+        # Test environment: the test client's host is allowed and mail stays in memory.
+        setup_test_environment()
+        old_config = None
+        if not options['use_existing_db']:
+            old_config = self.setup_databases()
+        try:
+            report = Report(self.stdout)
+            for name in names:
+                func = BENCHMARKS[name]
+                size = options['size'] or func.default_size
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{name} (size={size})'))
+                func(report, size)
+        finally:
+            if old_config is not None:
+                connections.close_all()
+                teardown_databases(old_config, verbosity=0)
+                shutil.rmtree(self.tmpdir, ignore_errors=True)
+            teardown_test_environment()
+
+    def setup_databases(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='benchmark-')
+        for alias in connections:
+            settings_dict = connections[alias].settings_dict
+            if settings_dict['ENGINE'] == 'django.db.backends.sqlite3':
+                settings_dict['TEST']['NAME'] = os.path.join(self.tmpdir, f'{alias}.sqlite3')
+        return setup_databases(verbosity=0, interactive=False)
@@ -0,0 +1,65 @@
+"""
+Bundle, minify and precompress the site's JavaScript and CSS
+(App/static_build.py) into STATIC_BUILD_DIR.
+
+Prints each bundle's size as written, minified and compressed, and how
+many requests the pages now make for scripts and stylesheets. Run it on
+every deploy, before the new code serves pages: templates link to the
+hashed names in the manifest it writes.
+
+--extract-inline moves the inline <script> blocks of the templates in
+INLINE_SCRIPTS into static files first; it is a one-off, as the extracted
+templates then reference those files.
+
+Usage:
+    python manage.py build_static
+    python manage.py build_static --extract-inline
+"""
+
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from App.static_build import BUNDLES, INLINE_SCRIPTS, build, extract_inline_scripts
+
+
+class Command(BaseCommand):
+    help = 'Build minified, hashed and precompressed static bundles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--extract-inline', action='store_true',
+            help='Move inline <script> blocks of the templates into static files first',
+        )
+
+    def handle(self, *args, **options):
+        source_dir = settings.STATICFILES_DIRS[0]
+        if options['extract_inline']:
+            template_dir = os.path.join(settings.BASE_DIR, settings.TEMPLATES[0]['DIRS'][0])
+            for template, script in INLINE_SCRIPTS.items():
+                extracted = extract_inline_scripts(
+                    os.path.join(template_dir, template), os.path.join(source_dir, script), script,
+                )
+                self.stdout.write(f'{template}: {extracted} inline script(s) moved to {script}')
+
+        try:
+            results = build(source_dir, settings.STATIC_BUILD_DIR)
+        except OSError as e:
+            raise CommandError(f'Build failed: {e}')
+
+        self.stdout.write(f"{'Bundle':<22} {'Source':>9} {'Minified':>9} {'gzip':>8} {'brotli':>8}")
+        for name, hashed, source, minified, gzipped, brotli in results:
+            self.stdout.write(
+                f"{name:<22} {source:>9} {minified:>9} {gzipped:>8} {brotli if brotli else '-':>8}  {hashed}"
+            )
+        total_source = sum(result[2] for result in results)
+        total_gzip = sum(result[4] for result in results)
+        self.stdout.write(
+            f'{total_source} bytes of source served as {total_gzip} gzipped '
+            f'({100 - 100 * total_gzip / total_source:.0f}% less)'
+        )
+        files = sum(len(sources) for sources in BUNDLES.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} bundles from {files} files written to {settings.STATIC_BUILD_DIR}'
+        ))
@@ -0,0 +1,44 @@
+"""
+Compact the ChangeLog behind /api/changes/.
+
+Entries older than CHANGE_LOG_COLLAPSE_SECONDS are collapsed to the latest
+one per object, and entries older than CHANGE_LOG_RETENTION_DAYS are
+dropped. Clients whose cursor is older than the dropped range reload their
+lists in full. Run it from cron, e.g. hourly.
+
+Usage:
+    python manage.py compact_changes
+    python manage.py compact_changes --retention-days 2
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from App.changelog import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Collapse and expire old change log entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collapse-after', type=int, default=settings.CHANGE_LOG_COLLAPSE_SECONDS, metavar='SECONDS',
+            help='Keep only the latest entry per object once entries are this old',
+        )
+        parser.add_argument(
+            '--retention-days', type=float, default=settings.CHANGE_LOG_RETENTION_DAYS,
+            help='Drop entries older than this',
+        )
+
+    def handle(self, *args, **options):
+        if options['collapse_after'] <= 0 or options['retention_days'] <= 0:
+            raise CommandError('--collapse-after and --retention-days must be positive')
+        result = compact_changes(
+            collapse_after=timedelta(seconds=options['collapse_after']),
+            retention=timedelta(days=options['retention_days']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Collapsed {result['collapsed']} and dropped {result['dropped']} change log entries"
+        ))
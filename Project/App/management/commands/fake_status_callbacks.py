@@ -0,0 +1,90 @@
+"""
+Play the SMS provider: post signed delivery-status callbacks to a running
+server's /api/messages/status/ endpoint.
+
+Logs --messages fake sent messages in the database first, as the send path
+would, then posts a "sent" and a final status callback for each, from
+--concurrency threads, signed with TWILIO_AUTH_TOKEN like Twilio's. Watch
+the rows in App.models.MessageLog and the sms.* metrics at /api/metrics/.
+The server must use the same database and auth token.
+
+Usage:
+    python manage.py fake_status_callbacks http://localhost:8000/api/messages/status/
+    python manage.py fake_status_callbacks http://localhost:8000/api/messages/status/ --messages 5000 --concurrency 32
+"""
+
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from App.message_status import sign_callback
+from App.models import MessageLog
+
+
+class Command(BaseCommand):
+    help = 'Post fake signed SMS status callbacks to a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Full URL of the status callback endpoint')
+        parser.add_argument('--messages', type=int, default=1000, help='Fake messages to report on')
+        parser.add_argument('--concurrency', type=int, default=16, help='Callbacks in flight at once')
+        parser.add_argument(
+            '--failure-rate', type=float, default=0.05, help='Share of messages reported undelivered',
+        )
+
+    def handle(self, *args, **options):
+        if options['messages'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--messages and --concurrency must be positive')
+        if not 0 <= options['failure_rate'] <= 1:
+            raise CommandError('--failure-rate must be between 0 and 1')
+        if not settings.TWILIO_AUTH_TOKEN:
+            raise CommandError('TWILIO_AUTH_TOKEN must be set to sign callbacks')
+
+        sids = [f'SM{uuid.uuid4().hex}' for _ in range(options['messages'])]
+        MessageLog.objects.bulk_create(
+            [MessageLog(sid=sid, phone_number='9000000000', kind='notification', sent_at=timezone.now())
+             for sid in sids],
+            batch_size=1000,
+        )
+        callbacks = [(sid, 'sent', '') for sid in sids]
+        for sid in sids:
+            if random.random() < options['failure_rate']:
+                callbacks.append((sid, 'undelivered', '30003'))
+            else:
+                callbacks.append((sid, 'delivered', ''))
+
+        url = options['url']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            codes = list(pool.map(lambda callback: self.post(url, *callback), callbacks))
+        elapsed = time.perf_counter() - started
+
+        failed = sum(1 for code in codes if code != 204)
+        self.stdout.write(
+            f'{len(callbacks)} callbacks for {len(sids)} messages in {elapsed:.2f}s '
+            f'({len(callbacks) / elapsed:.0f}/s), {failed} rejected'
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Status codes: {sorted(set(codes))}'))
+
+    def post(self, url, sid, status, error_code):
+        params = {'MessageSid': sid, 'MessageStatus': status, 'AccountSid': settings.TWILIO_ACCOUNT_SID}
+        if error_code:
+            params['ErrorCode'] = error_code
+        request = Request(url, data=urlencode(params).encode(), headers={
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-Twilio-Signature': sign_callback(url, params),
+        })
+        try:
+            with urlopen(request, timeout=10) as response:
+                return response.status
+        except HTTPError as e:
+            return e.code
@@ -0,0 +1,332 @@
+"""
+Generate a seeded, reproducible synthetic dataset for scale testing.
+
+Every model in App/models.py gets rows, written with bulk_create in batches
+inside per-batch transactions so foreign key checks are deferred to commit
+(and skipped entirely on SQLite, then verified once at the end, the same way
+loaddata does it). Sales per medicine follow a Zipf distribution so a few
+medicines dominate the history, like real pharmacy traffic.
+
+Usage:
+    python manage.py generate_data --medicines 100000 --sales 10000000
+    python manage.py generate_data --clear --seed 7 --zipf 1.2
+"""
+
+import random
+import time
+import uuid
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from App.archive import delete_archive_files
+from App.changelog import head
+from App.models import (
+    Appointment, ChangeLog, ChangeLogHorizon, Customer, DailySales, Doctor, HourlySales, Medicine, OTP,
+    RollupWatermark, SaleArchive, SaleRecord, UserProfile,
+)
+
+MEDICINE_PREFIXES = [
+    'Ashwagandha', 'Triphala', 'Brahmi', 'Tulsi', 'Giloy', 'Neem', 'Amla',
+    'Shatavari', 'Guggul', 'Arjuna', 'Haritaki', 'Punarnava', 'Moringa',
+    'Paracetamol', 'Ibuprofen', 'Cetirizine', 'Amoxicillin', 'Omeprazole',
+    'Metformin', 'Azithromycin', 'Pantoprazole', 'Vitamin D3', 'Zinc',
+]
+MEDICINE_FORMS = ['Churna', 'Tablets', 'Capsules', 'Syrup', 'Kwath', 'Ras', 'Vati', 'Oil', 'Drops']
+MEDICINE_STRENGTHS = ['50mg', '100mg', '250mg', '500mg', '650mg', '100ml', '200ml', '60 caps']
+
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera',
+    'Rohan', 'Saanvi', 'Arjun', 'Priya', 'Rahul', 'Sneha', 'Vikram', 'Nisha',
+    'Karan', 'Pooja', 'Amit', 'Neha', 'Suresh', 'Lakshmi', 'Rajesh', 'Anjali',
+]
+LAST_NAMES = [
+    'Sharma', 'Verma', 'Gupta', 'Iyer', 'Nair', 'Reddy', 'Patel', 'Singh',
+    'Das', 'Mukherjee', 'Banerjee', 'Joshi', 'Kulkarni', 'Menon', 'Rao', 'Bose',
+]
+SPECIALTIES = [
+    'Ayurveda', 'General Physician', 'Panchakarma', 'Dermatology', 'Pediatrics',
+    'Orthopedics', 'Cardiology', 'Gynecology', 'ENT', 'Psychiatry',
+]
+
+# Quantities sold per transaction: mostly single units, occasionally a strip or two.
+QUANTITIES = [1, 2, 3, 4, 5, 10]
+QUANTITY_WEIGHTS = [50, 22, 10, 8, 6, 4]
+
+
+class Command(BaseCommand):
+    help = 'Generate a seeded synthetic dataset for scale and performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--medicines', type=int, default=1000)
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--appointments', type=int, default=50000)
+        parser.add_argument('--sales', type=int, default=100000)
+        parser.add_argument('--otps', type=int, default=1000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Length of the sales and appointment history in days (default: 365)',
+        )
+        parser.add_argument(
+            '--until', default=None,
+            help='End of the generated history as YYYY-MM-DD (default: today). '
+                 'Fix this for byte-identical datasets across runs.',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Zipf exponent for sales per medicine; 0 means uniform (default: 1.1)',
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete existing rows of every generated model first, with the rollups, archives and change log built from them',
+        )
+
+    def handle(self, *args, **options):
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['sales'] and not options['medicines']:
+            raise CommandError('Sales need at least one medicine')
+        if options['appointments'] and not options['doctors']:
+            raise CommandError('Appointments need at least one doctor')
+
+        until = options['until']
+        if until:
+            try:
+                until = datetime.strptime(until, '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--until must be formatted as YYYY-MM-DD')
+        else:
+            until = timezone.localdate()
+        self.end = timezone.make_aware(datetime.combine(until, dt_time.min))
+        self.start = self.end - timedelta(days=options['days'])
+
+        if options['clear']:
+            self.clear()
+        else:
+            filled = [str(qs.model._meta.verbose_name_plural) for qs in self.generated() if qs.exists()]
+            if filled:
+                # Rows of this seed would clash with the existing ones half way through.
+                raise CommandError(f'{", ".join(filled)} already have rows; run with --clear to replace them')
+
+        tables = [model._meta.db_table for model in (
+            Medicine, Doctor, Customer, User, UserProfile, Appointment, OTP, SaleRecord,
+        )]
+        # Same approach as loaddata: skip per-row FK enforcement where the
+        # backend allows it, then verify every touched table once at the end.
+        with connection.constraint_checks_disabled():
+            medicine_ids = self.generate_medicines(options['medicines'])
+            doctor_ids = self.generate_doctors(options['doctors'])
+            phones = self.generate_customers(options['customers'])
+            self.generate_appointments(options['appointments'], doctor_ids, phones)
+            self.generate_otps(options['otps'], phones)
+            self.generate_sales(options['sales'], medicine_ids, options['zipf'])
+        connection.check_constraints(table_names=tables)
+
+        self.stdout.write(self.style.SUCCESS('Synthetic dataset generated'))
+
+    # ========== Helpers ==========
+    def rng(self, name):
+        """Independent stream per model so changing one volume keeps the others stable."""
+        return random.Random(f'{self.seed}:{name}')
+
+    def uuid4(self, rng):
+        return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+    def insert(self, model, rows, total, label=None, keep=True):
+        """
+        bulk_create ``rows`` (an iterable) in batches, one transaction per batch.
+
+        Returns the created objects, or nothing when ``keep`` is False so that
+        millions of rows never sit in memory at once.
+        """
+        label = label or model._meta.verbose_name_plural
+        created = []
+        batch = []
+        started = time.perf_counter()
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                objs = self._flush(model, batch)
+                if keep:
+                    created.extend(objs)
+                batch = []
+        if batch:
+            objs = self._flush(model, batch)
+            if keep:
+                created.extend(objs)
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(f'  {label}: {total} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)')
+        return created
+
+    def _flush(self, model, batch):
+        with transaction.atomic():
+            return model.objects.bulk_create(batch, batch_size=self.batch_size)
+
+    def generated(self):
+        """The rows this command writes, children first so deletes cascade as little as possible."""
+        return (
+            SaleRecord.objects.all(), Appointment.objects.all(), OTP.objects.all(),
+            UserProfile.objects.all(), User.objects.filter(username__startswith='customer_'),
+            Customer.objects.all(), Doctor.objects.all(), Medicine.objects.all(),
+        )
+
+    def clear(self):
+        self.stdout.write('Clearing existing data...')
+        for queryset in self.generated():
+            queryset.delete()
+        # Rollups and archives summarise the sales just deleted, and would
+        # otherwise still show in every total.
+        delete_archive_files()
+        for model in (SaleArchive, HourlySales, DailySales, RollupWatermark):
+            model.objects.all().delete()
+        # Drop the log of the old rows, but keep its horizon past them so
+        # clients still holding a cursor into it reload instead of syncing.
+        horizon, _ = ChangeLogHorizon.objects.get_or_create(pk=1)
+        horizon.seq = head()
+        horizon.save(update_fields=['seq', 'updated_at'])
+        ChangeLog.objects.all().delete()
+
+    # ========== Generators ==========
+    def generate_medicines(self, count):
+        rng = self.rng('medicines')
+
+        def rows():
+            for i in range(count):
+                name = (
+                    f'{rng.choice(MEDICINE_PREFIXES)} {rng.choice(MEDICINE_FORMS)} '
+                    f'{rng.choice(MEDICINE_STRENGTHS)} #{i + 1}'
+                )
+                yield Medicine(
+                    name=name,
+                    image=f'medicines/placeholder_{i % 16}.png',
+                    description=f'{name} for everyday wellness. Batch {rng.randrange(10000, 99999)}.',
+                    stock_quantity=int(rng.paretovariate(1.5) * 20),
+                    price=Decimal(rng.randrange(500, 250000)) / 100,
+                )
+
+        return [m.pk for m in self.insert(Medicine, rows(), count)]
+
+    def generate_doctors(self, count):
+        rng = self.rng('doctors')
+
+        def rows():
+            for _ in range(count):
+                yield Doctor(
+                    name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    specialty=rng.choice(SPECIALTIES),
+                    is_available=rng.random() < 0.85,
+                )
+
+        return [d.pk for d in self.insert(Doctor, rows(), count)]
+
+    def generate_customers(self, count):
+        """Customers plus the ``customer_<id>`` users and profiles the OTP login creates."""
+        rng = self.rng('customers')
+        span = (self.end - self.start).total_seconds()
+        phones = [str(p) for p in rng.sample(range(6_000_000_000, 10_000_000_000), count)]
+
+        def customers():
+            for phone in phones:
+                yield Customer(
+                    phone_number=phone,
+                    name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    created_at=self.start + timedelta(seconds=rng.random() * span),
+                )
+
+        created = self.insert(Customer, customers(), count)
+
+        users = self.insert(User, (
+            User(
+                username=f'customer_{customer.pk}',
+                password=f'{UNUSABLE_PASSWORD_PREFIX}{rng.getrandbits(64):016x}',
+                date_joined=customer.created_at,
+            )
+            for customer in created
+        ), count, label='customer users')
+
+        self.insert(UserProfile, (
+            UserProfile(
+                user_id=user.pk,
+                phone_number=customer.phone_number,
+                is_verified=True,
+                uid=self.uuid4(rng),
+                created_at=customer.created_at,
+            )
+            for user, customer in zip(users, created)
+        ), count)
+        return phones
+
+    def generate_appointments(self, count, doctor_ids, phones):
+        rng = self.rng('appointments')
+        # Appointments run from the start of the history to a month ahead,
+        # in 15 minute slots during clinic hours.
+        slots_per_day = 8 * 4
+        days = (self.end - self.start).days + 30
+
+        def rows():
+            for _ in range(count):
+                day = self.start + timedelta(days=rng.randrange(days))
+                date = day + timedelta(hours=9, minutes=15 * rng.randrange(slots_per_day))
+                yield Appointment(
+                    id=self.uuid4(rng),
+                    doctor_id=rng.choice(doctor_ids),
+                    customer_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    phone_number=rng.choice(phones) if phones else f'{rng.randrange(10**10):010d}',
+                    date=date,
+                    is_verified=True,
+                    created_at=date - timedelta(minutes=rng.randrange(15, 14 * 24 * 60)),
+                )
+
+        self.insert(Appointment, rows(), count, keep=False)
+
+    def generate_otps(self, count, phones):
+        rng = self.rng('otps')
+
+        def rows():
+            for _ in range(count):
+                expires_at = self.end - timedelta(minutes=rng.randrange(-10, 60))
+                yield OTP(
+                    phone_number=rng.choice(phones) if phones else f'{rng.randrange(10**10):010d}',
+                    otp_code=f'{rng.randrange(10**6):06d}',
+                    is_verified=rng.random() < 0.3,
+                    expires_at=expires_at,
+                )
+
+        self.insert(OTP, rows(), count, keep=False)
+
+    def generate_sales(self, count, medicine_ids, exponent):
+        rng = self.rng('sales')
+        # Popularity rank is shuffled so best sellers are spread across ids.
+        ranked = list(medicine_ids)
+        rng.shuffle(ranked)
+        cum_weights = list(accumulate(1 / (rank ** exponent) for rank in range(1, len(ranked) + 1)))
+        quantity_cum = list(accumulate(QUANTITY_WEIGHTS))
+        span = (self.end - self.start).total_seconds()
+
+        def rows():
+            # Timestamps advance with the id, as they do for a live append-only table.
+            for offset in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - offset)
+                medicines = rng.choices(ranked, cum_weights=cum_weights, k=size)
+                quantities = rng.choices(QUANTITIES, cum_weights=quantity_cum, k=size)
+                for i in range(size):
+                    seconds = span * (offset + i + rng.random()) / count
+                    yield SaleRecord(
+                        medicine_id=medicines[i],
+                        quantity_sold=quantities[i],
+                        timestamp=self.start + timedelta(seconds=seconds),
+                    )
+
+        self.insert(SaleRecord, rows(), count, keep=False)
@@ -0,0 +1,74 @@
+"""
+Print the medicines that need reordering, from demand forecasts computed for
+the whole catalog in one vectorized pass (App/forecasting.py).
+
+Daily demand comes from the DailySales rollup and the raw sales not rolled up
+yet, through yesterday.
+
+Usage:
+    python manage.py reorder_report
+    python manage.py reorder_report --method sma --window 14 --lead-time 5 --csv > reorder.csv
+"""
+
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from App.forecasting import DEFAULTS, METHODS, ForecastError, reorder_plan
+
+COLUMNS = [
+    'medicine', 'name', 'stock', 'daily_demand', 'safety_stock', 'reorder_point',
+    'days_of_cover', 'order_quantity',
+]
+
+
+class Command(BaseCommand):
+    help = 'List medicines at or below their reorder point'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=METHODS, default=DEFAULTS['method'])
+        parser.add_argument('--history-days', type=int, default=DEFAULTS['history_days'])
+        parser.add_argument('--window', type=int, default=DEFAULTS['window'], help='Days averaged by sma')
+        parser.add_argument('--alpha', type=float, default=DEFAULTS['alpha'], help='Smoothing factor for ewma')
+        parser.add_argument('--lead-time', type=float, default=DEFAULTS['lead_time_days'], help='Supplier lead time in days')
+        parser.add_argument('--service-level', type=float, default=DEFAULTS['service_level'])
+        parser.add_argument('--cover-days', type=float, default=DEFAULTS['cover_days'], help='Days of demand an order should cover')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--all', action='store_true', help='Include medicines that do not need reordering')
+        parser.add_argument('--csv', action='store_true', help='Write CSV to stdout')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            plan = reorder_plan(
+                limit=options['limit'],
+                include_all=options['all'],
+                method=options['method'],
+                history_days=options['history_days'],
+                window=options['window'],
+                alpha=options['alpha'],
+                lead_time_days=options['lead_time'],
+                service_level=options['service_level'],
+                cover_days=options['cover_days'],
+            )
+        except ForecastError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if options['csv']:
+            writer = csv.DictWriter(self.stdout, fieldnames=COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(plan['results'])
+            return
+
+        self.stdout.write(f'{"ID":>8}  {"Medicine":<40} {"Stock":>7} {"Demand/d":>9} {"ROP":>8} {"Cover d":>8} {"Order":>7}')
+        for row in plan['results']:
+            cover = '-' if row['days_of_cover'] is None else f'{row["days_of_cover"]:.1f}'
+            self.stdout.write(
+                f'{row["medicine"]:>8}  {row["name"][:40]:<40} {row["stock"]:>7} {row["daily_demand"]:>9.2f} '
+                f'{row["reorder_point"]:>8.1f} {cover:>8} {row["order_quantity"]:>7}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{plan["count"]} medicine(s) need reordering ({elapsed:.2f}s)'
+        ))
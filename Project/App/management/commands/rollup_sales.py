@@ -0,0 +1,44 @@
+"""
+Fold new SaleRecord rows into the hourly and daily sales rollups.
+
+Only ids above the rollup watermark are read, so a run costs time
+proportional to the sales since the previous run. Run it from cron, or keep
+it running with --loop.
+
+Usage:
+    python manage.py rollup_sales
+    python manage.py rollup_sales --loop 60
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from App.analytics import SETTLE, roll_up_sales
+
+
+class Command(BaseCommand):
+    help = 'Fold new sales into the hourly and daily rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000, help='Sale ids per transaction')
+        parser.add_argument(
+            '--settle', type=float, default=SETTLE.total_seconds(),
+            help='Seconds a new max id must have been visible before it is rolled up (0: roll up everything now)',
+        )
+        parser.add_argument(
+            '--loop', type=float, default=0, metavar='SECONDS',
+            help='Keep running, rolling up every SECONDS',
+        )
+
+    def handle(self, *args, **options):
+        settle = timedelta(seconds=options['settle'])
+        while True:
+            started = time.perf_counter()
+            rolled = roll_up_sales(batch_size=options['batch_size'], settle=settle)
+            if rolled or options['verbosity'] > 1:
+                self.stdout.write(f'Rolled up {rolled} sales in {time.perf_counter() - started:.2f}s')
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
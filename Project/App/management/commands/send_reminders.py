@@ -0,0 +1,54 @@
+"""
+Send SMS reminders 24 hours and 1 hour before each appointment.
+
+Keeps running: upcoming reminders are held in memory (App/reminders.py),
+appointment changes are picked up from the change log, and due reminders
+go out in batches. Every reminder is recorded before it is sent, so a
+restart never sends one twice. Run exactly one per deployment, e.g. under
+systemd; --once sends what is due now and exits.
+
+Usage:
+    python manage.py send_reminders
+    python manage.py send_reminders --once
+    python manage.py send_reminders --batch-size 500 --poll 5
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from App.reminders import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = 'Send appointment reminders as they fall due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.REMINDER_BATCH_SIZE, help='Reminders claimed and sent together',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.REMINDER_CONCURRENCY, help='SMS requests in flight at once',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=settings.REMINDER_POLL_SECONDS, metavar='SECONDS',
+            help='Longest sleep between checks for changed appointments',
+        )
+        parser.add_argument('--once', action='store_true', help='Send what is due now and exit')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0 or options['concurrency'] <= 0 or options['poll'] <= 0:
+            raise CommandError('--batch-size, --concurrency and --poll must be positive')
+        scheduler = ReminderScheduler(batch_size=options['batch_size'], concurrency=options['concurrency'])
+        try:
+            if options['once']:
+                totals = scheduler.tick()
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {totals['sent']} reminders, {totals['failed']} failed, {totals['skipped']} skipped"
+                ))
+            else:
+                self.stdout.write('Sending reminders as they fall due; stop with Ctrl-C')
+                scheduler.run(poll=options['poll'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.close()
@@ -0,0 +1,66 @@
+"""
+Report where a cold start of the project spends its time.
+
+Starts fresh interpreters that run django.setup() and load the URLconf
+(App/startup.py), and prints the fastest run's time per phase, the slowest
+imports and the import time per package. With a budget, fails if the cold
+start takes longer or loads a library that should only be imported on
+first use.
+
+Usage:
+    python manage.py startup_profile
+    python manage.py startup_profile --top 30 --runs 5
+    python manage.py startup_profile --budget 800
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from App.startup import StartupProfileError, by_package, loaded_heavy_modules, profile_startup
+
+
+class Command(BaseCommand):
+    help = 'Profile django.setup() and URLconf loading in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts to measure; the fastest is reported')
+        parser.add_argument('--top', type=int, default=15, help='Imports and packages to list')
+        parser.add_argument(
+            '--budget', type=float, metavar='MS', nargs='?', const=settings.STARTUP_BUDGET_MS,
+            help=f'Fail above this many ms (default {settings.STARTUP_BUDGET_MS} when given without a value)',
+        )
+
+    def handle(self, *args, **options):
+        if options['runs'] <= 0 or options['top'] <= 0:
+            raise CommandError('--runs and --top must be positive')
+        try:
+            profile = min((profile_startup() for _ in range(options['runs'])), key=lambda run: run['total_ms'])
+        except StartupProfileError as e:
+            raise CommandError(f'Cold start failed: {e}')
+
+        self.stdout.write(f"Cold start: {profile['total_ms']:.0f} ms (fastest of {options['runs']})")
+        for phase, ms in profile['phases'].items():
+            self.stdout.write(f'  {phase:<32} {ms:>8.1f} ms')
+
+        top = options['top']
+        # Imports made by startup itself, each with everything it pulled in.
+        # -X importtime skips modules loaded by importlib.import_module (the
+        # apps and URLconfs), so what those import is listed here instead.
+        self.stdout.write('\nSlowest imports, cumulative (ms):')
+        roots = sorted((item for item in profile['imports'] if item[1] == 0), key=lambda item: -item[3])
+        for module, _, self_us, cumulative_us in roots[:top]:
+            self.stdout.write(f'  {module:<48} {cumulative_us / 1000:>8.1f}')
+        self.stdout.write('\nImport time per package, self (ms):')
+        for package, ms in by_package(profile['imports'])[:top]:
+            self.stdout.write(f'  {package:<32} {ms:>8.1f}')
+
+        heavy = loaded_heavy_modules(profile['imports'])
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"\nLoaded at startup, should be lazy: {', '.join(heavy)}"))
+        budget = options['budget']
+        if budget is not None:
+            if profile['total_ms'] > budget:
+                raise CommandError(f"Cold start took {profile['total_ms']:.0f} ms, over the {budget:.0f} ms budget")
+            if heavy:
+                raise CommandError(f"Cold start loaded {', '.join(heavy)}")
+            self.stdout.write(self.style.SUCCESS(f'Within the {budget:.0f} ms budget'))
@@ -0,0 +1,242 @@
+"""
+SMS delivery status, from the provider's status callbacks.
+
+Every SMS sent through App.messages is logged as a MessageLog row keyed by
+its message SID, and Twilio posts each status change of the message
+(queued, sent, delivered, failed...) to /api/messages/status/: every send
+passes that URL, from TWILIO_STATUS_CALLBACK_URL, as its status callback.
+
+At volume that is several callbacks per SMS, so neither the send path nor
+the webhook writes to the database itself. Both hand their update to the
+process's StatusBuffer, which keeps the latest status per SID and writes
+everything pending every MESSAGE_STATUS_FLUSH_MS milliseconds in one
+transaction: one bulk INSERT for new messages and one bulk UPDATE per
+status, instead of a transaction per callback.
+
+Callbacks can arrive out of order and, across workers, be flushed out of
+order, so each status has a rank and an UPDATE never replaces a status
+with one of a lower or equal rank. A message is logged only once its send
+succeeded; a callback for a SID not logged yet (sent by another worker
+that has not flushed, or before logging began) creates the row without a
+send time.
+
+Once flushed, the time from send to each status is observed as
+``sms.delivery.<status>`` in App.instrumentation, so /api/metrics/ has the
+delivery latency percentiles per status. Callbacks coalesced in the buffer
+only count their latest status.
+"""
+
+import atexit
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .instrumentation import metrics
+from .models import MessageLog
+
+logger = logging.getLogger(__name__)
+
+# Statuses Twilio reports for outgoing messages, ranked by how far along the
+# message is. Final statuses share a rank, so the first one reported wins.
+STATUS_RANKS = {
+    'accepted': 0, 'scheduled': 0, 'queued': 0,
+    'sending': 1,
+    'sent': 2,
+    'delivered': 3, 'undelivered': 3, 'failed': 3, 'canceled': 3,
+    'read': 4,
+}
+SID_PATTERN = re.compile(r'^(SM|MM)[0-9a-f]{32}$')
+# SIDs per SELECT and UPDATE, and rows per INSERT. Fixed rather than left to
+# the backend, and under SQLite's old limit of 999 variables per statement:
+# an UPDATE takes three per SID (the IN list and the CASE for status_at),
+# an INSERT eight per row.
+UPDATE_CHUNK = 300
+INSERT_BATCH = 100
+
+
+def valid_sid(sid):
+    return bool(SID_PATTERN.match(sid))
+
+
+class StatusBuffer:
+    """
+    Pending message log writes, flushed in bulk by a background thread.
+
+    ``sent`` holds the messages to insert, by SID, and ``statuses`` the
+    latest callback per SID as (status, error code, received at). The flush
+    thread starts with the first write and runs ``flush`` every
+    ``interval`` seconds, or sooner once ``max_pending`` updates are
+    waiting. With ``interval`` None there is no thread and flush_now()
+    does the writing.
+    """
+
+    def __init__(self, interval, max_pending, flush):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.flush = flush
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.sent = {}
+        self.statuses = {}
+
+    def __len__(self):
+        return len(self.sent) + len(self.statuses)
+
+    def add_sent(self, sid, phone_number, kind, sent_at=None):
+        with self._lock:
+            self.sent[sid] = (phone_number, kind, sent_at or timezone.now())
+        self._written()
+
+    def add_status(self, sid, status, error_code='', received_at=None):
+        update = (status, error_code, received_at or timezone.now())
+        with self._lock:
+            self._merge(sid, update)
+        metrics.increment('sms.status_received')
+        self._written()
+
+    def _merge(self, sid, update):
+        """Keep ``update`` unless a status of at least its rank is pending."""
+        pending = self.statuses.get(sid)
+        if pending is None or STATUS_RANKS[update[0]] > STATUS_RANKS[pending[0]]:
+            self.statuses[sid] = update
+
+    def _written(self):
+        if self.interval is None:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='message-status', daemon=True)
+                    self._thread.start()
+        if len(self) >= self.max_pending:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            close_old_connections()
+            self.flush_now()
+
+    def flush_now(self):
+        """Write everything pending; on failure keep it for the next flush."""
+        with self._lock:
+            sent, self.sent = self.sent, {}
+            statuses, self.statuses = self.statuses, {}
+        if not sent and not statuses:
+            return
+        started = time.perf_counter()
+        try:
+            self.flush(sent, statuses)
+        except Exception:
+            logger.exception('Failed to write %d message log updates', len(sent) + len(statuses))
+            metrics.increment('sms.status_flush_failed')
+            with self._lock:
+                for sid, row in sent.items():
+                    self.sent.setdefault(sid, row)
+                for sid, update in statuses.items():
+                    self._merge(sid, update)
+            return
+        metrics.observe('sms.status_flush', time.perf_counter() - started)
+        metrics.increment('sms.status_flushed', len(statuses))
+
+
+def flush_statuses(sent, statuses):
+    """
+    Write a batch of sent messages and status callbacks in one transaction.
+
+    Args:
+        sent (dict): sid -> (phone_number, kind, sent_at)
+        statuses (dict): sid -> (status, error_code, received_at)
+    """
+    with transaction.atomic():
+        if sent:
+            MessageLog.objects.bulk_create(
+                [MessageLog(sid=sid, phone_number=phone_number, kind=kind, sent_at=sent_at)
+                 for sid, (phone_number, kind, sent_at) in sent.items()],
+                # A callback may have created the row first
+                update_conflicts=True, unique_fields=['sid'], update_fields=['phone_number', 'kind', 'sent_at'],
+                batch_size=INSERT_BATCH,
+            )
+        if not statuses:
+            return
+        sids = list(statuses)
+        current = {}
+        for start in range(0, len(sids), UPDATE_CHUNK):
+            rows = MessageLog.objects.filter(sid__in=sids[start:start + UPDATE_CHUNK]).values_list(
+                'sid', 'status_rank', 'sent_at',
+            )
+            current.update((sid, (rank, sent_at)) for sid, rank, sent_at in rows)
+        missing = [sid for sid in statuses if sid not in current]
+        if missing:
+            MessageLog.objects.bulk_create(
+                [MessageLog(sid=sid) for sid in missing], ignore_conflicts=True, batch_size=INSERT_BATCH,
+            )
+
+        groups = defaultdict(list)
+        for sid, (status, error_code, received_at) in statuses.items():
+            rank, sent_at = current.get(sid, (-1, None))
+            if STATUS_RANKS[status] <= rank:
+                continue  # Already has this status or a later one
+            groups[status, error_code].append((sid, received_at))
+            if sent_at is not None:
+                metrics.observe(f'sms.delivery.{status}', (received_at - sent_at).total_seconds())
+
+        for (status, error_code), rows in groups.items():
+            for start in range(0, len(rows), UPDATE_CHUNK):
+                chunk = rows[start:start + UPDATE_CHUNK]
+                # status_rank__lt guards against a later status flushed by
+                # another worker since the rows were read.
+                MessageLog.objects.filter(
+                    sid__in=[sid for sid, _ in chunk], status_rank__lt=STATUS_RANKS[status],
+                ).update(
+                    status=status,
+                    status_rank=STATUS_RANKS[status],
+                    error_code=error_code,
+                    status_at=Case(
+                        *(When(sid=sid, then=Value(received_at)) for sid, received_at in chunk),
+                        output_field=DateTimeField(),
+                    ),
+                )
+
+
+status_buffer = StatusBuffer(
+    settings.MESSAGE_STATUS_FLUSH_MS / 1000, settings.MESSAGE_STATUS_MAX_PENDING, flush_statuses,
+)
+metrics.gauge('sms.status_pending', lambda: len(status_buffer))
+atexit.register(lambda: status_buffer.flush_now())
+
+
+def record_sent(sid, phone_number, kind):
+    """Log a successfully sent SMS; called by App.messages."""
+    status_buffer.add_sent(sid, phone_number, kind)
+
+
+# ========== Callbacks ==========
+def validate_callback(url, params, signature):
+    """True if ``signature`` is Twilio's X-Twilio-Signature for this callback."""
+    from twilio.request_validator import RequestValidator
+
+    if not settings.TWILIO_AUTH_TOKEN or not signature:
+        return False
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN).validate(url, params, signature)
+
+
+def sign_callback(url, params):
+    """X-Twilio-Signature for a callback, for the fake sender and tests."""
+    from twilio.request_validator import RequestValidator
+
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN).compute_signature(url, params)
+
+
+def record_callback(sid, status, error_code=''):
+    """Queue a validated status callback for the next flush."""
+    status_buffer.add_status(sid, status, error_code)
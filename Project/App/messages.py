@@ -3,9 +3,11 @@ Twilio Message Handler for OTP and SMS notifications
 Based on tutorial approach for cleaner code organization
 """
 
-from twilio.rest import Client
 from django.conf import settings
+from .message_status import record_sent
+import asyncio
 import logging
+import weakref
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +28,45 @@ class MessageHandler:
         """
         self.phone_number = phone_number
         self.otp = otp
+        # Imported here: twilio is only needed once a message is sent.
+        from twilio.rest import Client
+
         self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
         self.from_number = settings.TWILIO_PHONE_NUMBER
 
+    @property
+    def recipient(self):
+        """Phone number in E.164 form; bare 10 digit numbers are Indian mobiles."""
+        return f"+91{self.phone_number}" if len(self.phone_number) == 10 else f"+{self.phone_number}"
+
+    def message_options(self, body):
+        """Arguments for messages.create: the message, and where Twilio posts its status changes."""
+        options = {'body': body, 'from_': self.from_number, 'to': self.recipient}
+        if settings.TWILIO_STATUS_CALLBACK_URL:
+            options['status_callback'] = settings.TWILIO_STATUS_CALLBACK_URL
+        return options
+
+    def otp_message(self):
+        return f"Your OTP for MediCare Pharmacy is: {self.otp}\nValid for 10 minutes."
+
+    def appointment_confirmation_message(self, doctor_name, appointment_date, appointment_id):
+        return (
+            f"Appointment Confirmed!\n"
+            f"Doctor: {doctor_name}\n"
+            f"Date & Time: {appointment_date}\n"
+            f"Ref ID: {appointment_id}\n"
+            f"Thank you for booking with MediCare Pharmacy!"
+        )
+
+    @staticmethod
+    def appointment_reminder_message(doctor_name, appointment_date, hours):
+        return (
+            f"Reminder: your appointment is in {hours} hour{'s' if hours != 1 else ''}.\n"
+            f"Doctor: {doctor_name}\n"
+            f"Date & Time: {appointment_date}\n"
+            f"MediCare Pharmacy"
+        )
+
     def send_otp_to_phone(self):
         """
         Send OTP via SMS using Twilio.
@@ -44,15 +82,10 @@ class MessageHandler:
             }
 
         try:
-            message_body = f"Your OTP for MediCare Pharmacy is: {self.otp}\nValid for 10 minutes."
-            
-            message = self.client.messages.create(
-                body=message_body,
-                from_=self.from_number,
-                to=f"+91{self.phone_number}" if len(self.phone_number) == 10 else f"+{self.phone_number}"
-            )
+            message = self.client.messages.create(**self.message_options(self.otp_message()))
 
-            logger.info(f"OTP sent successfully to {self.phone_number}. Message SID: {message.sid}")
+            logger.info("OTP sent successfully to %s. Message SID: %s", self.phone_number, message.sid)
+            record_sent(message.sid, self.phone_number, 'otp')
             
             return {
                 'success': True,
@@ -61,7 +94,7 @@ class MessageHandler:
             }
 
         except Exception as e:
-            logger.error(f"Failed to send OTP to {self.phone_number}: {str(e)}")
+            logger.error("Failed to send OTP to %s: %s", self.phone_number, e)
             
             return {
                 'success': False,
@@ -82,21 +115,11 @@ class MessageHandler:
             dict: { 'success': bool, 'message_sid': str or None, 'error': str or None }
         """
         try:
-            message_body = (
-                f"Appointment Confirmed!\n"
-                f"Doctor: {doctor_name}\n"
-                f"Date & Time: {appointment_date}\n"
-                f"Ref ID: {appointment_id}\n"
-                f"Thank you for booking with MediCare Pharmacy!"
-            )
-            
-            message = self.client.messages.create(
-                body=message_body,
-                from_=self.from_number,
-                to=f"+91{self.phone_number}" if len(self.phone_number) == 10 else f"+{self.phone_number}"
-            )
+            body = self.appointment_confirmation_message(doctor_name, appointment_date, appointment_id)
+            message = self.client.messages.create(**self.message_options(body))
 
-            logger.info(f"Confirmation sent to {self.phone_number}. Message SID: {message.sid}")
+            logger.info("Confirmation sent to %s. Message SID: %s", self.phone_number, message.sid)
+            record_sent(message.sid, self.phone_number, 'confirmation')
             
             return {
                 'success': True,
@@ -105,7 +128,7 @@ class MessageHandler:
             }
 
         except Exception as e:
-            logger.error(f"Failed to send confirmation to {self.phone_number}: {str(e)}")
+            logger.error("Failed to send confirmation to %s: %s", self.phone_number, e)
             
             return {
                 'success': False,
@@ -124,13 +147,10 @@ class MessageHandler:
             dict: { 'success': bool, 'message_sid': str or None, 'error': str or None }
         """
         try:
-            message = self.client.messages.create(
-                body=message_text,
-                from_=self.from_number,
-                to=f"+91{self.phone_number}" if len(self.phone_number) == 10 else f"+{self.phone_number}"
-            )
+            message = self.client.messages.create(**self.message_options(message_text))
 
-            logger.info(f"Notification sent to {self.phone_number}. Message SID: {message.sid}")
+            logger.info("Notification sent to %s. Message SID: %s", self.phone_number, message.sid)
+            record_sent(message.sid, self.phone_number, 'notification')
             
             return {
                 'success': True,
@@ -139,10 +159,107 @@ class MessageHandler:
             }
 
         except Exception as e:
-            logger.error(f"Failed to send notification to {self.phone_number}: {str(e)}")
+            logger.error("Failed to send notification to %s: %s", self.phone_number, e)
             
             return {
                 'success': False,
                 'message_sid': None,
                 'error': str(e)
             }
+
+
+# One aiohttp-backed Twilio client per event loop, so requests on a worker
+# share a connection pool instead of opening a session per SMS.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from twilio.http.async_http_client import AsyncTwilioHttpClient
+        from twilio.rest import Client
+
+        client = Client(
+            settings.TWILIO_ACCOUNT_SID,
+            settings.TWILIO_AUTH_TOKEN,
+            http_client=AsyncTwilioHttpClient()
+        )
+        _async_clients[loop] = client
+    return client
+
+
+class AsyncMessageHandler(MessageHandler):
+    """
+    asyncio variant of MessageHandler used by the async views.
+
+    The send methods are coroutines with the same return values as the sync
+    ones; while Twilio is answering, the worker's event loop keeps serving
+    other requests instead of parking a thread on the HTTP call.
+    """
+
+    def __init__(self, phone_number, otp=None):
+        self.phone_number = phone_number
+        self.otp = otp
+        self.client = get_async_client()
+        self.from_number = settings.TWILIO_PHONE_NUMBER
+
+    async def _send(self, body, kind):
+        try:
+            message = await self.client.messages.create_async(**self.message_options(body))
+
+            logger.info("%s sent to %s. Message SID: %s", kind, self.phone_number, message.sid)
+            record_sent(message.sid, self.phone_number, kind.lower())
+
+            return {
+                'success': True,
+                'message_sid': message.sid,
+                'error': None
+            }
+
+        except Exception as e:
+            logger.error("Failed to send %s to %s: %s", kind, self.phone_number, e)
+
+            return {
+                'success': False,
+                'message_sid': None,
+                'error': str(e)
+            }
+
+    async def send_otp_to_phone(self):
+        if not self.otp:
+            return {
+                'success': False,
+                'message_sid': None,
+                'error': 'OTP code is required'
+            }
+        return await self._send(self.otp_message(), 'OTP')
+
+    async def send_appointment_confirmation(self, doctor_name, appointment_date, appointment_id):
+        body = self.appointment_confirmation_message(doctor_name, appointment_date, appointment_id)
+        return await self._send(body, 'confirmation')
+
+    async def send_notification(self, message_text):
+        return await self._send(message_text, 'notification')
+
+
+async def send_notifications(messages, concurrency=20):
+    """
+    Send many notifications over the event loop's shared Twilio client.
+
+    Twilio takes one message per request, so a batch is sent as concurrent
+    requests, at most ``concurrency`` in flight at a time.
+
+    Args:
+        messages (list): (phone_number, message_text) pairs
+
+    Returns:
+        list: one result dict per message, in order
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(phone_number, message_text):
+        async with semaphore:
+            return await AsyncMessageHandler(phone_number).send_notification(message_text)
+
+    return await asyncio.gather(*(send(phone_number, text) for phone_number, text in messages))
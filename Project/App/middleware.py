@@ -0,0 +1,35 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .db_routers import pin
+
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin a client to the primary database after it sends a write.
+
+    Works for sync and async views alike, so the native async OTP views are
+    not pushed onto a thread just for this.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+        if request.method in UNSAFE_METHODS and response.status_code < 400:
+            pin(request, response)
+        return response
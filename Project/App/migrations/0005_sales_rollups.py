@@ -0,0 +1,53 @@
+# Generated by Django 6.0.9 on 2026-10-19 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0004_userprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('pending_id', models.BigIntegerField(default=0)),
+                ('pending_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('sales', models.IntegerField(default=0)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='App.medicine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='daily_sales_day')],
+                'constraints': [models.UniqueConstraint(fields=('medicine', 'day'), name='daily_sales_medicine_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('sales', models.IntegerField(default=0)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='App.medicine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='hourly_sales_hour')],
+                'constraints': [models.UniqueConstraint(fields=('medicine', 'hour'), name='hourly_sales_medicine_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.9 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('filename', models.CharField(max_length=255, unique=True)),
+                ('previous_id', models.BigIntegerField()),
+                ('through_id', models.BigIntegerField()),
+                ('rows', models.IntegerField()),
+                ('quantity', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('purged_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='salerecord',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='salerecord',
+            index=models.Index(fields=['timestamp'], name='sale_record_timestamp'),
+        ),
+        migrations.AddIndex(
+            model_name='salearchive',
+            index=models.Index(fields=['month'], name='sale_archive_month'),
+        ),
+    ]
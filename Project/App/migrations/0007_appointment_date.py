@@ -0,0 +1,17 @@
+# Generated by Django 6.0.9 on 2026-10-19 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0006_sale_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date'], name='appointment_date'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.9 on 2026-10-19 19:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0008_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=8)),
+                ('appointment_date', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=7)),
+                ('batch', models.UUIDField()),
+                ('message_sid', models.CharField(blank=True, max_length=64)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='App.appointment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['appointment_date'], name='reminder_appointment_date'), models.Index(fields=['batch'], name='reminder_batch')],
+                'constraints': [models.UniqueConstraint(fields=('appointment', 'kind', 'appointment_date'), name='appointment_reminder_once')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.9 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0009_appointment_reminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='low_stock_threshold',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
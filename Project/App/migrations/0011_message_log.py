@@ -0,0 +1,29 @@
+# Generated by Django 6.0.9 on 2026-10-19 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0010_medicine_low_stock_threshold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageLog',
+            fields=[
+                ('sid', models.CharField(max_length=34, primary_key=True, serialize=False)),
+                ('phone_number', models.CharField(blank=True, max_length=20)),
+                ('kind', models.CharField(blank=True, max_length=20)),
+                ('status', models.CharField(default='queued', max_length=12)),
+                ('status_rank', models.SmallIntegerField(default=0)),
+                ('error_code', models.CharField(blank=True, max_length=10)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('status_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'sent_at'], name='message_log_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.9 on 2026-10-19 20:28
+
+from django.db import migrations, models
+
+
+def move_horizon(apps, schema_editor):
+    """The horizon used to be the 'change-log-horizon' RollupWatermark row."""
+    RollupWatermark = apps.get_model('App', 'RollupWatermark')
+    ChangeLogHorizon = apps.get_model('App', 'ChangeLogHorizon')
+    old = RollupWatermark.objects.filter(name='change-log-horizon').first()
+    if old is not None:
+        ChangeLogHorizon.objects.create(pk=1, seq=old.last_id)
+        old.delete()
+
+
+def restore_horizon(apps, schema_editor):
+    RollupWatermark = apps.get_model('App', 'RollupWatermark')
+    ChangeLogHorizon = apps.get_model('App', 'ChangeLogHorizon')
+    horizon = ChangeLogHorizon.objects.first()
+    if horizon is not None:
+        RollupWatermark.objects.update_or_create(name='change-log-horizon', defaults={'last_id': horizon.seq})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0011_message_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogHorizon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(move_horizon, restore_horizon),
+    ]
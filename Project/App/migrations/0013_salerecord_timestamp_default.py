@@ -0,0 +1,25 @@
+# Generated by Django 6.0.9 on 2026-10-19 20:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0012_changelog_horizon'),
+    ]
+
+    # The column is unchanged; only Django's default moves. Without
+    # SeparateDatabaseAndState, SQLite would rebuild the whole sales table.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='salerecord',
+                    name='timestamp',
+                    field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+            ],
+        ),
+    ]
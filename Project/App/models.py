@@ -1,10 +1,14 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from collections import defaultdict
+from contextvars import ContextVar
 import uuid
 
+from .cache_versions import bump_on_commit
+from .object_cache import ObjectCache, invalidate_on_commit
+
 # Create your models here.
 
 
@@ -29,35 +33,221 @@ class UserProfile(models.Model):
         verbose_name_plural = "User Profiles"
 
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    """Signal to create UserProfile when User is created"""
-    if created:
-        UserProfile.objects.get_or_create(user=instance)
+# ========== Change log ==========
+class ChangeLog(models.Model):
+    """
+    One create, update or delete of a TrackedModel row, in commit order of
+    ``seq``. Written in the same transaction as the change itself; read by
+    App.changelog for incremental sync. Recording a change also bumps the
+    model's cache version (App/cache_versions.py) when it commits.
+    """
+    CREATE, UPDATE, DELETE = 'create', 'update', 'delete'
+    ACTIONS = [(CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete')]
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=50)  # Model label_lower, e.g. 'App.medicine'
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='change_log_object'),
+            models.Index(fields=['created_at'], name='change_log_created_at'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model} {self.object_id}"
+
+    @classmethod
+    def record_delete(cls, model, pk, using=None):
+        """Log the delete of one row, batched while a TrackedQuerySet.delete() runs."""
+        pending = _pending_deletes.get()
+        if pending is None:
+            return cls.record(model, [pk], cls.DELETE, using)
+        pending[(model, using)].append(pk)
+
+    @classmethod
+    def record(cls, model, pks, action, using=None):
+        """Log ``action`` on the rows of ``model`` with primary keys ``pks``."""
+        label = model._meta.label_lower
+        if pks:
+            bump_on_commit(model, using)
+            invalidate_on_commit(model, pks, using)
+        return cls.objects.using(using).bulk_create(
+            cls(model=label, object_id=str(pk), action=action) for pk in pks
+        )
+
+
+class ChangeLogHorizon(models.Model):
+    """
+    The highest ChangeLog seq dropped by compact_changes (App/changelog.py),
+    in a single row. A client whose cursor is below it must reload.
+    """
+    seq = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"change log horizon @ {self.seq}"
+
+
+# While TrackedQuerySet.delete() runs: (model, using) -> deleted pks, logged
+# in one insert per model once the delete is done (see ChangeLog.record_delete).
+_pending_deletes = ContextVar('pending_deletes', default=None)
+# Set while TrackedQuerySet.bulk_update() runs its UPDATE statements.
+_bulk_updating = ContextVar('bulk_updating', default=False)
+
+
+class TrackedQuerySet(models.QuerySet):
+    """Logs bulk writes that bypass Model.save() to ChangeLog."""
+
+    def update(self, **kwargs):
+        if _bulk_updating.get():
+            # bulk_update() logs its objects itself, without this SELECT
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            ChangeLog.record(self.model, pks, ChangeLog.UPDATE, self.db)
+        return rows
+
+    update.alters_data = True
 
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            ChangeLog.record(self.model, [obj.pk for obj in objs if obj.pk is not None], ChangeLog.CREATE, self.db)
+        return objs
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Signal to save UserProfile when User is saved"""
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+    bulk_create.alters_data = True
 
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            token = _bulk_updating.set(True)
+            try:
+                rows = super().bulk_update(objs, fields, batch_size)
+            finally:
+                _bulk_updating.reset(token)
+            ChangeLog.record(self.model, [obj.pk for obj in objs], ChangeLog.UPDATE, self.db)
+        return rows
 
-class Medicine(models.Model):
+    bulk_update.alters_data = True
+
+    def delete(self):
+        # Cascades send post_delete per row; collect them instead of logging
+        # each with its own insert.
+        pending = defaultdict(list)
+        token = _pending_deletes.set(pending)
+        try:
+            with transaction.atomic(using=self.db, savepoint=False):
+                result = super().delete()
+                for (model, using), pks in pending.items():
+                    ChangeLog.record(model, pks, ChangeLog.DELETE, using)
+        finally:
+            _pending_deletes.reset(token)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class MedicineQuerySet(TrackedQuerySet):
+    def bulk_update(self, objs, fields, batch_size=None):
+        """As Medicine.save() does, alert staff to stock that fell below its threshold."""
+        from .alerts import stock_written
+
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, batch_size)
+        if 'stock_quantity' in fields:
+            for medicine in objs:
+                stock_written(medicine, getattr(medicine, '_loaded_stock', None), self.db)
+                medicine._loaded_stock = medicine.stock_quantity
+        return rows
+
+    bulk_update.alters_data = True
+
+
+class CachedManager(models.Manager.from_queryset(TrackedQuerySet)):
+    """TrackedModel manager with a read-through cache by primary key (App/object_cache.py)."""
+
+    def contribute_to_class(self, model, name):
+        super().contribute_to_class(model, name)
+        if not model._meta.abstract:
+            self.object_cache = ObjectCache(model)
+
+    def get_cached(self, pk):
+        return self.object_cache.get(pk)
+
+    def get_many_cached(self, pks):
+        return self.object_cache.get_many(pks)
+
+    async def aget_cached(self, pk):
+        # In the sync thread, never on the event loop: a miss may sleep while
+        # another request fills the row (ObjectCache._wait).
+        return await sync_to_async(self.get_cached)(pk)
+
+
+class TrackedModel(models.Model):
+    """
+    Writes a ChangeLog row in the same transaction as every create, update
+    and delete. Deletes, cascades included, are logged by the post_delete
+    receiver App.changelog.log_delete, connected in AppConfig.ready().
+    """
+    objects = TrackedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        action = ChangeLog.CREATE if self._state.adding else ChangeLog.UPDATE
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            ChangeLog.record(type(self), [self.pk], action, using)
+
+    save.alters_data = True
+
+
+class Medicine(TrackedModel):
     name = models.CharField(max_length=200)
     image = models.ImageField(upload_to='medicines/')
     description = models.TextField()
     stock_quantity = models.IntegerField(default=0)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Staff are alerted when stock falls to this; empty means LOW_STOCK_THRESHOLD.
+    low_stock_threshold = models.IntegerField(null=True, blank=True)
+
+    objects = CachedManager.from_queryset(MedicineQuerySet)()
 
     def __str__(self):
         return self.name
 
-class Doctor(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that save() can tell a threshold crossing without a query
+        instance._loaded_stock = instance.__dict__.get('stock_quantity')
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .alerts import stock_written
+
+        update_fields = kwargs.get('update_fields')
+        super().save(*args, **kwargs)
+        if update_fields is None or 'stock_quantity' in update_fields:
+            stock_written(self, getattr(self, '_loaded_stock', None), self._state.db)
+            self._loaded_stock = self.stock_quantity
+
+    save.alters_data = True
+
+class Doctor(TrackedModel):
     name = models.CharField(max_length=100)
     specialty = models.CharField(max_length=100)
     is_available = models.BooleanField(default=True)
 
+    objects = CachedManager()
+
     def __str__(self):
         return f"Dr. {self.name} ({self.specialty})"
 
@@ -71,7 +261,7 @@ class OTP(models.Model):
     def __str__(self):
         return f"OTP for {self.phone_number}"
 
-class Appointment(models.Model):
+class Appointment(TrackedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
     customer_name = models.CharField(max_length=100)
@@ -80,18 +270,152 @@ class Appointment(models.Model):
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # Date range filters and exports read appointments in date order.
+        indexes = [models.Index(fields=['date'], name='appointment_date')]
+
 class SaleRecord(models.Model):
     medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
     quantity_sold = models.IntegerField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, which would overwrite the timestamps bulk loads give.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
-        ordering = ['-timestamp'] # Latest sales first
+        # No default ordering: it made every query sort the whole table.
+        # Callers that want latest first order by -timestamp themselves.
+        indexes = [models.Index(fields=['timestamp'], name='sale_record_timestamp')]
 
-class Customer(models.Model):
+class Customer(TrackedModel):
     phone_number = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
-        return f"{self.name} ({self.phone_number})"
\ No newline at end of file
+        return f"{self.name} ({self.phone_number})"
+
+# ========== Sales rollups ==========
+# Pre-aggregated sales per medicine, maintained by App.analytics.roll_up_sales
+# (the rollup_sales command). Every SaleRecord with id <= the 'sales'
+# watermark is counted in both tables; newer ones are not yet.
+class HourlySales(models.Model):
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    quantity = models.BigIntegerField(default=0)
+    sales = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medicine', 'hour'], name='hourly_sales_medicine_hour'),
+        ]
+        indexes = [models.Index(fields=['hour'], name='hourly_sales_hour')]
+
+
+class DailySales(models.Model):
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE)
+    day = models.DateField()
+    quantity = models.BigIntegerField(default=0)
+    sales = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medicine', 'day'], name='daily_sales_medicine_day'),
+        ]
+        indexes = [models.Index(fields=['day'], name='daily_sales_day')]
+
+
+class RollupWatermark(models.Model):
+    """Highest source id folded into a rollup, per rollup name."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    # Highest id seen on the previous run; rolled up once it has settled.
+    pending_id = models.BigIntegerField(default=0)
+    pending_seen_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+# ========== Sales archive ==========
+class SaleArchive(models.Model):
+    """
+    One compressed file of SaleRecords moved out of the hot table by
+    App.archive.archive_sales. Holds every sale of ``month`` with
+    previous_id < id <= through_id.
+    """
+    month = models.DateField()  # First day of the month
+    filename = models.CharField(max_length=255, unique=True)
+    previous_id = models.BigIntegerField()
+    through_id = models.BigIntegerField()
+    rows = models.IntegerField()
+    quantity = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the archived rows are gone from SaleRecord.
+    purged_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['month'], name='sale_archive_month')]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} ({self.rows} sales)"
+
+
+# ========== Appointment reminders ==========
+class AppointmentReminder(models.Model):
+    """
+    One SMS reminder for an appointment, claimed by App.reminders before it
+    is sent. The unique constraint is what keeps a reminder from going out
+    twice, across restarts and concurrent schedulers. A rescheduled
+    appointment gets new reminders for its new date.
+    """
+    PENDING, SENT, FAILED = 'pending', 'sent', 'failed'
+    STATUSES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=8)  # App.reminders.OFFSETS key, e.g. '24h'
+    appointment_date = models.DateTimeField()  # The date the reminder was for
+    status = models.CharField(max_length=7, choices=STATUSES, default=PENDING)
+    batch = models.UUIDField()  # Dispatch that claimed it
+    message_sid = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['appointment', 'kind', 'appointment_date'], name='appointment_reminder_once',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['appointment_date'], name='reminder_appointment_date'),
+            models.Index(fields=['batch'], name='reminder_batch'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} reminder for {self.appointment_id} ({self.status})"
+
+
+# ========== SMS delivery ==========
+class MessageLog(models.Model):
+    """
+    One SMS sent through App.messages, keyed by the provider's message SID,
+    with the latest delivery status reported by its status callbacks
+    (App/message_status.py).
+    """
+    sid = models.CharField(max_length=34, primary_key=True)
+    phone_number = models.CharField(max_length=20, blank=True)
+    kind = models.CharField(max_length=20, blank=True)  # otp, confirmation or notification
+    status = models.CharField(max_length=12, default='queued')
+    # Callbacks can arrive out of order; a status never replaces a later one.
+    status_rank = models.SmallIntegerField(default=0)
+    error_code = models.CharField(max_length=10, blank=True)
+    # Empty when a callback arrived for a message sent before logging began.
+    sent_at = models.DateTimeField(null=True, blank=True)
+    status_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'sent_at'], name='message_log_status')]
+
+    def __str__(self):
+        return f"{self.sid} {self.status}"
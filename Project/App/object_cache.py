@@ -0,0 +1,266 @@
+"""
+Read-through cache of single rows by primary key, for the few hot Medicine
+and Doctor rows that bookings, detail views and the sales feed look up over
+and over.
+
+    Doctor.objects.get_cached(pk)             # or Doctor.DoesNotExist
+    Medicine.objects.get_many_cached(pks)     # {pk: medicine}, like in_bulk()
+    await Doctor.objects.aget_cached(pk)      # from async views
+
+Lookups go through two tiers before the database: a per-process LRU of
+OBJECT_CACHE_LOCAL_SIZE rows per model, then the shared default cache. Rows
+that do not exist are cached too, so a bad id does not reach the database
+every time.
+
+Every row has a version in the shared cache, bumped when a save, update or
+delete of it runs and again when it commits (ChangeLog.record calls
+invalidate_on_commit). Shared entries are stored with the version they were
+read at, and one whose version is no longer current is a miss. A reader
+that fetched the row just before a write committed therefore stores it
+under the old version, where nobody reads it. A bump in this process also
+drops the row from the local tier at once; a worker that did not write
+serves its local copy for up to OBJECT_CACHE_LOCAL_SECONDS before checking
+the version again.
+
+Rows written by the open transaction are read from the database and not
+cached, as other connections cannot see the write until it commits.
+
+On a miss, only the request holding a short lock in the shared cache
+(cache.add) reads the database and fills the entry; concurrent misses for
+the same row wait up to WAIT_SECONDS for it instead of all querying at
+once. Fills read from the primary, never from a lagging replica. That wait
+sleeps, so async code must use aget_cached, which runs the lookup in the
+sync thread instead of on the event loop.
+
+Hits and misses per tier are the ``object_cache.<model>.*`` counters at
+/api/metrics/, with a ``object_cache.<model>.hit_ratio`` gauge.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+
+from .instrumentation import metrics
+
+# A filler that died frees its rows after this many seconds.
+LOCK_SECONDS = 5
+# Longest wait for another request's fill before reading the database.
+WAIT_SECONDS = 1
+
+# Model -> its ObjectCache, for invalidate_on_commit
+_caches = {}
+
+
+class ObjectCache:
+    """Two-tier read-through cache of one model's rows by primary key."""
+
+    def __init__(self, model):
+        self.model = model
+        self.label = model._meta.label_lower
+        self._local = OrderedDict()  # pk -> (expires, instance or None)
+        self._lock = threading.Lock()
+        _caches[model] = self
+        metrics.gauge(f'object_cache.{self.label}.hit_ratio', self.hit_ratio)
+
+    def _entry_key(self, pk):
+        return f'object:{self.label}:{pk}'
+
+    def _version_key(self, pk):
+        return f'object-version:{self.label}:{pk}'
+
+    def _lock_key(self, pk):
+        return f'object-lock:{self.label}:{pk}'
+
+    def _pk(self, value):
+        """``value`` as the primary key type, None if it cannot be one."""
+        try:
+            return self.model._meta.pk.to_python(value)
+        except ValidationError:
+            return None
+
+    def _count(self, outcome, count):
+        if count:
+            metrics.increment(f'object_cache.{self.label}.{outcome}', count)
+
+    def hit_ratio(self):
+        hits = sum(metrics.counter(f'object_cache.{self.label}.{tier}') for tier in ('local_hit', 'shared_hit'))
+        lookups = hits + metrics.counter(f'object_cache.{self.label}.miss')
+        return round(hits / lookups, 4) if lookups else None
+
+    # ========== Lookups ==========
+    def get(self, pk):
+        """The row with primary key ``pk``, or the model's DoesNotExist."""
+        key = self._pk(pk)
+        instance = self.get_many([key]).get(key) if key is not None else None
+        if instance is None:
+            raise self.model.DoesNotExist(f'{self.model._meta.object_name} matching pk={pk!r} does not exist.')
+        return instance
+
+    def get_many(self, pks):
+        """{pk: instance} for those of ``pks`` that exist, like QuerySet.in_bulk()."""
+        pks = {pk for pk in map(self._pk, pks) if pk is not None}
+        using = router.db_for_write(self.model)
+        written = _written(using)
+        rows, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for pk in pks:
+                entry = self._local.get(pk)
+                if entry is not None and entry[0] > now and (self.label, pk) not in written:
+                    self._local.move_to_end(pk)
+                    rows[pk] = entry[1]
+                else:
+                    missing.append(pk)
+        self._count('local_hit', len(rows))
+
+        uncommitted = [pk for pk in missing if (self.label, pk) in written]
+        if uncommitted:
+            rows.update(self._fetch(uncommitted, using))
+        shared = self._get_shared([pk for pk in missing if (self.label, pk) not in written], using)
+        rows.update(shared)
+        self._store_local(shared)
+        # Copies, so a caller changing its instance does not change everybody's
+        return {pk: copy.copy(instance) for pk, instance in rows.items() if instance is not None}
+
+    def _get_shared(self, pks, using):
+        if not pks:
+            return {}
+        found = cache.get_many([self._entry_key(pk) for pk in pks] + [self._version_key(pk) for pk in pks])
+        rows, versions = {}, {}
+        for pk in pks:
+            version = found.get(self._version_key(pk))
+            if version is None:
+                version = _start_version(self._version_key(pk))
+            versions[pk] = version
+            entry = found.get(self._entry_key(pk))
+            if entry is not None and entry[0] == version:
+                rows[pk] = entry[1]
+        self._count('shared_hit', len(rows))
+        misses = [pk for pk in pks if pk not in rows]
+        self._count('miss', len(misses))
+        if misses:
+            rows.update(self._fill(misses, versions, using))
+        return rows
+
+    def _fill(self, pks, versions, using):
+        """Read ``pks`` from the database, one request per row at a time across processes."""
+        mine = [pk for pk in pks if cache.add(self._lock_key(pk), 1, LOCK_SECONDS)]
+        rows = {}
+        if mine:
+            try:
+                fetched = self._fetch(mine, using)
+                rows.update({pk: fetched.get(pk) for pk in mine})
+                cache.set_many(
+                    {self._entry_key(pk): (versions[pk], rows[pk]) for pk in mine}, settings.OBJECT_CACHE_SECONDS,
+                )
+            finally:
+                cache.delete_many([self._lock_key(pk) for pk in mine])
+        waiting = [pk for pk in pks if pk not in rows]
+        if waiting:
+            self._count('waited', len(waiting))
+            rows.update(self._wait(waiting, versions, using))
+        return rows
+
+    def _wait(self, pks, versions, using):
+        """Rows another request is filling, from the database if it takes too long."""
+        rows = {}
+        deadline = time.monotonic() + WAIT_SECONDS
+        delay = 0.005
+        while pks and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+            found = cache.get_many([self._entry_key(pk) for pk in pks])
+            for pk in pks:
+                entry = found.get(self._entry_key(pk))
+                if entry is not None and entry[0] == versions[pk]:
+                    rows[pk] = entry[1]
+            pks = [pk for pk in pks if pk not in rows]
+        if pks:
+            fetched = self._fetch(pks, using)
+            rows.update({pk: fetched.get(pk) for pk in pks})
+        return rows
+
+    def _fetch(self, pks, using):
+        return self.model._base_manager.using(using).in_bulk(pks)
+
+    def _store_local(self, rows):
+        expires = time.monotonic() + settings.OBJECT_CACHE_LOCAL_SECONDS
+        with self._lock:
+            for pk, instance in rows.items():
+                self._local[pk] = (expires, instance)
+                self._local.move_to_end(pk)
+            while len(self._local) > settings.OBJECT_CACHE_LOCAL_SIZE:
+                self._local.popitem(last=False)
+
+    # ========== Invalidation ==========
+    def invalidate(self, pks):
+        """Make every cached copy of the rows ``pks`` stale."""
+        with self._lock:
+            for pk in pks:
+                self._local.pop(pk, None)
+        for pk in pks:
+            key = self._version_key(pk)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Evicted: any number no entry was stored under will do
+                _start_version(key)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+def _start_version(key):
+    # From the current time rather than 1, so that an evicted version never
+    # comes back to a number an older entry was stored under. add() so that
+    # a concurrent bump is not overwritten.
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key, 0)
+
+
+def _written(using):
+    """(label, pk) of the cached rows the open transaction on ``using`` has written."""
+    connection = connections[using]
+    written = getattr(connection, '_object_cache_written', None)
+    if written is None:
+        return set()
+    if not connection.in_atomic_block:
+        # Committed or rolled back since; either way the marks are done with
+        written.clear()
+    return written
+
+
+def invalidate_on_commit(model, pks, using=None):
+    """
+    Invalidate the cached rows ``pks`` of ``model`` now and again once the
+    current transaction commits. The first bump covers a transaction that
+    rolls back (a rolled-back insert's id can be handed out again); the
+    second, rows other requests cached from the database in between.
+    """
+    object_cache = _caches.get(model)
+    if object_cache is None or not pks:
+        return
+    using = using or router.db_for_write(model)
+    pks = [object_cache._pk(pk) for pk in pks]
+    connection = connections[using]
+    marks = {(object_cache.label, pk) for pk in pks}
+    if connection.in_atomic_block:
+        if getattr(connection, '_object_cache_written', None) is None:
+            connection._object_cache_written = set()
+        connection._object_cache_written.update(marks)
+    object_cache.invalidate(pks)
+
+    def committed():
+        # Or the next transaction would still read these rows past the cache
+        if getattr(connection, '_object_cache_written', None):
+            connection._object_cache_written.difference_update(marks)
+        object_cache.invalidate(pks)
+
+    transaction.on_commit(committed, using=using)
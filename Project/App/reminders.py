@@ -0,0 +1,248 @@
+"""
+SMS reminders 24 hours and 1 hour before each appointment.
+
+ReminderScheduler (run by the send_reminders command) keeps the reminders
+falling due in the next day or so in a heap ordered by due time, instead of
+scanning the appointment table every minute:
+
+- Appointments are loaded through the index on ``date``, one refill window
+  at a time, as the window moves forward.
+- Appointments created, rescheduled or deleted in between arrive through
+  the ChangeLog (App/changelog.py). A rescheduled appointment gets new heap
+  entries; the old ones stay in the heap and are dropped when they come up,
+  because their date no longer matches.
+- Due reminders are sent in batches, concurrently through
+  App.messages.send_notifications.
+
+Before a batch is sent, each reminder is claimed by inserting an
+AppointmentReminder row, whose unique constraint allows one per
+appointment, kind and date. Reminders already claimed are skipped, so a
+restart never sends one twice. A crash between claim and send leaves the
+claim pending: the reminder is lost rather than sent twice.
+
+Reminders due before the appointment was booked are not sent (the booking
+confirmation covers them), and after downtime only the latest due reminder
+of an appointment goes out.
+"""
+
+import asyncio
+import heapq
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .changelog import changes_since, head
+from .messages import MessageHandler, send_notifications
+from .models import Appointment, AppointmentReminder
+
+# Reminder kind and how long before the appointment it is due, longest first.
+OFFSETS = (('24h', timedelta(hours=24)), ('1h', timedelta(hours=1)))
+LOOKAHEAD = OFFSETS[0][1]
+
+logger = logging.getLogger(__name__)
+
+
+def _appointments():
+    """Appointments that get reminders: verified, with a phone number."""
+    return Appointment.objects.filter(is_verified=True).exclude(phone_number='')
+
+
+class ReminderScheduler:
+    """
+    In-memory schedule of upcoming reminders.
+
+    Each heap entry is (due, appointment date, appointment id, kind), and
+    ``dates`` maps every scheduled appointment to the date its entries are
+    for. Call tick() regularly, or run() to do so until stopped.
+    """
+
+    def __init__(self, batch_size=None, concurrency=None, refill=timedelta(hours=1)):
+        self.batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+        self.concurrency = concurrency or settings.REMINDER_CONCURRENCY
+        self.refill = refill
+        self.heap = []
+        self.dates = {}
+        self.loaded_until = None
+        self.cursor = None
+        self._loop = asyncio.new_event_loop()
+
+    def close(self):
+        self._loop.close()
+
+    # ========== Filling ==========
+    def start(self, now=None):
+        """Load every reminder due from now until a refill past LOOKAHEAD."""
+        now = now or timezone.now()
+        # Take the cursor first; changes made during the load are applied
+        # again, which is harmless.
+        self.cursor = head()
+        self.heap, self.dates = [], {}
+        self.loaded_until = now + LOOKAHEAD + self.refill
+        self._load(now, self.loaded_until)
+
+    def _load(self, start, end):
+        """Schedule the appointments with start < date <= end."""
+        rows = _appointments().filter(date__gt=start, date__lte=end).values_list('id', 'date', 'created_at')
+        claimed = set(AppointmentReminder.objects.filter(
+            appointment_date__gt=start, appointment_date__lte=end,
+        ).values_list('appointment_id', 'kind', 'appointment_date').iterator(chunk_size=10000))
+        for pk, date, created_at in rows.iterator(chunk_size=10000):
+            self.schedule(pk, date, created_at, claimed)
+
+    def schedule(self, pk, date, created_at, claimed=()):
+        """Push the reminders of one appointment, unless already scheduled for ``date``."""
+        if self.dates.get(pk) == date:
+            return
+        self.dates.pop(pk, None)
+        for kind, offset in OFFSETS:
+            due = date - offset
+            if due > created_at and (pk, kind, date) not in claimed:
+                heapq.heappush(self.heap, (due, date, pk, kind))
+                self.dates[pk] = date
+
+    def extend(self, now):
+        """Load the next refill window once the loaded one runs short."""
+        if self.loaded_until - now >= LOOKAHEAD + self.refill / 2:
+            return
+        # Forget appointments that have passed; their entries are all popped.
+        self.dates = {pk: date for pk, date in self.dates.items() if date > now}
+        start, self.loaded_until = self.loaded_until, now + LOOKAHEAD + self.refill
+        self._load(start, self.loaded_until)
+
+    def sync(self, now):
+        """Apply appointment changes from the ChangeLog since the last sync."""
+        while True:
+            data = changes_since(self.cursor, feeds=['appointments'], now=now)
+            if data['reset']:
+                self.start(now)
+                return
+            advanced = data['seq'] != self.cursor
+            self.cursor = data['seq']
+            if 'appointments' in data['changes']:
+                self._apply(data['changes']['appointments'], now)
+            if not (data['more'] and advanced):
+                return
+
+    def _apply(self, delta, now):
+        pks = {uuid.UUID(str(row['id'])) for row in delta['upserted']}
+        pks |= {uuid.UUID(str(pk)) for pk in delta['deleted']}
+        rows = _appointments().filter(
+            pk__in=pks, date__gt=now, date__lte=self.loaded_until,
+        ).values_list('id', 'date', 'created_at')
+        current = {pk: (date, created_at) for pk, date, created_at in rows}
+        for pk in pks - set(current):
+            # Deleted, no longer verified or moved out of the window
+            self.dates.pop(pk, None)
+        claimed = set(AppointmentReminder.objects.filter(appointment_id__in=list(current)).values_list(
+            'appointment_id', 'kind', 'appointment_date',
+        ))
+        for pk, (date, created_at) in current.items():
+            self.schedule(pk, date, created_at, claimed)
+
+    # ========== Dispatch ==========
+    def pop_due(self, now):
+        """Up to batch_size reminders due at ``now``, as (appointment id, kind, date)."""
+        batch = []
+        while self.heap and self.heap[0][0] <= now and len(batch) < self.batch_size:
+            due, date, pk, kind = heapq.heappop(self.heap)
+            if self.dates.get(pk) != date:
+                continue  # Rescheduled or deleted since it was pushed
+            if any(date - offset <= now for _, offset in OFFSETS if offset < due_offset(kind)):
+                continue  # A later reminder is already due
+            batch.append((pk, kind, date))
+        return batch
+
+    def next_due(self):
+        return self.heap[0][0] if self.heap else None
+
+    def dispatch(self, batch):
+        """
+        Claim and send one batch of reminders.
+
+        Returns:
+            dict: { 'sent': int, 'failed': int, 'skipped': int claimed
+            elsewhere or no longer matching the appointment }
+        """
+        due = len(batch)
+        appointments = {
+            appointment.pk: appointment
+            for appointment in _appointments().filter(pk__in=[pk for pk, _, _ in batch]).select_related('doctor')
+        }
+        # Rows changed since they were scheduled wait for sync() to reschedule them.
+        batch = [entry for entry in batch if entry[0] in appointments and appointments[entry[0]].date == entry[2]]
+        token = uuid.uuid4()
+        AppointmentReminder.objects.bulk_create(
+            [AppointmentReminder(appointment_id=pk, kind=kind, appointment_date=date, batch=token)
+             for pk, kind, date in batch],
+            ignore_conflicts=True,
+        )
+        claimed = list(AppointmentReminder.objects.filter(batch=token).order_by('id'))
+        if not claimed:
+            return {'sent': 0, 'failed': 0, 'skipped': due}
+
+        messages = []
+        for reminder in claimed:
+            appointment = appointments[reminder.appointment_id]
+            messages.append((appointment.phone_number, MessageHandler.appointment_reminder_message(
+                appointment.doctor.name,
+                timezone.localtime(appointment.date).strftime('%d %b %Y, %I:%M %p'),
+                int(due_offset(reminder.kind).total_seconds() // 3600),
+            )))
+        results = self._loop.run_until_complete(send_notifications(messages, self.concurrency))
+
+        sent_at = timezone.now()
+        for reminder, result in zip(claimed, results):
+            reminder.status = AppointmentReminder.SENT if result['success'] else AppointmentReminder.FAILED
+            reminder.message_sid = result['message_sid'] or ''
+            reminder.error = result['error'] or ''
+            reminder.sent_at = sent_at
+        AppointmentReminder.objects.bulk_update(claimed, ['status', 'message_sid', 'error', 'sent_at'])
+        failed = sum(1 for result in results if not result['success'])
+        return {'sent': len(claimed) - failed, 'failed': failed, 'skipped': due - len(claimed)}
+
+    def tick(self, now=None):
+        """
+        Sync, refill and send everything due.
+
+        Returns:
+            dict: { 'sent': int, 'failed': int, 'skipped': int }
+        """
+        now = now or timezone.now()
+        if self.cursor is None:
+            self.start(now)
+        self.sync(now)
+        self.extend(now)
+        totals = {'sent': 0, 'failed': 0, 'skipped': 0}
+        while True:
+            batch = self.pop_due(now)
+            if not batch:
+                return totals
+            for name, count in self.dispatch(batch).items():
+                totals[name] += count
+
+    def run(self, poll=None, stop=None):
+        """
+        tick() until ``stop`` (a threading.Event) is set, sleeping until the
+        next reminder is due but at most ``poll`` seconds in between.
+        """
+        poll = poll or settings.REMINDER_POLL_SECONDS
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            totals = self.tick()
+            if totals['sent'] or totals['failed']:
+                logger.info('Reminders: %(sent)d sent, %(failed)d failed, %(skipped)d skipped', totals)
+            close_old_connections()
+            wait = poll
+            if self.next_due() is not None:
+                wait = min(poll, max(0, (self.next_due() - timezone.now()).total_seconds()))
+            stop.wait(wait)
+
+
+def due_offset(kind):
+    """How long before the appointment a reminder of ``kind`` is due."""
+    return dict(OFFSETS)[kind]
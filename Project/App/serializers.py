@@ -1,3 +1,5 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
 from rest_framework import serializers
 from .models import Medicine, Doctor, Appointment, SaleRecord, OTP, Customer
 
@@ -21,13 +23,42 @@ class CustomerSerializer(serializers.ModelSerializer):
         model = Customer
         fields = '__all__'
 
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves the id through the related model's object cache (App/object_cache.py)."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.get_queryset().model.objects.get_cached(data)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+
 class AppointmentSerializer(serializers.ModelSerializer):
+    # A bulk upload names the same few doctors over and over
+    doctor = CachedPrimaryKeyRelatedField(queryset=Doctor.objects.all())
+
     class Meta:
         model = Appointment
         fields = '__all__'
 
+class SaleRecordListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        sales = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Every medicine on the page with one lookup in the object cache
+        self.child.medicines = Medicine.objects.get_many_cached({sale.medicine_id for sale in sales})
+        return super().to_representation(sales)
+
 class SaleRecordSerializer(serializers.ModelSerializer):
-    medicine_name = serializers.ReadOnlyField(source='medicine.name')
+    medicine_name = serializers.SerializerMethodField()
     class Meta:
         model = SaleRecord
-        fields = ['id', 'medicine_name', 'quantity_sold', 'timestamp']
\ No newline at end of file
+        fields = ['id', 'medicine_name', 'quantity_sold', 'timestamp']
+        list_serializer_class = SaleRecordListSerializer
+
+    def get_medicine_name(self, sale):
+        medicines = getattr(self, 'medicines', None)
+        if medicines is None:
+            medicines = Medicine.objects.get_many_cached([sale.medicine_id])
+        medicine = medicines.get(sale.medicine_id)
+        return medicine.name if medicine else None
\ No newline at end of file
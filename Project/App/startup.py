@@ -0,0 +1,104 @@
+"""
+Cold start profile: where a fresh process spends its time before it can
+serve the first request.
+
+profile_startup() runs a new interpreter with ``python -X importtime``
+that goes through django.setup() step by step and then loads the URLconf,
+timing each phase. Every worker boot, management command and test run pays
+for these phases; a worker also pays for the URLconf before answering its
+first request.
+
+Heavy libraries used by only a few endpoints (numpy, twilio) are imported
+inside the functions that need them, so they do not show up here; HEAVY
+lists them for the regression test in App/tests.py.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+# Modules that must not be loaded by startup, only on first use.
+HEAVY = ('numpy', 'twilio')
+
+# django.setup() split into its steps, then the URLconf.
+SCRIPT = '''
+import json, time
+started = time.perf_counter()
+phases = {}
+def mark(name):
+    global started
+    now = time.perf_counter()
+    phases[name] = (now - started) * 1000
+    started = now
+import django
+mark('import django')
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings')
+from django.utils.log import configure_logging
+configure_logging(settings.LOGGING_CONFIG, settings.LOGGING)
+mark('logging')
+from django.apps import apps
+apps.populate(settings.INSTALLED_APPS)
+mark('apps (models and ready())')
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('URLconf')
+print(json.dumps(phases))
+'''
+
+
+class StartupProfileError(Exception):
+    pass
+
+
+def _parse_importtime(stderr):
+    """[(module, depth, self µs, cumulative µs)] from ``-X importtime`` output, in import order."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        first, cumulative_us, name = line.split('|', 2)
+        self_us = first.split(':', 1)[1]
+        if not self_us.strip().isdigit():
+            continue  # The header line
+        # One space after the bar, then two per level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def profile_startup(python=sys.executable):
+    """
+    Profile a cold start of this project in a new interpreter.
+
+    Returns:
+        dict: { 'phases': {phase: ms}, 'total_ms': float, 'imports':
+        [(module, depth, self µs, cumulative µs), ...] }
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'Project.settings')}
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise StartupProfileError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed')
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    return {'phases': phases, 'total_ms': sum(phases.values()), 'imports': _parse_importtime(result.stderr)}
+
+
+def by_package(imports):
+    """Self time per top-level package, in ms, largest first."""
+    totals = defaultdict(int)
+    for module, _, self_us, _ in imports:
+        totals[module.split('.')[0]] += self_us
+    return sorted(((package, us / 1000) for package, us in totals.items()), key=lambda item: -item[1])
+
+
+def loaded_heavy_modules(imports):
+    """The HEAVY packages a cold start imported."""
+    return sorted({module.split('.')[0] for module, _, _, _ in imports} & set(HEAVY))
@@ -0,0 +1,337 @@
+"""
+Build step for the site's JavaScript and CSS (the build_static command).
+
+Each bundle in BUNDLES is the concatenation of some files in static/,
+minified, and written to STATIC_BUILD_DIR under a content-hashed name
+(``home.3f2a9c01b7de.js``) with precompressed ``.gz`` and, when the brotli
+package is installed, ``.br`` siblings. manifest.json maps bundle names to
+the hashed files.
+
+Templates reference bundles with ``{% bundle 'home.js' %}``
+(App/templatetags/assets.py): the hashed file once built, the separate
+source files before that, so development needs no build. A hashed name
+changes whenever its content does, so the files are served with
+``Cache-Control: immutable`` and a year's max-age (views.static_asset);
+browsers never revalidate them and pick up a new build through the new
+name in the page.
+
+The minifiers are deliberately conservative, as there is no JavaScript
+toolchain on the servers: comments, indentation and blank lines go, and
+line breaks are kept wherever automatic semicolon insertion could depend
+on them. Strings, template literals and regular expressions are copied
+as they are.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # Optional: .br files are skipped without it
+    brotli = None
+
+# Bundle name: source files in static/, in order.
+BUNDLES = {
+    'site.css': ['style.css'],
+    'admin.css': ['admin.css'],
+    'home.js': ['script.js', 'home.js'],
+    'book_appointment.js': ['book_appointment.js'],
+    'admin.js': ['admin.js'],
+}
+# Template: static file its inline <script> is extracted to.
+INLINE_SCRIPTS = {
+    'home.html': 'home.js',
+    'book_appointment.html': 'book_appointment.js',
+}
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+
+# Characters around which whitespace never matters in JavaScript. + - / and
+# . are left out: "a - -b", "a + +b" and "return /x/" need their spaces.
+_JS_PUNCTUATION = set('{}()[];,:=<>?!&|*')
+# An expression cannot end in one of these, so a / after them starts a regex.
+_JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'throw', 'new', 'delete')
+
+
+# ========== JavaScript ==========
+def _skip_string(source, i):
+    """Index after the string literal starting at ``source[i]``."""
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        if source[i] == '\\':
+            i += 1
+        elif source[i] == '\n':
+            break  # Unterminated; leave the rest to the browser
+        i += 1
+    return i + 1
+
+
+def _skip_template(source, i):
+    """Index after the template literal starting at ``source[i]``, ${...} included."""
+    i += 1
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+        elif char == '`':
+            return i + 1
+        elif source.startswith('${', i):
+            i = _skip_expression(source, i + 2)
+        else:
+            i += 1
+    return i
+
+
+def _skip_expression(source, i):
+    """Index after the ``}`` closing a template literal's ${ expression."""
+    depth = 0
+    while i < len(source):
+        char = source[i]
+        if char in '\'"':
+            i = _skip_string(source, i)
+            continue
+        if char == '`':
+            i = _skip_template(source, i)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            if depth == 0:
+                return i + 1
+            depth -= 1
+        i += 1
+    return i
+
+
+def _skip_regex(source, i):
+    """Index after the regular expression literal starting at ``source[i]``, flags included."""
+    i += 1
+    in_class = False
+    while i < len(source) and source[i] != '\n':
+        char = source[i]
+        if char == '\\':
+            i += 1
+        elif char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] == '_'):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def _starts_regex(out):
+    """Whether a / following the output so far starts a regex rather than dividing."""
+    text = ''.join(out[-12:]).rstrip()
+    if not text or text[-1] in _JS_REGEX_AFTER:
+        return True
+    return any(re.search(rf'(^|[^\w$.]){keyword}$', text) for keyword in _JS_REGEX_KEYWORDS)
+
+
+def minify_js(source):
+    """Strip comments, indentation and blank lines from a script."""
+    out = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char in '\'"':
+            end = _skip_string(source, i)
+            out.append(source[i:end])
+            i = end
+        elif char == '`':
+            end = _skip_template(source, i)
+            out.append(source[i:end])
+            i = end
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = len(source) if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = len(source) if end == -1 else end + 2
+            # A comment spanning lines still ends the line for ASI.
+            out.append('\n' if '\n' in source[i:end] else ' ')
+            i = end
+        elif char == '/' and _starts_regex(out):
+            end = _skip_regex(source, i)
+            out.append(source[i:end])
+            i = end
+        elif char in ' \t\r\n':
+            end = i
+            while end < len(source) and source[end] in ' \t\r\n':
+                end += 1
+            out.append('\n' if '\n' in source[i:end] else ' ')
+            i = end
+        else:
+            out.append(char)
+            i += 1
+    return _tidy_js(out)
+
+
+def _tidy_js(pieces):
+    """Drop the whitespace pieces that cannot matter."""
+    result = []
+    for index, piece in enumerate(pieces):
+        if piece not in (' ', '\n'):
+            result.append(piece)
+            continue
+        before = result[-1][-1] if result and result[-1] else ''
+        after = next((p[0] for p in pieces[index + 1:] if p not in (' ', '\n') and p), '')
+        if not before or not after:
+            continue
+        if piece == '\n':
+            # A line break after { ; , or before } never ends a statement
+            # differently; anywhere else it might.
+            if before in '{;,' or after == '}' or before == '\n':
+                continue
+            if result[-1] == ' ':
+                result.pop()
+            result.append('\n')
+        elif before in _JS_PUNCTUATION or after in _JS_PUNCTUATION or before == '\n':
+            continue
+        else:
+            result.append(' ')
+    return ''.join(result).strip() + '\n'
+
+
+# ========== CSS ==========
+def minify_css(source):
+    """Strip comments and the whitespace that cannot matter from a stylesheet."""
+    out, strings = [], []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char in '\'"':
+            end = _skip_string(source, i)
+            # Set aside so the rules below never touch a string's content
+            out.append(f'\0{len(strings)}\0')
+            strings.append(source[i:end])
+            i = end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            out.append(' ')
+            i = len(source) if end == -1 else end + 2
+        else:
+            out.append(char)
+            i += 1
+    text = re.sub(r'\s+', ' ', ''.join(out))
+    # Not before ':' (a descendant " :hover" needs its space) nor around
+    # + and - (calc() needs theirs).
+    text = re.sub(r' ?([{};,>]) ?', r'\1', text).replace(': ', ':').replace(';}', '}')
+    text = re.sub('\0(\\d+)\0', lambda match: strings[int(match.group(1))], text)
+    return text.strip() + '\n'
+
+
+# ========== Templates ==========
+_INLINE_SCRIPT = re.compile(r'( *)<script>\n(.*?)\n\s*</script>', re.S)
+
+
+def extract_inline_scripts(template_path, script_path, static_name):
+    """
+    Move the inline <script> blocks of a template into ``script_path`` and
+    reference it instead. Blocks using template syntax stay inline.
+
+    Returns:
+        int: number of blocks extracted
+    """
+    with open(template_path, encoding='utf-8', newline='') as handle:
+        template = handle.read()
+    newline = '\r\n' if '\r\n' in template else '\n'
+    template = template.replace('\r\n', '\n')
+    scripts = []
+
+    def extract(match):
+        indent, body = match.groups()
+        if '{%' in body or '{{' in body:
+            return match.group(0)
+        lines = body.split('\n')
+        margin = min((len(line) - len(line.lstrip()) for line in lines if line.strip()), default=0)
+        scripts.append('\n'.join(line[margin:] for line in lines))
+        return f"{indent}<script src=\"{{% static '{static_name}' %}}\"></script>" if len(scripts) == 1 else ''
+
+    template = _INLINE_SCRIPT.sub(extract, template)
+    if not scripts:
+        return 0
+    # Written with the template's line endings
+    with open(script_path, 'w', encoding='utf-8', newline=newline) as handle:
+        handle.write('\n\n'.join(scripts) + '\n')
+    with open(template_path, 'w', encoding='utf-8', newline=newline) as handle:
+        handle.write(template)
+    return len(scripts)
+
+
+# ========== Build ==========
+def read_manifest(build_dir):
+    """Bundle name -> hashed file name of the last build, {} if there is none."""
+    try:
+        with open(os.path.join(build_dir, MANIFEST), encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write(path, data):
+    with open(path, 'wb') as handle:
+        handle.write(data)
+
+
+def build(source_dir, build_dir, bundles=None):
+    """
+    Minify, hash and precompress every bundle into ``build_dir``.
+
+    Files of the previous build are kept, for pages rendered before this
+    one; older ones are removed.
+
+    Returns:
+        list: per bundle (name, hashed file name, source bytes, minified
+        bytes, gzip bytes, brotli bytes or None)
+    """
+    bundles = bundles or BUNDLES
+    os.makedirs(build_dir, exist_ok=True)
+    previous = set(read_manifest(build_dir).values())
+    manifest, results = {}, []
+    for name, sources in bundles.items():
+        texts = []
+        for source in sources:
+            with open(os.path.join(source_dir, source), encoding='utf-8') as handle:
+                texts.append(handle.read())
+        if name.endswith('.js'):
+            # The ; keeps a file ending without one from running into the next
+            content = ';\n'.join(minify_js(text) for text in texts)
+        else:
+            content = ''.join(minify_css(text) for text in texts)
+        data = content.encode('utf-8')
+        stem, extension = os.path.splitext(name)
+        hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}'
+        path = os.path.join(build_dir, hashed)
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        _write(path, data)
+        _write(f'{path}.gz', compressed)
+        brotli_size = None
+        if brotli is not None:
+            compressed_br = brotli.compress(data, quality=11)
+            _write(f'{path}.br', compressed_br)
+            brotli_size = len(compressed_br)
+        manifest[name] = hashed
+        results.append((name, hashed, sum(len(text.encode('utf-8')) for text in texts), len(data),
+                        len(compressed), brotli_size))
+
+    path = os.path.join(build_dir, MANIFEST)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(f'{path}.tmp', path)
+
+    keep = previous | set(manifest.values())
+    for filename in os.listdir(build_dir):
+        base = re.sub(r'\.(gz|br)$', '', filename)
+        if filename != MANIFEST and base not in keep:
+            os.remove(os.path.join(build_dir, filename))
+    return results
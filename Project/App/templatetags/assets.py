@@ -0,0 +1,52 @@
+"""
+{% bundle %}: the tag for a bundle of App/static_build.py.
+
+    {% load assets %}
+    {% bundle 'site.css' %}
+    {% bundle 'home.js' %}
+
+Renders the content-hashed file once build_static has run, and one tag per
+source file before that, so pages work without a build in development.
+"""
+
+import os
+
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from App.static_build import BUNDLES, MANIFEST, read_manifest
+
+register = template.Library()
+
+# (manifest path, mtime) -> manifest; re-read only when a build replaces it
+_manifest_cache = {}
+
+
+def _manifest():
+    path = os.path.join(settings.STATIC_BUILD_DIR, MANIFEST)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return {}
+    if key not in _manifest_cache:
+        _manifest_cache.clear()
+        _manifest_cache[key] = read_manifest(settings.STATIC_BUILD_DIR)
+    return _manifest_cache[key]
+
+
+def _tag(url):
+    if url.split('?')[0].endswith('.css'):
+        return format_html('<link rel="stylesheet" href="{}" />', url)
+    return format_html('<script src="{}"></script>', url)
+
+
+@register.simple_tag
+def bundle(name):
+    if name not in BUNDLES:
+        raise template.TemplateSyntaxError(f'Unknown bundle {name!r}')
+    hashed = _manifest().get(name)
+    if hashed:
+        return _tag(static(f'dist/{hashed}'))
+    return format_html_join('\n', '{}', ((_tag(static(source)),) for source in BUNDLES[name]))
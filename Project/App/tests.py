@@ -1,3 +1,2284 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import importlib.util
+import logging
+import logging.config
+import logging.handlers
+import math
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from statistics import NormalDist
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Trunc
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.log import configure_logging
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from . import alerts, async_views, forecasting, message_status, views
+from .analytics import roll_up_sales, with_total_sold
+from .archive import ArchiveError, archive_sales, load_sales
+from .cache_backends import SQLiteCache
+from .changelog import changes_since, compact_changes
+from .dashboard import dashboard_summary
+from .idempotency import _cache_keys, _fingerprint
+from .log_queue import BoundedQueueHandler
+from .message_status import StatusBuffer, flush_statuses, record_sent, sign_callback
+from .messages import AsyncMessageHandler, MessageHandler
+from .reminders import ReminderScheduler
+from .startup import loaded_heavy_modules, profile_startup
+from .static_build import build, extract_inline_scripts, minify_css, minify_js, read_manifest
+from .db_pool import pool_stats
+from .db_routers import PIN_COOKIE, PrimaryReplicaRouter, reading_from_replica
+from .forecasting import load_demand, reorder_points
+from .instrumentation import metrics, track_transactions
+from .models import (
+    Appointment, AppointmentReminder, ChangeLog, Customer, DailySales, Doctor, HourlySales, Medicine, MessageLog, OTP, RollupWatermark,
+    SaleArchive,
+    SaleRecord, UserProfile,
+)
+from .serializers import DoctorSerializer
+from .services import OTPVerificationError, customer_login
+from .throttling import OTPSendThrottle, hit
+from .transactions import (
+    ATOMIC, READ_ONLY, TransactionPolicyError, atomic, current_policy, external_io,
+)
+
+# ========== Query budgets ==========
+# Every named route in Project/urls.py and App/urls.py declares the maximum
+# number of SQL statements one request may run. The budget is a constant, so
+# it is checked at several data sizes: a view whose query count grows with
+# the number of rows (an N+1) blows it at the larger sizes.
+URLCONFS = ['Project.urls', 'App.urls']
+DATA_SIZES = [1, 10, 50]
+PHONE = '9876543210'
+SMS_OK = {'success': True, 'message_sid': 'SM123', 'error': None}
+
+# Transaction control is bookkeeping, not a round trip we want to budget.
+IGNORED_SQL_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT')
+
+# Routes that are deliberately not exercised, with the reason.
+UNBUDGETED_ROUTES = {
+    'admin_dashboard': 'templates/admin_dashboard.html is not in the tree yet',
+}
+
+
+class Budget:
+    """
+    One request to make against a named route and the query count it may not exceed.
+
+    ``kwargs`` and ``data`` are callables taking the test case, so they can
+    refer to the rows created for the current data size.
+    """
+
+    def __init__(self, route, queries, method='get', kwargs=None, data=None, auth=False, status=200):
+        self.route = route
+        self.queries = queries
+        self.method = method
+        self.kwargs = kwargs or (lambda case: {})
+        self.data = data or (lambda case: None)
+        self.auth = auth
+        self.status = status
+
+    def __str__(self):
+        return f'{self.method.upper()} {self.route}'
+
+
+def verified_otp(case):
+    OTP.objects.create(
+        phone_number=PHONE, otp_code='123456', is_verified=True,
+        expires_at=timezone.now() + timedelta(minutes=10),
+    )
+    return {
+        'phone_number': PHONE, 'customer_name': 'Budget Test',
+        'doctor': case.doctor.id, 'date': '2030-01-01T10:00:00Z',
+    }
+
+
+def pending_otp(case):
+    OTP.objects.create(
+        phone_number=PHONE, otp_code='123456',
+        expires_at=timezone.now() + timedelta(minutes=10),
+    )
+    return {'phone_number': PHONE, 'otp_code': '123456', 'customer_name': 'Budget Test'}
+
+
+BUDGETS = [
+    Budget('api-root', 1, auth=True),
+    Budget('home', 3),
+    Budget('catalog_rows', 1, data=lambda case: {'after': case.medicine.pk}),
+    Budget('book_appointment', 0),
+    Budget('static_asset', 0, kwargs=lambda case: {'name': 'missing.js'}, status=404),
+    # Catalog
+    Budget('medicine-list', 1),
+    Budget('medicine-detail', 1, kwargs=lambda case: {'pk': case.medicine.pk}),
+    Budget('medicine-detail', 4, method='patch', auth=True, kwargs=lambda case: {'pk': case.medicine.pk},
+           data=lambda case: {'price': '12.50'}),
+    # Cascades: one DELETE each for sales, hourly and daily rollups. Writes
+    # to tracked models also insert their ChangeLog row.
+    Budget('medicine-detail', 7, method='delete', auth=True, status=204,
+           kwargs=lambda case: {'pk': case.medicine.pk}),
+    Budget('doctor-list', 1),
+    Budget('doctor-list', 3, method='post', auth=True, status=201, data=lambda case: {
+        'name': 'Budget', 'specialty': 'Ayurveda',
+    }),
+    Budget('doctor-detail', 1, kwargs=lambda case: {'pk': case.doctor.pk}),
+    # Bulk writes: the same queries whatever the number of items. Deletes
+    # look up which ids exist, then the cascade as for a single delete.
+    Budget('medicine-bulk', 4, method='patch', auth=True, data=lambda case: [
+        {'id': case.medicine.pk, 'price': '12.50'},
+    ]),
+    Budget('doctor-bulk', 3, method='post', auth=True, status=201, data=lambda case: [
+        {'name': 'Budget', 'specialty': 'Ayurveda'},
+    ]),
+    Budget('appointment-bulk', 6, method='delete', auth=True, data=lambda case: [str(case.appointment.pk)]),
+    Budget('appointment-list', 1),
+    Budget('appointment-detail', 1, kwargs=lambda case: {'pk': case.appointment.pk}),
+    # Medicine names from the object cache: one query more when it is cold
+    Budget('salerecord-list', 2),
+    Budget('salerecord-detail', 2, kwargs=lambda case: {'pk': case.sale.pk}),
+    # OTP and booking
+    Budget('send_otp', 2, method='post', data=lambda case: {'phone_number': PHONE}),
+    Budget('verify_otp', 2, method='post', data=lambda case: {
+        **pending_otp(case), 'customer_name': '',
+    }),
+    Budget('create_appointment', 4, method='post', status=201, data=verified_otp),
+    # Admin authentication
+    Budget('register', 3, method='post', status=201, data=lambda case: {
+        'username': 'budget-admin', 'password': 'budget-pass',
+    }),
+    Budget('login', 2, method='post', data=lambda case: {
+        'username': 'admin', 'password': 'admin-pass',
+    }),
+    Budget('logout', 2, method='post', auth=True),
+    # Customer authentication
+    Budget('customer_send_otp', 2, method='post', data=lambda case: {'phone_number': PHONE}),
+    Budget('customer_verify_otp', 6, method='post', data=pending_otp),
+    Budget('customer_logout', 2, method='post', auth=True),
+    Budget('customer_appointments', 2, auth=True, data=lambda case: {'phone_number': PHONE}),
+    # Staff only
+    Budget('metrics', 1, auth=True),
+    # The watermark is read before and after the rollups, then the raw tail
+    Budget('reorder_report', 6, auth=True),
+    Budget('export', 2, auth=True, kwargs=lambda case: {'dataset': 'appointments', 'fmt': 'csv'}),
+    Budget('export', 4, auth=True, kwargs=lambda case: {'dataset': 'sales', 'fmt': 'jsonl'}),
+    Budget('export', 2, auth=True, kwargs=lambda case: {'dataset': 'catalog', 'fmt': 'csv'}),
+    Budget('changes', 7, auth=True, data=lambda case: {'after': '0'}),
+    Budget('dashboard_summary', 9, auth=True),  # Cold cache: every section computed
+    # Provider callbacks; unsigned ones are turned away before any query
+    Budget('message_status', 0, method='post', status=403, data=lambda case: {
+        'MessageSid': f'SM{"0" * 32}', 'MessageStatus': 'delivered',
+    }),
+    Budget('sales_analytics', 5, auth=True, data=lambda case: {'bucket': 'day', 'medicine': case.medicine.pk}),
+    # Native async variants
+    Budget('async_send_otp', 2, method='post', data=lambda case: {'phone_number': PHONE}),
+    Budget('async_verify_otp', 2, method='post', data=lambda case: {
+        **pending_otp(case), 'customer_name': '',
+    }),
+    Budget('async_create_appointment', 4, method='post', status=201, data=verified_otp),
+    Budget('async_customer_send_otp', 2, method='post', data=lambda case: {'phone_number': PHONE}),
+    Budget('async_customer_verify_otp', 6, method='post', data=pending_otp),
+]
+
+
+def named_routes(urlconf):
+    """Names of every route in ``urlconf``, format suffix variants folded in."""
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                # The Django admin has its own query behaviour and is not ours to budget.
+                if pattern.app_name != 'admin':
+                    walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names.add(pattern.name)
+
+    walk(get_resolver(urlconf).url_patterns)
+    return names
+
+
+def reverse_anywhere(route, kwargs):
+    """Reverse ``route`` in the first urlconf that defines it, returning (urlconf, url)."""
+    for urlconf in URLCONFS:
+        try:
+            return urlconf, reverse(route, urlconf=urlconf, kwargs=kwargs)
+        except NoReverseMatch:
+            continue
+    raise NoReverseMatch(f'No urlconf defines {route!r}')
+
+
+def budgeted_queries(captured):
+    return [
+        query['sql'] for query in captured
+        if not query['sql'].upper().startswith(IGNORED_SQL_PREFIXES)
+    ]
+
+
+def patch_sms(case):
+    """Replace both SMS handlers with mocks that report a successful send."""
+    for target, mock_class in (
+        ('App.views.MessageHandler', mock.Mock),
+        ('App.async_views.AsyncMessageHandler', mock.AsyncMock),
+    ):
+        patcher = mock.patch(target)
+        handler = patcher.start()
+        case.addCleanup(patcher.stop)
+        handler.return_value.send_otp_to_phone = mock_class(return_value=SMS_OK)
+        handler.return_value.send_appointment_confirmation = mock_class(return_value=SMS_OK)
+
+
+class QueryBudgetTests(TestCase):
+    """Assert every route stays within its declared query budget as data grows."""
+
+    def setUp(self):
+        patch_sms(self)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='admin-pass', is_staff=True)
+        cls.token = Token.objects.create(user=cls.admin)
+
+    def grow_to(self, size):
+        """Top every model up to ``size`` rows."""
+        for i in range(Medicine.objects.count(), size):
+            Medicine.objects.create(
+                name=f'Medicine {i}', image='medicines/x.png', description='d',
+                stock_quantity=i, price=Decimal('10.00'),
+            )
+        for i in range(Doctor.objects.count(), size):
+            Doctor.objects.create(name=f'Doctor {i}', specialty='Ayurveda')
+        self.medicine = Medicine.objects.order_by('pk').first()
+        self.doctor = Doctor.objects.order_by('pk').first()
+        for i in range(Appointment.objects.count(), size):
+            Appointment.objects.create(
+                doctor=self.doctor, customer_name=f'Customer {i}', phone_number=PHONE,
+                date=timezone.now() + timedelta(days=i),
+            )
+        medicine_ids = list(Medicine.objects.values_list('pk', flat=True))
+        for i in range(SaleRecord.objects.count(), size):
+            SaleRecord.objects.create(medicine_id=medicine_ids[i], quantity_sold=1)
+        for i in range(Customer.objects.count(), size):
+            Customer.objects.create(phone_number=f'{9000000000 + i}', name=f'Customer {i}')
+        self.appointment = Appointment.objects.first()
+        self.sale = SaleRecord.objects.first()
+
+    def run_budget(self, budget):
+        urlconf, url = reverse_anywhere(budget.route, budget.kwargs(self))
+        client = APIClient()
+        if budget.auth:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Start every request with fresh OTP rate limit counters.
+        cache.clear()
+        with override_settings(ROOT_URLCONF=urlconf), transaction.atomic():
+            data = budget.data(self)
+            with CaptureQueriesContext(connection) as captured:
+                if budget.method == 'get':
+                    response = client.get(url, data)
+                else:
+                    response = getattr(client, budget.method)(url, data, format='json')
+                if response.streaming:
+                    # Streamed bodies run their queries as they are read.
+                    b''.join(response.streaming_content)
+            # Undo writes so every request sees the same data set.
+            transaction.set_rollback(True)
+        return response, budgeted_queries(captured.captured_queries)
+
+    def test_every_route_has_a_budget(self):
+        declared = {budget.route for budget in BUDGETS} | set(UNBUDGETED_ROUTES)
+        routes = set().union(*(named_routes(urlconf) for urlconf in URLCONFS))
+        self.assertEqual(routes - declared, set(), 'Routes without a declared query budget')
+
+    def test_routes_stay_within_budget(self):
+        for size in DATA_SIZES:
+            self.grow_to(size)
+            for budget in BUDGETS:
+                with self.subTest(route=str(budget), rows=size):
+                    response, queries = self.run_budget(budget)
+                    self.assertEqual(response.status_code, budget.status, getattr(response, 'data', None))
+                    if len(queries) > budget.queries:
+                        listing = '\n'.join(f'  {n}. {sql}' for n, sql in enumerate(queries, 1))
+                        self.fail(
+                            f'{budget} ran {len(queries)} queries with {size} rows per model, '
+                            f'budget is {budget.queries}:\n{listing}'
+                        )
+
+
+
+# ========== Home page catalog ==========
+@override_settings(HOME_CATALOG_PAGE_SIZE=2)
+class CatalogPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.medicines = [
+            Medicine.objects.create(
+                name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=i, price=1,
+            )
+            for i in range(5)
+        ]
+
+    def test_home_renders_the_first_page(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, '<strong>Medicine 1</strong>', html=True)
+        self.assertNotContains(response, '<strong>Medicine 2</strong>')
+        self.assertContains(response, f'data-after="{self.medicines[1].pk}"')
+        # The page query: one row more than the page size
+        sql, = [query['sql'] for query in captured.captured_queries if query['sql'].endswith('LIMIT 3')]
+        self.assertNotIn('"image"', sql)
+        self.assertNotIn('"low_stock_threshold"', sql)
+
+    def test_rows_continue_until_the_last_page(self):
+        names, after = [], '0'
+        while after:
+            response = self.client.get(reverse('catalog_rows'), {'after': after})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, '<table')
+            names += re.findall(r'<strong>(.*?)</strong>', response.content.decode())
+            after = response['X-Next-After']
+        self.assertEqual(names, [medicine.name for medicine in self.medicines])
+
+    def test_page_without_javascript(self):
+        response = self.client.get(reverse('home'), {'after': self.medicines[3].pk})
+        self.assertContains(response, '<strong>Medicine 4</strong>', html=True)
+        self.assertNotContains(response, '<strong>Medicine 3</strong>')
+        self.assertNotContains(response, 'catalog-more')
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(reverse('catalog_rows'), {'after': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('home'), {'after': 'x'}).status_code, 200)
+
+
+# ========== Customer OTP login ==========
+class CustomerLoginTests(TestCase):
+    """
+    customer_login must stay within six queries on every successful path:
+    five, plus the ChangeLog row written with a new or renamed customer.
+    """
+
+    def issue_otp(self, minutes=10):
+        OTP.objects.create(
+            phone_number=PHONE, otp_code='123456',
+            expires_at=timezone.now() + timedelta(minutes=minutes),
+        )
+
+    def login(self, name=''):
+        with CaptureQueriesContext(connection) as captured:
+            result = customer_login(PHONE, '123456', name)
+        queries = budgeted_queries(captured.captured_queries)
+        self.assertLessEqual(len(queries), 6, '\n'.join(queries))
+        return result, queries
+
+    def test_new_customer(self):
+        self.issue_otp()
+        result, queries = self.login('Asha')
+        self.assertEqual(len(queries), 6)
+        self.assertTrue(result['is_new_customer'])
+        customer = Customer.objects.get(phone_number=PHONE)
+        self.assertEqual(result['customer'], customer)
+        self.assertEqual(customer.name, 'Asha')
+        token = Token.objects.get(key=result['token'])
+        self.assertEqual(token.user.username, f'customer_{customer.pk}')
+        self.assertFalse(token.user.has_usable_password())
+        self.assertFalse(OTP.objects.exists())
+        self.assertFalse(UserProfile.objects.exists())
+
+    def test_returning_customer_reuses_token(self):
+        self.issue_otp()
+        first, _ = self.login('Asha')
+        self.issue_otp()
+        second, queries = self.login()
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(second['is_new_customer'])
+        self.assertEqual(second['token'], first['token'])
+        self.assertEqual(second['customer'].name, 'Asha')
+
+    def test_returning_customer_rename_and_new_token_after_logout(self):
+        self.issue_otp()
+        first, _ = self.login('Asha')
+        Token.objects.filter(key=first['token']).delete()
+        self.issue_otp()
+        second, queries = self.login('Asha Rao')
+        self.assertEqual(len(queries), 5)
+        self.assertNotEqual(second['token'], first['token'])
+        self.assertEqual(Customer.objects.get().name, 'Asha Rao')
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_otp_is_single_use(self):
+        self.issue_otp()
+        self.login()
+        with self.assertRaisesMessage(OTPVerificationError, 'Invalid OTP'):
+            customer_login(PHONE, '123456')
+
+    def test_wrong_code(self):
+        self.issue_otp()
+        with self.assertRaisesMessage(OTPVerificationError, 'Invalid OTP'):
+            customer_login(PHONE, '654321')
+        self.assertTrue(OTP.objects.exists())
+
+    def test_expired_code_is_removed(self):
+        self.issue_otp(minutes=-1)
+        with self.assertRaisesMessage(OTPVerificationError, 'OTP has expired'):
+            customer_login(PHONE, '123456')
+        self.assertFalse(OTP.objects.exists())
+        self.assertFalse(Customer.objects.exists())
+
+
+# ========== Async views ==========
+class AsyncViewTests(TestCase):
+    """The async variants must answer exactly like the sync views."""
+
+    def setUp(self):
+        patch_sms(self)
+        self.doctor = Doctor.objects.create(name='Rao', specialty='Ayurveda')
+
+    def post_both(self, sync_url, async_url, data, before=None):
+        bodies = []
+        for url in (sync_url, async_url):
+            cache.clear()
+            with transaction.atomic():
+                if before:
+                    before(self)
+                response = self.client.post(url, data, content_type='application/json')
+                bodies.append((response.status_code, response.json()))
+                transaction.set_rollback(True)
+        self.assertEqual(bodies[0], bodies[1])
+        return bodies[0]
+
+    def test_send_otp(self):
+        code, body = self.post_both('/api/send-otp/', '/api/async/send-otp/', {'phone_number': PHONE})
+        self.assertEqual(code, 200)
+        self.assertEqual(body['message_sid'], 'SM123')
+        self.post_both('/api/send-otp/', '/api/async/send-otp/', {'phone_number': '12ab'})
+
+    def test_verify_otp(self):
+        data = {'phone_number': PHONE, 'otp_code': '123456'}
+        code, _ = self.post_both('/api/verify-otp/', '/api/async/verify-otp/', data, before=pending_otp)
+        self.assertEqual(code, 200)
+        code, body = self.post_both('/api/verify-otp/', '/api/async/verify-otp/', data)
+        self.assertEqual(body, {'error': 'Invalid OTP'})
+
+    def test_create_appointment(self):
+        data = {
+            'phone_number': PHONE, 'customer_name': 'Asha',
+            'doctor': self.doctor.id, 'date': '2030-01-01T10:00:00Z',
+        }
+        with transaction.atomic():
+            verified_otp(self)
+            response = self.client.post('/api/async/create-appointment/', data, content_type='application/json')
+            transaction.set_rollback(True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['appointment']['customer_name'], 'Asha')
+        self.post_both('/api/create-appointment/', '/api/async/create-appointment/', data)
+
+    def test_customer_verify_otp(self):
+        data = {'phone_number': PHONE, 'otp_code': '123456', 'customer_name': 'Asha'}
+        with transaction.atomic():
+            pending_otp(self)
+            response = self.client.post('/api/async/customer/verify-otp/', data, content_type='application/json')
+            transaction.set_rollback(True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_new_customer'])
+        self.post_both('/api/customer/verify-otp/', '/api/async/customer/verify-otp/', data)
+
+
+# ========== OTP rate limits ==========
+@override_settings(OTP_RATE_LIMITS={
+    'send': '3/10m', 'send_ip': '5/1h', 'send_daily': '4/1d', 'verify': '2/10m', 'verify_ip': '30/1h',
+})
+class OTPThrottleTests(TestCase):
+    def setUp(self):
+        patch_sms(self)
+        cache.clear()
+
+    def send(self, url, phone=PHONE, ip='10.0.0.1'):
+        return self.client.post(url, {'phone_number': phone}, content_type='application/json', REMOTE_ADDR=ip)
+
+    def test_limit_per_phone_number_before_any_query(self):
+        for url in ('/api/send-otp/', '/api/async/send-otp/'):
+            cache.clear()
+            for _ in range(3):
+                self.assertEqual(self.send(url).status_code, 200)
+            with CaptureQueriesContext(connection) as captured:
+                response = self.send(url)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(len(captured), 0)
+            self.assertGreater(int(response['Retry-After']), 0)
+            self.assertIn('Request was throttled', response.json()['detail'])
+            # Another number from another client is unaffected
+            self.assertEqual(self.send(url, phone='9123456780', ip='10.0.0.2').status_code, 200)
+
+    def test_limit_per_ip(self):
+        for i in range(5):
+            self.assertEqual(self.send('/api/send-otp/', phone=f'91234567{i:02d}').status_code, 200)
+        self.assertEqual(self.send('/api/send-otp/', phone='9123456799').status_code, 429)
+        self.assertEqual(self.send('/api/send-otp/', phone='9123456799', ip='10.0.0.9').status_code, 200)
+
+    def test_daily_cap_survives_the_short_window(self):
+        day = 86400 * 1000
+        for i in range(4):
+            self.assertEqual(hit('send_daily', PHONE, '4/1d', now=day + i * 3600), 0)
+        self.assertGreater(hit('send_daily', PHONE, '4/1d', now=day + 5 * 3600), 0)
+
+    def test_verify_attempts(self):
+        url = '/api/verify-otp/'
+        data = {'phone_number': PHONE, 'otp_code': '000000'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data, content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, data, content_type='application/json').status_code, 429)
+
+    def test_body_that_is_not_an_object(self):
+        request = APIView().initialize_request(
+            APIRequestFactory().post('/api/send-otp/', [PHONE], format='json', REMOTE_ADDR='10.0.0.1'),
+        )
+        throttle = OTPSendThrottle()
+        self.assertTrue(throttle.allow_request(request, None))
+        # Counted by IP only
+        self.assertEqual(cache.get(f'otp-rl:send_ip:10.0.0.1:{int(time.time() // 3600)}'), 1)
+
+    def test_async_views_check_limits_off_the_event_loop(self):
+        loops = []
+
+        def check(*args):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return 0
+
+        with mock.patch.object(async_views, 'check_rate_limits', check):
+            self.assertEqual(self.send('/api/async/send-otp/').status_code, 200)
+        self.assertEqual(loops, [None])
+
+    def test_sliding_window_weighs_previous_window(self):
+        # 3 hits late in window 0, then at 25% into window 1 the previous
+        # window still counts for 75%: 3 * 0.75 + 1 > 3.
+        for second in (590, 595, 599):
+            self.assertEqual(hit('send', 'x', '3/10m', now=second), 0)
+        self.assertGreater(hit('send', 'x', '3/10m', now=750), 0)
+        # Once most of the previous window has slid out, requests fit again.
+        self.assertEqual(hit('send', 'y', '3/10m', now=599), 0)
+        self.assertEqual(hit('send', 'y', '3/10m', now=1150), 0)
+
+
+# ========== Shared SQLite cache ==========
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        options.setdefault('EVICTION_INTERVAL', 0)
+        return SQLiteCache(os.path.join(self.tmpdir, 'cache.sqlite3'), {'OPTIONS': options})
+
+    def test_values_round_trip(self):
+        for value in (1, -5, True, 1.5, 'text', b'bytes', None, {'a': [1, 2]}):
+            self.cache.set('key', value)
+            self.assertEqual(self.cache.get('key', 'missing'), value)
+            self.assertIs(type(self.cache.get('key')), type(value))
+        self.assertEqual(self.cache.get('nope', 'missing'), 'missing')
+
+    def test_workers_share_entries(self):
+        # A second instance on the same file stands in for another worker.
+        other = self.make_cache()
+        self.cache.set('shared', {'n': 1})
+        self.assertEqual(other.get('shared'), {'n': 1})
+        self.assertTrue(self.cache.add('counter', 0))
+        self.assertFalse(other.add('counter', 5))
+        self.assertEqual(other.incr('counter'), 1)
+        self.assertEqual(self.cache.incr('counter', 10), 11)
+        self.assertEqual(other.decr('counter'), 10)
+
+    def test_incr_needs_an_integer(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('text', 'x')
+        with self.assertRaises(ValueError):
+            self.cache.incr('text')
+
+    def test_expiry(self):
+        self.cache.set('gone', 1, timeout=0)
+        self.assertFalse(self.cache.has_key('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        with mock.patch('App.cache_backends.time.time', return_value=time.time() + 120):
+            self.cache.set('later', 1, timeout=60)
+        self.cache.set('soon', 1, timeout=60)
+        self.cache.set('forever', 1, timeout=None)
+        with mock.patch('App.cache_backends.time.time', return_value=time.time() + 90):
+            self.assertIsNone(self.cache.get('soon'))
+            self.assertFalse(self.cache.touch('soon'))
+            with self.assertRaises(ValueError):
+                self.cache.incr('soon')
+            self.assertEqual(self.cache.get_many(['soon', 'later', 'forever']), {'later': 1, 'forever': 1})
+
+    def test_evict_drops_expired_then_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=3)
+        cache.set('expired', 1, timeout=0)
+        for i, key in enumerate(['a', 'b', 'c', 'd']):
+            with mock.patch('App.cache_backends.time.time', return_value=1000 + i * 10):
+                cache.set(key, i, timeout=None)
+        with mock.patch('App.cache_backends.time.time', return_value=1100):
+            cache.get('a')
+        cache.evict()
+        self.assertEqual(cache.get_many(['expired', 'a', 'b', 'c', 'd']), {'a': 0, 'c': 2, 'd': 3})
+
+    def test_many_and_clear(self):
+        self.cache.set_many({'a': 1, 'b': 'two'})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 'two'})
+        self.cache.delete_many(['a'])
+        self.assertTrue(self.cache.delete('b'))
+        self.assertFalse(self.cache.delete('b'))
+        self.cache.set('c', 3)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('c'))
+
+
+# ========== Transaction policies ==========
+class TransactionPolicyTests(TestCase):
+    def setUp(self):
+        patch_sms(self)
+        self.depths = []
+        for name in ('send_otp_to_phone', 'send_appointment_confirmation'):
+            getattr(views.MessageHandler.return_value, name).side_effect = self.record_depth
+
+    def record_depth(self, *args, **kwargs):
+        self.depths.append(len(connection.atomic_blocks))
+        return SMS_OK
+
+    def test_sms_is_sent_after_the_commit(self):
+        # The test case itself holds one atomic block open around the request.
+        outside = len(connection.atomic_blocks)
+        self.doctor = Doctor.objects.create(name='Dr. A', specialty='Ayurveda')
+        self.client.post('/api/send-otp/', {'phone_number': PHONE}, content_type='application/json')
+        self.client.post('/api/create-appointment/', verified_otp(self), content_type='application/json')
+        self.assertEqual(self.depths, [outside, outside])
+
+    def test_a_verified_otp_books_once(self):
+        self.doctor = Doctor.objects.create(name='Dr. A', specialty='Ayurveda')
+        steps = []
+        book = async_views.book_appointment
+        async_confirm = async_views.AsyncMessageHandler.return_value.send_appointment_confirmation
+        async_confirm.side_effect = lambda *args, **kwargs: steps.append('sms') or SMS_OK
+        for url in ('/api/create-appointment/', '/api/async/create-appointment/'):
+            with self.subTest(url=url), mock.patch.object(
+                async_views, 'book_appointment', lambda *args: steps.append('booked') or book(*args),
+            ):
+                data = verified_otp(self)
+                missing = {**data, 'doctor': self.doctor.pk + 1}
+                self.assertEqual(self.client.post(url, missing, content_type='application/json').status_code, 404)
+                self.assertEqual(self.client.post(url, data, content_type='application/json').status_code, 201)
+                response = self.client.post(url, data, content_type='application/json')
+                self.assertEqual(response.json(), {'error': 'Phone number not verified. Please verify OTP first.'})
+        self.assertEqual(Appointment.objects.count(), 2)
+        # Sent once per booking, after the OTP was consumed and committed
+        self.assertEqual(self.depths, [len(connection.atomic_blocks)])
+        self.assertEqual(steps, ['booked', 'sms', 'booked'])
+
+    def test_external_io_refuses_an_open_transaction(self):
+        @atomic
+        def view():
+            with external_io():
+                pass
+
+        with self.assertRaises(TransactionPolicyError):
+            view()
+
+    def test_viewset_policies(self):
+        doctor = Doctor.objects.create(name='Dr. A', specialty='Ayurveda')
+        seen = []
+        original = DoctorSerializer.to_representation
+
+        def spy(serializer, instance):
+            seen.append(current_policy.get())
+            return original(serializer, instance)
+
+        user = User.objects.create_user(username='staff', password='x')
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch.object(DoctorSerializer, 'to_representation', spy):
+            client.get(f'/api/doctors/{doctor.pk}/')
+            client.patch(f'/api/doctors/{doctor.pk}/', {'name': 'Dr. B'}, format='json')
+        self.assertEqual(seen, [READ_ONLY, ATOMIC])
+
+    def test_transaction_time_is_recorded(self):
+        fake = SimpleNamespace(set_autocommit=lambda autocommit, **kwargs: None)
+        track_transactions(sender=None, connection=fake)
+        before = (metrics.timing('db.transaction_held') or {'count': 0})['count']
+        fake.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        fake.set_autocommit(True)
+        self.assertEqual(metrics.timing('db.transaction_held')['count'], before + 1)
+
+
+# ========== Read replicas ==========
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        patch_sms(self)
+        cache.clear()
+        self.doctor = Doctor.objects.create(name='Dr. A', specialty='Ayurveda')
+        # Count routing decisions; the test database stands in for the replica.
+        patcher = mock.patch('App.db_routers.choose_replica', return_value='default')
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reads_from_replica(self, client, url):
+        self.choose_replica.reset_mock()
+        self.assertEqual(client.get(url).status_code, 200)
+        return self.choose_replica.called
+
+    def test_catalog_reads_go_to_replicas(self):
+        client = APIClient()
+        for url in ('/', '/api/medicines/', '/api/doctors/', '/api/sales-feed/'):
+            with self.subTest(url=url):
+                self.assertTrue(self.reads_from_replica(client, url))
+        # Served by the object cache, which fills from the primary
+        self.assertFalse(self.reads_from_replica(client, f'/api/doctors/{self.doctor.pk}/'))
+        self.assertFalse(self.reads_from_replica(client, '/api/appointments/'))
+
+    def test_writer_is_pinned_to_the_primary(self):
+        user = User.objects.create_user(username='staff', password='x')
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = client.patch(f'/api/doctors/{self.doctor.pk}/', {'name': 'Dr. B'}, format='json')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(self.reads_from_replica(client, '/api/doctors/'))
+
+        # Token clients that drop cookies are pinned through the cache.
+        client.cookies.clear()
+        self.assertFalse(self.reads_from_replica(client, '/api/doctors/'))
+        # Other clients still use the replica.
+        self.assertTrue(self.reads_from_replica(APIClient(), '/api/doctors/'))
+
+        # The pin expires.
+        cache.clear()
+        with mock.patch('App.db_routers.time.time', return_value=time.time() + 3600):
+            self.assertTrue(self.reads_from_replica(APIClient(), '/api/doctors/'))
+
+    def test_anonymous_booking_pins_through_the_cookie(self):
+        self.client.post('/api/send-otp/', {'phone_number': PHONE}, content_type='application/json')
+        self.assertFalse(self.reads_from_replica(self.client, '/'))
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_marked_reads_only(self):
+        router = PrimaryReplicaRouter()
+        self.assertIsNone(router.db_for_read(Medicine))
+        token = reading_from_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Medicine), 'replica')
+            self.assertEqual(router.db_for_write(Medicine), 'default')
+        finally:
+            reading_from_replica.reset(token)
+
+    def test_no_replicas_configured(self):
+        token = reading_from_replica.set(True)
+        try:
+            self.assertIsNone(PrimaryReplicaRouter().db_for_read(Medicine))
+        finally:
+            reading_from_replica.reset(token)
+
+
+# ========== Metrics ==========
+class MetricsEndpointTests(TestCase):
+    def test_staff_only(self):
+        user = User.objects.create_user(username='clerk', password='x')
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get('/api/metrics/').status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        metrics.increment('test.counter')
+        data = client.get('/api/metrics/').json()
+        self.assertGreaterEqual(data['counters']['test.counter'], 1)
+        # One entry per pooled database; none on SQLite.
+        self.assertEqual(set(data['gauges']['db.pool']), set(pool_stats()))
+
+
+# ========== Sales analytics ==========
+class SalesAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='manager', password='x')
+        cls.medicines = [
+            Medicine.objects.create(
+                name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=10, price=1,
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Monday 2026-03-02 22:00 UTC onwards, every 50 minutes
+        self.start = timezone.make_aware(datetime(2026, 3, 2, 22, 0))
+
+    def sell(self, count, offset=0):
+        for i in range(offset, offset + count):
+            sale = SaleRecord.objects.create(medicine=self.medicines[i % 2], quantity_sold=i % 3 + 1)
+            SaleRecord.objects.filter(pk=sale.pk).update(timestamp=self.start + timedelta(minutes=50 * i))
+
+    def raw_totals(self, kind):
+        rows = SaleRecord.objects.order_by().annotate(bucket=Trunc('timestamp', kind)).values_list(
+            'bucket', 'medicine_id',
+        ).annotate(quantity=Sum('quantity_sold'), sales=Count('id'))
+        return {
+            (bucket if kind == 'hour' else bucket.date(), medicine): (quantity, sales)
+            for bucket, medicine, quantity, sales in rows
+        }
+
+    def series(self, bucket, **params):
+        response = self.client.get('/api/sales/analytics/', {
+            'bucket': bucket, 'from': '2026-03-01', 'to': '2026-03-20', **params,
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        return {
+            (row['bucket'], row['medicine']): (row['quantity'], row['sales'])
+            for row in response.data['results']
+        }
+
+    def test_rollups_plus_tail_match_raw_group_by(self):
+        self.sell(150)
+        self.assertEqual(roll_up_sales(batch_size=40, settle=None), 150)
+        # Newer sales only exist in the raw table until the next run.
+        self.sell(30, offset=150)
+        for bucket in ('hour', 'day', 'week'):
+            with self.subTest(bucket=bucket):
+                expected = self.raw_totals(bucket)
+                self.assertEqual(self.series(bucket), expected)
+        roll_up_sales(settle=None)
+        self.assertEqual(self.series('day'), self.raw_totals('day'))
+        self.assertEqual(HourlySales.objects.aggregate(n=Sum('sales'))['n'], 180)
+
+    def test_closed_buckets_never_read_raw_sales(self):
+        self.sell(20)
+        roll_up_sales(settle=None)
+        watermark = RollupWatermark.objects.get(name='sales').last_id
+        with CaptureQueriesContext(connection) as captured:
+            self.series('day', medicine=str(self.medicines[0].pk))
+        raw = [q['sql'] for q in captured.captured_queries if '"App_salerecord"' in q['sql'].split('FROM')[1]]
+        self.assertEqual(len(raw), 1)
+        self.assertIn(f'"App_salerecord"."id" > {watermark}', raw[0])
+
+    def test_unsettled_ids_wait_for_the_next_run(self):
+        self.sell(5)
+        now = timezone.now()
+        self.assertEqual(roll_up_sales(now=now), 0)
+        self.assertEqual(roll_up_sales(now=now + timedelta(seconds=1)), 0)
+        self.assertEqual(roll_up_sales(now=now + timedelta(minutes=1)), 5)
+
+    def test_continuous_sales_still_settle(self):
+        # Runs every 5s, more often than the 10s settle time, with new sales
+        # before each one: ids still settle from when they were first seen.
+        now = timezone.now()
+        rolled = []
+        for step in range(4):
+            self.sell(5, offset=5 * step)
+            rolled.append(roll_up_sales(now=now + timedelta(seconds=5 * step)))
+        self.assertEqual(rolled, [0, 0, 5, 0])
+        self.assertEqual(roll_up_sales(now=now + timedelta(seconds=20)), 10)
+        self.assertEqual(roll_up_sales(now=now + timedelta(seconds=30)), 5)
+        self.assertEqual(HourlySales.objects.aggregate(n=Sum('sales'))['n'], 20)
+
+    def test_invalid_queries(self):
+        url = '/api/sales/analytics/'
+        for params in ({'bucket': 'year'}, {'from': 'yesterday'}, {'medicine': 'x'},
+                       {'bucket': 'hour', 'from': '2020-01-01', 'to': '2026-01-01'},
+                       {'from': '2026-02-01', 'to': '2026-01-01'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+# ========== Reorder points ==========
+class ForecastingTests(TestCase):
+    def test_matches_a_per_medicine_loop(self):
+        rng = np.random.default_rng(36)
+        matrix = rng.poisson(rng.uniform(0, 8, size=(50, 1)), size=(50, 60)).astype(float)
+        stock = rng.integers(0, 80, size=50)
+        z = NormalDist().inv_cdf(0.9)
+        for method in ('sma', 'ewma'):
+            plan = reorder_points(matrix, stock, method=method, window=14, alpha=0.2,
+                                  lead_time_days=5, service_level=0.9, cover_days=7)
+            for row, history in enumerate(matrix):
+                if method == 'sma':
+                    weights = [0] * 46 + [1 / 14] * 14
+                else:
+                    weights = [0.2 * 0.8 ** (59 - day) for day in range(60)]
+                    weights = [w / sum(weights) for w in weights]
+                demand = sum(w * q for w, q in zip(weights, history))
+                sigma = math.sqrt(sum(w * (q - demand) ** 2 for w, q in zip(weights, history)))
+                reorder_point = demand * 5 + z * sigma * math.sqrt(5)
+                self.assertAlmostEqual(plan['demand'][row], demand)
+                self.assertAlmostEqual(plan['reorder_point'][row], reorder_point)
+                self.assertEqual(plan['needs_reorder'][row], demand > 0 and stock[row] <= reorder_point)
+
+    def test_reorder_endpoint(self):
+        user = User.objects.create_user(username='manager', password='x', is_staff=True)
+        busy, idle = (
+            Medicine.objects.create(name=name, image='medicines/x.png', description='d', stock_quantity=5, price=1)
+            for name in ('Busy', 'Idle')
+        )
+        today = timezone.localdate()
+        DailySales.objects.bulk_create(
+            DailySales(medicine=busy, day=today - timedelta(days=i), quantity=10, sales=5) for i in range(30)
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        data = client.get('/api/reorder-report/', {'method': 'sma', 'window': 7}).json()
+        self.assertEqual(data['count'], 1)
+        row = data['results'][0]
+        self.assertEqual((row['medicine'], row['daily_demand'], row['reorder_point']), (busy.pk, 10, 70))
+        self.assertEqual(row['order_quantity'], 70 + 140 - 5)
+
+        data = client.get('/api/reorder-report/', {'all': '1'}).json()
+        self.assertEqual([r['medicine'] for r in data['results']], [busy.pk, idle.pk])
+        self.assertIsNone(data['results'][1]['days_of_cover'])
+        for params in ({'service_level': '2'}, {'history_days': '10000000'}, {'window': '731'},
+                       {'limit': '0'}, {'limit': '100000'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get('/api/reorder-report/', params).status_code, 400)
+
+        client.force_authenticate(User.objects.create_user(username='customer', password='x'))
+        self.assertEqual(client.get('/api/reorder-report/').status_code, 403)
+
+    def test_demand_includes_sales_not_rolled_up(self):
+        medicine = Medicine.objects.create(name='M', image='medicines/x.png', description='d', price=1)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DailySales.objects.create(medicine=medicine, day=yesterday - timedelta(days=1), quantity=4, sales=1)
+        noon = timezone.make_aware(datetime.combine(yesterday, datetime.min.time())) + timedelta(hours=12)
+        sale = SaleRecord.objects.create(medicine=medicine, quantity_sold=3)
+        SaleRecord.objects.filter(pk=sale.pk).update(timestamp=noon)
+        SaleRecord.objects.create(medicine=medicine, quantity_sold=50)  # Today: not over yet
+
+        ids, stock, matrix = load_demand(3)
+        self.assertEqual(matrix.tolist(), [[0, 4, 3]])
+        roll_up_sales(settle=timedelta(0))
+        roll_up_sales(settle=timedelta(0))
+        self.assertEqual(load_demand(3)[2].tolist(), [[0, 4, 3]])
+
+    def test_medicines_created_after_the_catalog_read_are_skipped(self):
+        first = Medicine.objects.create(name='A', image='medicines/x.png', description='d', price=1)
+        last = Medicine.objects.create(pk=first.pk + 10, name='C', image='medicines/x.png', description='d', price=1)
+        yesterday = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time())) - timedelta(hours=12)
+
+        def sell(medicine):
+            sale = SaleRecord.objects.create(medicine=medicine, quantity_sold=2)
+            SaleRecord.objects.filter(pk=sale.pk).update(timestamp=yesterday)
+
+        def created_meanwhile():
+            # Runs after the catalog read: one new id between the known
+            # ones, one after them.
+            if not Medicine.objects.filter(name='B').exists():
+                for pk, name in ((first.pk + 5, 'B'), (last.pk + 5, 'D')):
+                    sell(Medicine.objects.create(pk=pk, name=name, image='medicines/x.png', description='d', price=1))
+            return real()
+
+        real = forecasting.rolled_up_through
+        sell(first)
+        with mock.patch.object(forecasting, 'rolled_up_through', side_effect=created_meanwhile):
+            ids, stock, matrix = load_demand(2)
+        self.assertEqual(ids.tolist(), [first.pk, last.pk])
+        self.assertEqual(matrix.tolist(), [[0, 2], [0, 0]])
+
+
+class SalesArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.medicines = [
+            Medicine.objects.create(
+                name=f'Medicine {i}', image='medicines/x.png', description='d', stock_quantity=10, price=1,
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(SALES_ARCHIVE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.now = timezone.make_aware(datetime(2026, 5, 10, 12, 0))
+
+    def sell(self, count, start, offset=0):
+        """``count`` sales from ``start``, one every 7 hours."""
+        for i in range(offset, offset + count):
+            sale = SaleRecord.objects.create(medicine=self.medicines[i % 2], quantity_sold=i % 3 + 1)
+            SaleRecord.objects.filter(pk=sale.pk).update(timestamp=start + timedelta(hours=7 * i))
+
+    def totals(self):
+        return {
+            'daily': sorted(DailySales.objects.values_list('medicine_id', 'day', 'quantity', 'sales')),
+            'top': [(m.pk, m.total_sold) for m in with_total_sold(Medicine.objects.order_by('pk'))],
+        }
+
+    def test_closed_months_move_to_files_and_totals_stay(self):
+        january = timezone.make_aware(datetime(2026, 1, 1))
+        self.sell(400, january)  # January to early April
+        roll_up_sales(settle=None)
+        before = self.totals()
+        all_sales = sorted(SaleRecord.objects.values_list('id', 'medicine_id', 'quantity_sold'))
+
+        result = archive_sales(keep_months=1, batch_size=50, now=self.now)
+        # January to March are closed; April is kept.
+        self.assertEqual([a.month.month for a in result['archived']], [1, 2, 3])
+        self.assertEqual(result['deleted'], sum(a.rows for a in result['archived']))
+        self.assertFalse(SaleRecord.objects.filter(timestamp__lt=timezone.make_aware(datetime(2026, 4, 1))).exists())
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(a.filename for a in result['archived']))
+        self.assertEqual(self.totals(), before)
+
+        sales = load_sales(january, self.now)
+        self.assertEqual(
+            sorted(zip(sales['id'].tolist(), sales['medicine_id'].tolist(), sales['quantity_sold'].tolist())),
+            all_sales,
+        )
+        self.assertTrue((np.diff(sales['timestamp'].astype(np.int64)) >= 0).all())
+        one = load_sales(january, self.now, medicine_ids=[self.medicines[1].pk])
+        self.assertEqual(set(one['medicine_id'].tolist()), {self.medicines[1].pk})
+
+        # Nothing left to do.
+        self.assertEqual(archive_sales(keep_months=1, now=self.now), {'archived': [], 'deleted': 0})
+
+    def test_clearing_generated_data_drops_what_was_built_from_it(self):
+        self.sell(100, timezone.make_aware(datetime(2026, 1, 1)))
+        roll_up_sales(settle=None)
+        archive_sales(keep_months=1, now=self.now)
+        cursor = ChangeLog.objects.latest('seq').seq
+        call_command(
+            'generate_data', '--clear', '--medicines', '0', '--doctors', '0', '--customers', '0',
+            '--appointments', '0', '--sales', '0', '--otps', '0', stdout=io.StringIO(),
+        )
+        for model in (SaleRecord, SaleArchive, HourlySales, DailySales, RollupWatermark, ChangeLog):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(with_total_sold(Medicine.objects.all()).count(), 0)
+        # A client synced before the clear has to reload.
+        self.assertTrue(changes_since(cursor)['reset'])
+
+    def test_only_rolled_up_sales_are_archived(self):
+        february = timezone.make_aware(datetime(2026, 2, 1))
+        self.sell(40, february)
+        roll_up_sales(settle=None)
+        self.sell(10, february, offset=40)  # Above the watermark
+        archive_sales(keep_months=1, now=self.now)
+        self.assertEqual(SaleRecord.objects.count(), 10)
+
+        roll_up_sales(settle=None)
+        result = archive_sales(keep_months=1, now=self.now)
+        self.assertEqual([a.rows for a in result['archived']], [10])
+        self.assertEqual(SaleArchive.objects.filter(month=datetime(2026, 2, 1).date()).count(), 2)
+        self.assertEqual(len(load_sales(february, self.now)['id']), 50)
+
+    def test_interrupted_purge_is_finished_and_never_double_counted(self):
+        march = timezone.make_aware(datetime(2026, 3, 1))
+        self.sell(30, march)
+        roll_up_sales(settle=None)
+        with mock.patch('App.archive._purge', side_effect=RuntimeError('killed')):
+            with self.assertRaises(RuntimeError):
+                archive_sales(keep_months=1, now=self.now)
+        self.assertEqual(SaleRecord.objects.count(), 30)
+        self.assertEqual(len(load_sales(march, self.now)['id']), 30)
+
+        self.assertEqual(archive_sales(keep_months=1, now=self.now)['deleted'], 30)
+        self.assertEqual(len(load_sales(march, self.now)['id']), 30)
+
+    def test_missing_file_stops_the_purge(self):
+        self.sell(10, timezone.make_aware(datetime(2026, 3, 1)))
+        roll_up_sales(settle=None)
+        with mock.patch('App.archive._purge', side_effect=RuntimeError('killed')):
+            with self.assertRaises(RuntimeError):
+                archive_sales(keep_months=1, now=self.now)
+        os.remove(os.path.join(self.directory, SaleArchive.objects.get().filename))
+        with self.assertRaises(ArchiveError):
+            archive_sales(keep_months=1, now=self.now)
+        self.assertEqual(SaleRecord.objects.count(), 10)
+
+
+
+class GenerateDataTests(TestCase):
+    ARGS = (
+        '--seed', '7', '--until', '2026-03-01', '--days', '30', '--medicines', '5', '--doctors', '2',
+        '--customers', '4', '--appointments', '6', '--otps', '3', '--sales', '40',
+    )
+
+    def generate(self, *args):
+        call_command('generate_data', *self.ARGS, *args, stdout=io.StringIO())
+
+    def dataset(self):
+        """Every generated row, without the auto-increment ids that change between runs."""
+        return {
+            'medicines': sorted(Medicine.objects.values_list('name', 'description', 'stock_quantity', 'price')),
+            'doctors': sorted(Doctor.objects.values_list('name', 'specialty', 'is_available')),
+            'customers': sorted(Customer.objects.values_list('phone_number', 'name', 'created_at')),
+            'profiles': sorted(UserProfile.objects.values_list('phone_number', 'uid', 'user__date_joined')),
+            'appointments': sorted(Appointment.objects.values_list(
+                'id', 'doctor__name', 'customer_name', 'phone_number', 'date', 'created_at',
+            )),
+            'otps': sorted(OTP.objects.values_list('phone_number', 'otp_code', 'is_verified', 'expires_at')),
+            'sales': sorted(SaleRecord.objects.values_list('medicine__name', 'quantity_sold', 'timestamp')),
+        }
+
+    def test_same_seed_generates_the_same_rows(self):
+        self.generate()
+        first = self.dataset()
+        self.assertEqual(len(first['sales']), 40)
+        self.assertTrue(all(
+            timezone.make_aware(datetime(2026, 1, 30)) <= timestamp < timezone.make_aware(datetime(2026, 3, 1))
+            for _, _, timestamp in first['sales']
+        ))
+        self.generate('--clear')
+        self.assertEqual(self.dataset(), first)
+
+    def test_rerun_without_clear_is_refused_before_writing(self):
+        self.generate()
+        first = self.dataset()
+        with self.assertRaisesMessage(CommandError, '--clear'):
+            self.generate()
+        self.assertEqual(self.dataset(), first)
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        cls.doctors = [Doctor.objects.create(name=f'Doc {i}', specialty='GP') for i in range(2)]
+        cls.medicine = Medicine.objects.create(
+            name='Aspirin, 100mg', image='medicines/x.png', description='d', stock_quantity=10, price='2.50',
+        )
+        start = timezone.make_aware(datetime(2026, 3, 1, 9, 0))
+        for i in range(20):
+            Appointment.objects.create(
+                doctor=cls.doctors[i % 2], customer_name=f'Customer {i}', phone_number=PHONE,
+                date=start + timedelta(days=i),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, path, **params):
+        response = self.client.get(f'/api/export/{path}', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_csv_filters_by_doctor_and_date_range(self):
+        response = self.export('appointments.csv', doctor=self.doctors[0].pk, **{'from': '2026-03-05', 'to': '2026-03-10'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="appointments.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        # Days 5 to 10 inclusive, even days only.
+        self.assertEqual([row['customer_name'] for row in rows], [f'Customer {i}' for i in (4, 6, 8)])
+        self.assertEqual({row['doctor'] for row in rows}, {'Doc 0'})
+
+        catalog = b''.join(self.export('catalog.csv').streaming_content).decode()
+        self.assertEqual(catalog.splitlines()[1], f'{self.medicine.pk},"Aspirin, 100mg",d,10,2.50')
+
+    def test_header_is_sent_before_any_query(self):
+        response = self.export('appointments.csv')
+        chunks = iter(response.streaming_content)
+        with CaptureQueriesContext(connection) as captured:
+            header = next(chunks)
+        self.assertTrue(header.startswith(b'id,doctor_id,doctor,'))
+        self.assertEqual(len(captured), 0)
+        with mock.patch('App.exports.FLUSH_BYTES', 200):
+            self.assertGreater(len(list(self.export('appointments.csv').streaming_content)), 3)
+
+    def test_gzipped_sales_include_archived_months(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(SALES_ARCHIVE_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for month in (1, 2, 5):
+            sale = SaleRecord.objects.create(medicine=self.medicine, quantity_sold=month)
+            SaleRecord.objects.filter(pk=sale.pk).update(timestamp=timezone.make_aware(datetime(2026, month, 3)))
+        roll_up_sales(settle=None)
+        archive_sales(keep_months=1, now=timezone.make_aware(datetime(2026, 5, 10)))
+        self.assertEqual(SaleRecord.objects.count(), 1)
+
+        response = self.export('sales.jsonl', gzip='1', medicine=self.medicine.pk)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['quantity_sold'] for row in rows], [1, 2, 5])
+        self.assertEqual(rows[0]['medicine'], 'Aspirin, 100mg')
+        self.assertEqual(rows[0]['timestamp'], '2026-01-03T00:00:00+00:00')
+
+        rows = self.export('sales.jsonl', **{'from': '2026-02-01'}).streaming_content
+        self.assertEqual([json.loads(line)['quantity_sold'] for line in b''.join(rows).splitlines()], [2, 5])
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get('/api/export/sales.xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/users.csv').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/catalog.csv', {'from': '2026-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/export/sales.csv', {'medicine': 'x'}).status_code, 400)
+        self.client.force_authenticate(User.objects.create_user(username='staffless', password='x'))
+        self.assertEqual(self.client.get('/api/export/sales.csv').status_code, 403)
+
+
+class ChangeLogTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        # PostgreSQL sequences survive test rollbacks; anchor the cursor on a
+        # real row so the changes below follow it without a gap.
+        ChangeLog.objects.create(model='App.setup', object_id='0', action=ChangeLog.CREATE)
+        self.start = self.client.get('/api/changes/').data['seq']
+
+    def log(self):
+        return list(ChangeLog.objects.filter(seq__gt=self.start).values_list('model', 'action'))
+
+    def new_medicine(self, name='Aspirin'):
+        return Medicine.objects.create(name=name, image='medicines/x.png', description='d', stock_quantity=1, price=1)
+
+    def test_every_write_is_logged_in_its_transaction(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.new_medicine()
+            raise RuntimeError
+        self.assertEqual(self.log(), [])
+
+        medicine = self.new_medicine()
+        medicine.stock_quantity = 5
+        medicine.save()
+        Medicine.objects.filter(pk=medicine.pk).update(stock_quantity=6)
+        doctor, = Doctor.objects.bulk_create([Doctor(name='Lee', specialty='GP')])
+        Appointment.objects.create(doctor=doctor, customer_name='Asha', phone_number=PHONE, date=timezone.now())
+        doctor.delete()  # Cascades to the appointment
+        self.assertEqual(self.log(), [
+            ('App.medicine', 'create'), ('App.medicine', 'update'), ('App.medicine', 'update'),
+            ('App.doctor', 'create'), ('App.appointment', 'create'),
+            ('App.appointment', 'delete'), ('App.doctor', 'delete'),
+        ])
+
+    def test_deltas_are_compacted_to_current_state(self):
+        medicine = self.new_medicine()
+        for price in ('2.00', '3.00'):
+            self.client.patch(f'/api/medicines/{medicine.pk}/', {'price': price}, format='json')
+        doctor = Doctor.objects.create(name='Lee', specialty='GP')
+        doctor_id = doctor.pk
+        doctor.delete()
+        Customer.objects.create(phone_number=PHONE, name='Asha')
+
+        data = self.client.get('/api/changes/', {'after': self.start}).data
+        self.assertFalse(data['reset'])
+        self.assertEqual(data['seq'], ChangeLog.objects.latest('seq').seq)
+        self.assertEqual([row['price'] for row in data['changes']['medicines']['upserted']], ['3.00'])
+        self.assertEqual(data['changes']['doctors'], {'upserted': [], 'deleted': [doctor_id]})
+        self.assertEqual(data['changes']['customers']['upserted'][0]['name'], 'Asha')
+        self.assertEqual(self.client.get('/api/changes/', {'after': data['seq']}).data['changes'], {})
+
+        self.client.force_authenticate(User.objects.create_user(username='clerk', password='x'))
+        data = self.client.get('/api/changes/', {'after': self.start}).data
+        self.assertNotIn('customers', data['changes'])
+        self.assertEqual(self.client.get('/api/changes/', {'after': 'x'}).status_code, 400)
+
+    def test_cursor_waits_at_an_unsettled_gap(self):
+        first = self.new_medicine('First')
+        gap = self.new_medicine('Gap')
+        last = self.new_medicine('Last')
+        # A transaction holding seq for 'Gap' has not committed yet.
+        ChangeLog.objects.filter(object_id=str(gap.pk)).delete()
+        before_gap = ChangeLog.objects.get(object_id=str(first.pk)).seq
+
+        data = changes_since(self.start)
+        self.assertEqual(data['seq'], before_gap)
+        self.assertEqual({row['id'] for row in data['changes']['medicines']['upserted']}, {first.pk, last.pk})
+        later = timezone.now() + timedelta(seconds=60)
+        self.assertEqual(changes_since(self.start, now=later)['seq'], ChangeLog.objects.latest('seq').seq)
+
+    def test_compaction_collapses_and_expires(self):
+        medicine = self.new_medicine()
+        for quantity in range(3):
+            Medicine.objects.filter(pk=medicine.pk).update(stock_quantity=quantity)
+        doctor = Doctor.objects.create(name='Lee', specialty='GP')
+
+        result = compact_changes(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(result, {'collapsed': 3, 'dropped': 0})
+        self.assertEqual(self.log(), [('App.medicine', 'update'), ('App.doctor', 'create')])
+        data = changes_since(self.start)
+        self.assertEqual(set(data['changes']), {'medicines', 'doctors'})
+
+        result = compact_changes(now=timezone.now() + timedelta(days=30))
+        self.assertEqual(result['dropped'], 3)  # Including the anchor
+        data = changes_since(self.start)
+        self.assertTrue(data['reset'])
+        self.assertFalse(changes_since(data['seq'])['reset'])
+        doctor.save()
+        self.assertEqual(changes_since(data['seq'])['changes']['doctors']['upserted'][0]['id'], doctor.pk)
+
+
+# ========== Dashboard summary ==========
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='clerk', password='x'))
+        self.doctor = Doctor.objects.create(name='Lee', specialty='GP')
+        self.low = Medicine.objects.create(name='Low', image='m.png', description='d', stock_quantity=2, price=1)
+        self.plenty = Medicine.objects.create(name='Plenty', image='m.png', description='d', stock_quantity=500, price=1)
+        now = timezone.now()
+        Appointment.objects.create(doctor=self.doctor, customer_name='Asha', phone_number=PHONE, date=now)
+        Appointment.objects.create(
+            doctor=self.doctor, customer_name='Ravi', phone_number=PHONE, date=now - timedelta(days=3),
+        )
+        SaleRecord.objects.create(medicine=self.plenty, quantity_sold=4)
+
+    def test_summary_sections(self):
+        response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['counts']['medicines'], {'total': 2, 'low_stock': 1, 'out_of_stock': 0})
+        self.assertEqual(data['counts']['appointments']['total'], 2)
+        self.assertEqual(data['counts']['appointments']['upcoming'], 1)
+        self.assertEqual([item['name'] for item in data['low_stock']['items']], ['Low'])
+        self.assertEqual(
+            [(row['doctor'], row['appointments']) for row in data['appointments_today']], [('Lee', 1)],
+        )
+        self.assertEqual(data['recent_sales']['today'], {'sales': 1, 'quantity': 4})
+        self.assertEqual(data['recent_sales']['latest'][0]['medicine'], 'Plenty')
+
+    def test_sections_are_cached_until_their_models_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dashboard_summary()
+        with self.assertNumQueries(0):
+            dashboard_summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plenty.stock_quantity = 0
+            self.plenty.save()
+        # Only the sections reading medicines are computed again.
+        with self.assertNumQueries(4):
+            data = dashboard_summary()
+        self.assertEqual(data['counts']['medicines']['out_of_stock'], 1)
+        self.assertEqual([item['name'] for item in data['low_stock']['items']], ['Plenty', 'Low'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SaleRecord.objects.create(medicine=self.low, quantity_sold=1)
+        with self.assertNumQueries(2):
+            data = dashboard_summary()
+        self.assertEqual(data['recent_sales']['today'], {'sales': 2, 'quantity': 5})
+
+    def test_uncommitted_writes_do_not_invalidate(self):
+        dashboard_summary()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Doctor.objects.create(name='Kim', specialty='ENT')
+        with self.assertNumQueries(0):
+            dashboard_summary()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(dashboard_summary()['counts']['doctors']['total'], 2)
+
+
+# ========== Appointment reminders ==========
+class ReminderSchedulerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.doctor = Doctor.objects.create(name='Lee', specialty='GP')
+        self.sent = []
+        patcher = mock.patch('App.reminders.send_notifications', self.fake_send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def fake_send(self, messages, concurrency):
+        self.sent.extend(messages)
+        return [SMS_OK] * len(messages)
+
+    def book(self, hours, booked_hours_ago=48, **fields):
+        return Appointment.objects.create(**{
+            'doctor': self.doctor, 'customer_name': 'Asha', 'phone_number': PHONE, 'is_verified': True,
+            'date': self.now + timedelta(hours=hours),
+            'created_at': self.now - timedelta(hours=booked_hours_ago), **fields,
+        })
+
+    def scheduler(self):
+        scheduler = ReminderScheduler(batch_size=2)
+        self.addCleanup(scheduler.close)
+        return scheduler
+
+    def at(self, hours):
+        return self.now + timedelta(hours=hours)
+
+    def test_each_reminder_is_sent_once_across_restarts(self):
+        for _ in range(3):
+            self.book(23.5)
+        self.book(23.5, is_verified=False)
+        self.book(23.5, phone_number='')
+        self.book(40)
+
+        totals = self.scheduler().tick(self.now)
+        self.assertEqual(totals, {'sent': 3, 'failed': 0, 'skipped': 0})
+        self.assertIn('in 24 hours', self.sent[0][1])
+        self.assertEqual(self.scheduler().tick(self.now)['sent'], 0)
+
+        scheduler = self.scheduler()
+        self.assertEqual(scheduler.tick(self.at(16.1))['sent'], 1)  # The one 40 hours out
+        self.assertEqual(scheduler.tick(self.at(22.6))['sent'], 3)
+        self.assertIn('in 1 hour', self.sent[-1][1])
+        self.assertEqual(AppointmentReminder.objects.filter(status=AppointmentReminder.SENT).count(), 7)
+
+    def test_changes_are_picked_up_from_the_change_log(self):
+        scheduler = self.scheduler()
+        scheduler.tick(self.now)
+        late = self.book(3, booked_hours_ago=0)  # Too late for the 24 hour reminder
+        moved = self.book(20, booked_hours_ago=0)
+        gone = self.book(20, booked_hours_ago=0)
+        self.assertEqual(scheduler.tick(self.now)['sent'], 0)
+
+        moved.date = self.at(30)
+        moved.save()
+        gone.delete()
+        self.assertEqual(scheduler.tick(self.at(2.1))['sent'], 1)
+        self.assertEqual(AppointmentReminder.objects.get().appointment, late)
+        self.assertEqual(scheduler.tick(self.at(6.1))['sent'], 1)
+        self.assertEqual(AppointmentReminder.objects.get(appointment=moved).kind, '24h')
+
+    def test_only_the_latest_due_reminder_goes_out_after_downtime(self):
+        appointment = self.book(0.5)
+        self.assertEqual(self.scheduler().tick(self.now)['sent'], 1)
+        self.assertEqual(AppointmentReminder.objects.get(appointment=appointment).kind, '1h')
+
+
+# ========== Low-stock alerts ==========
+@override_settings(LOW_STOCK_ALERT_PHONE=PHONE, LOW_STOCK_THRESHOLD=10)
+class LowStockAlertTests(TestCase):
+    window = 600
+
+    def setUp(self):
+        self.clock = 0.0
+        self.timers = []
+        self.digests = []
+        self.alerts = alerts.Coalescer(
+            self.window, self.digests.append, clock=lambda: self.clock,
+            schedule=lambda delay, func: self.timers.append((self.clock + delay, func)),
+        )
+        patcher = mock.patch.object(alerts, 'low_stock_alerts', self.alerts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.medicines = [
+            Medicine.objects.create(name=f'Medicine {i}', image='m.png', description='d', stock_quantity=50, price=1)
+            for i in range(20)
+        ]
+        self.medicines[0].low_stock_threshold = 30
+        self.medicines[0].save()
+        # Instances as the API loads them
+        self.medicines = list(Medicine.objects.order_by('id'))
+
+    def advance(self, seconds):
+        self.clock += seconds
+        due = [timer for timer in self.timers if timer[0] <= self.clock]
+        self.timers = [timer for timer in self.timers if timer[0] > self.clock]
+        for _, func in due:
+            func()
+
+    def sell(self, medicine, quantity=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            medicine.stock_quantity -= quantity
+            medicine.save()
+
+    def test_sustained_sales_send_one_digest_per_window(self):
+        # 1000 sales, 50 a minute, until every medicine is sold out
+        for i in range(1000):
+            self.sell(self.medicines[i % 20])
+            if i % 50 == 49:
+                self.advance(60)
+        self.advance(self.window)
+
+        self.assertEqual(len(self.digests), 2)
+        # The first crossing goes out at once...
+        self.assertEqual(self.digests[0], [('Medicine 0', 30, 30)])
+        # ...the rest wait for the window and share one digest.
+        self.assertEqual(sorted(self.digests[1]), sorted((f'Medicine {i}', 10, 10) for i in range(1, 20)))
+
+    def test_detection_needs_no_query(self):
+        medicine = self.medicines[1]
+        with self.assertNumQueries(2):  # The UPDATE and its ChangeLog row
+            self.sell(medicine, 40)
+        self.advance(0)
+        self.assertEqual(self.digests, [[('Medicine 1', 10, 10)]])
+        self.sell(medicine, 5)  # Already below: no new alert
+        self.advance(self.window)
+        self.assertEqual(len(self.digests), 1)
+
+    def test_restocking_withdraws_a_pending_alert(self):
+        self.sell(self.medicines[1], 45)
+        self.advance(0)
+        self.sell(self.medicines[2], 45)
+        self.sell(self.medicines[3], 45)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medicines[2].stock_quantity = 100
+            self.medicines[2].save()
+        self.advance(self.window)
+        self.assertEqual([len(digest) for digest in self.digests], [1, 1])
+        self.assertEqual(self.digests[1][0][0], 'Medicine 3')
+
+        with mock.patch('App.messages.MessageHandler') as handler:
+            handler.return_value.send_notification.return_value = SMS_OK
+            alerts.send_low_stock_digest(self.digests[1])
+        handler.assert_called_once_with(PHONE)
+        self.assertIn('Medicine 3: 5 left (threshold 10)', handler.return_value.send_notification.call_args[0][0])
+
+
+# ========== Idempotency keys ==========
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        patch_sms(self)
+        cache.clear()
+        self.doctor = Doctor.objects.create(name='Lee', specialty='GP')
+
+    def post(self, url, data, key):
+        return self.client.post(url, data, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_booking_is_replayed_byte_for_byte(self):
+        for url in ('/api/create-appointment/', '/api/async/create-appointment/'):
+            OTP.objects.create(
+                phone_number=PHONE, otp_code='123456', is_verified=True,
+                expires_at=timezone.now() + timedelta(minutes=10),
+            )
+            data = {'phone_number': PHONE, 'customer_name': 'Asha', 'doctor': self.doctor.pk,
+                    'date': '2030-01-01T10:00:00Z'}
+            first = self.post(url, data, f'booking {url}')
+            self.assertEqual(first.status_code, 201)
+            with CaptureQueriesContext(connection) as captured:
+                retry = self.post(url, data, f'booking {url}')
+            self.assertEqual(len(captured), 0)
+            self.assertEqual((retry.status_code, retry.content), (first.status_code, first.content))
+            self.assertEqual(retry['Content-Type'], first['Content-Type'])
+            self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertEqual(views.MessageHandler.return_value.send_appointment_confirmation.call_count, 1)
+
+    def test_otp_sends_and_registration(self):
+        for _ in range(2):
+            self.assertEqual(self.post('/api/send-otp/', {'phone_number': PHONE}, 'otp').status_code, 200)
+        self.assertEqual(views.MessageHandler.return_value.send_otp_to_phone.call_count, 1)
+        # Without a key every request runs
+        self.client.post('/api/send-otp/', {'phone_number': PHONE}, content_type='application/json')
+        self.assertEqual(views.MessageHandler.return_value.send_otp_to_phone.call_count, 2)
+
+        data = {'username': 'staff', 'password': 'secret'}
+        first = self.post('/api/register/', data, 'register')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.post('/api/register/', data, 'register').content, first.content)
+        self.assertEqual(User.objects.filter(username='staff').count(), 1)
+
+    def test_key_reused_for_another_body_is_rejected(self):
+        self.post('/api/send-otp/', {'phone_number': PHONE}, 'otp')
+        response = self.post('/api/send-otp/', {'phone_number': '9123456780'}, 'otp')
+        self.assertEqual(response.status_code, 422)
+
+    @override_settings(OTP_RATE_LIMITS={'send': '1/10m'})
+    def test_throttled_responses_are_not_stored(self):
+        self.post('/api/send-otp/', {'phone_number': PHONE}, 'first')
+        self.assertEqual(self.post('/api/send-otp/', {'phone_number': PHONE}, 'second').status_code, 429)
+        with override_settings(OTP_RATE_LIMITS={}):
+            self.assertEqual(self.post('/api/send-otp/', {'phone_number': PHONE}, 'second').status_code, 200)
+
+    def test_failed_sends_are_not_stored(self):
+        views.MessageHandler.return_value.send_otp_to_phone.return_value = {
+            'success': False, 'message_sid': None, 'error': 'Twilio timed out',
+        }
+        self.assertEqual(self.post('/api/send-otp/', {'phone_number': PHONE}, 'flaky').status_code, 400)
+        views.MessageHandler.return_value.send_otp_to_phone.return_value = SMS_OK
+        self.assertEqual(self.post('/api/send-otp/', {'phone_number': PHONE}, 'flaky').status_code, 200)
+        self.assertEqual(views.MessageHandler.return_value.send_otp_to_phone.call_count, 2)
+
+    def test_sync_duplicate_is_turned_away_at_once(self):
+        url = '/api/send-otp/'
+        data = {'phone_number': PHONE}
+        fingerprint = _fingerprint(RequestFactory().post(url, data, content_type='application/json'))
+        _, lock_key = _cache_keys(RequestFactory().post(url), 'busy')
+        cache.add(lock_key, fingerprint)
+        started = time.monotonic()
+        response = self.post(url, data, 'busy')
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(views.MessageHandler.return_value.send_otp_to_phone.call_count, 0)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=5)
+    def test_concurrent_async_duplicate_waits_for_the_first_response(self):
+        url = '/api/async/send-otp/'
+        data = {'phone_number': PHONE}
+        first = self.post(url, data, 'done')
+        response_key, _ = _cache_keys(RequestFactory().post(url), 'done')
+        entry = cache.get(response_key)
+
+        # Another request holds the lock for 'busy' and finishes shortly.
+        response_key, lock_key = _cache_keys(RequestFactory().post(url), 'busy')
+        cache.add(lock_key, entry['fingerprint'])
+
+        def finish():
+            cache.set(response_key, entry)
+            cache.delete(lock_key)
+
+        timer = threading.Timer(0.2, finish)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        retry = self.post(url, data, 'busy')
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(async_views.AsyncMessageHandler.return_value.send_otp_to_phone.call_count, 1)
+
+        _, lock_key = _cache_keys(RequestFactory().post(url), 'stuck')
+        cache.add(lock_key, entry['fingerprint'])
+        with override_settings(IDEMPOTENCY_WAIT_SECONDS=0.1):
+            self.assertEqual(self.post(url, data, 'stuck').status_code, 409)
+
+
+# ========== SMS delivery status ==========
+@override_settings(TWILIO_AUTH_TOKEN='token')
+class MessageStatusTests(TestCase):
+    url = 'http://testserver/api/messages/status/'
+
+    def setUp(self):
+        metrics.reset()
+        # No flush thread: the tests decide when the buffer is written.
+        self.buffer = StatusBuffer(None, 2000, flush_statuses)
+        patcher = mock.patch.object(message_status, 'status_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def callback(self, sid, status, error_code='', signature=None):
+        params = {'MessageSid': sid, 'MessageStatus': status}
+        if error_code:
+            params['ErrorCode'] = error_code
+        return self.client.post(
+            self.url, params, HTTP_X_TWILIO_SIGNATURE=signature or sign_callback(self.url, params),
+        )
+
+    def flush(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.buffer.flush_now()
+        return budgeted_queries(captured)
+
+    def test_sends_and_callbacks_are_written_in_bulk(self):
+        sids = [f'SM{i:032x}' for i in range(200)]
+        with mock.patch('twilio.rest.Client') as client:
+            client.return_value.messages.create.side_effect = [SimpleNamespace(sid=sid) for sid in sids]
+            for _ in sids:
+                MessageHandler(PHONE).send_notification('Hello')
+        self.assertEqual(len(self.flush()), 2)  # INSERT_BATCH rows per statement
+        self.assertEqual(MessageLog.objects.filter(phone_number=PHONE, kind='notification', status='queued').count(), 200)
+
+        with CaptureQueriesContext(connection) as captured:
+            for sid in sids:
+                self.assertEqual(self.callback(sid, 'sent').status_code, 204)
+        self.assertEqual(len(captured), 0)
+        for i, sid in enumerate(sids):
+            if i % 10:
+                self.callback(sid, 'delivered')
+            else:
+                self.callback(sid, 'undelivered', '30003')
+
+        # Coalesced to the final status: one SELECT and one UPDATE per status
+        self.assertEqual(len(self.flush()), 3)
+        self.assertEqual(MessageLog.objects.filter(status='delivered', status_at__isnull=False).count(), 180)
+        self.assertEqual(MessageLog.objects.filter(status='undelivered', error_code='30003').count(), 20)
+        self.assertEqual(metrics.timing('sms.delivery.delivered')['count'], 180)
+        self.assertIsNone(metrics.timing('sms.delivery.sent'))
+
+    @override_settings(TWILIO_STATUS_CALLBACK_URL=url)
+    def test_sends_ask_for_status_callbacks(self):
+        with mock.patch('twilio.rest.Client') as client:
+            client.return_value.messages.create.return_value = SimpleNamespace(sid=f'SM{"e" * 32}')
+            MessageHandler(PHONE, otp='123456').send_otp_to_phone()
+            MessageHandler(PHONE).send_appointment_confirmation('Lee', '2030-01-01 10:00', 'ref')
+        for call in client.return_value.messages.create.call_args_list:
+            self.assertEqual(call.kwargs['status_callback'], self.url)
+
+        handler = AsyncMessageHandler.__new__(AsyncMessageHandler)
+        handler.phone_number, handler.from_number = PHONE, '+15005550006'
+        handler.client = mock.Mock()
+        handler.client.messages.create_async = mock.AsyncMock(return_value=SimpleNamespace(sid=f'SM{"f" * 32}'))
+        asyncio.run(handler.send_notification('Hello'))
+        self.assertEqual(handler.client.messages.create_async.call_args.kwargs['status_callback'], self.url)
+
+        with override_settings(TWILIO_STATUS_CALLBACK_URL=''):
+            self.assertNotIn('status_callback', handler.message_options('Hello'))
+
+    def test_large_flushes_stay_under_the_variable_limit(self):
+        sids = [f'SM{i:032x}' for i in range(1000)]
+        for sid in sids:
+            self.buffer.add_status(sid, 'delivered', '', timezone.now())
+        queries = self.flush()
+        # SELECT and UPDATE per UPDATE_CHUNK SIDs, INSERT per INSERT_BATCH rows
+        self.assertEqual(len(queries), 4 + 4 + 10)
+        self.assertEqual(MessageLog.objects.filter(status='delivered').count(), 1000)
+
+    def test_late_callbacks_never_move_a_status_back(self):
+        sid = f'SM{"a" * 32}'
+        record_sent(sid, PHONE, 'otp')
+        self.callback(sid, 'delivered')
+        self.buffer.flush_now()
+        self.callback(sid, 'sent')
+        self.callback(sid, 'failed', '30008')  # Same rank as delivered: first one wins
+        self.buffer.flush_now()
+        log = MessageLog.objects.get()
+        self.assertEqual((log.status, log.error_code, log.kind), ('delivered', '', 'otp'))
+        self.assertEqual(metrics.timing('sms.delivery.delivered')['count'], 1)
+
+        # Sent by a worker that has not flushed yet
+        other = f'SM{"b" * 32}'
+        self.callback(other, 'sent')
+        self.buffer.flush_now()
+        self.assertIsNone(MessageLog.objects.get(sid=other).sent_at)
+        record_sent(other, PHONE, 'confirmation')
+        self.buffer.flush_now()
+        log = MessageLog.objects.get(sid=other)
+        self.assertEqual((log.status, log.kind), ('sent', 'confirmation'))
+        self.assertIsNotNone(log.sent_at)
+
+    def test_invalid_callbacks_are_rejected(self):
+        sid = f'SM{"c" * 32}'
+        self.assertEqual(self.callback(sid, 'delivered', signature='forged').status_code, 403)
+        self.assertEqual(self.callback('SM123', 'delivered').status_code, 400)
+        self.assertEqual(self.callback(sid, 'lost').status_code, 400)
+        with override_settings(TWILIO_AUTH_TOKEN=''):
+            self.assertEqual(self.callback(sid, 'delivered').status_code, 403)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_signature_covers_the_configured_callback_url(self):
+        # Behind a proxy: Twilio signed the public https URL, not this one.
+        public = 'https://pharmacy.example.com/api/messages/status/'
+        sid = f'SM{"e" * 32}'
+        params = {'MessageSid': sid, 'MessageStatus': 'delivered'}
+        with override_settings(TWILIO_STATUS_CALLBACK_URL=public):
+            self.assertEqual(self.callback(sid, 'delivered', signature=sign_callback(public, params)).status_code, 204)
+            self.assertEqual(self.callback(sid, 'delivered').status_code, 403)
+
+    def test_failed_flush_keeps_the_updates(self):
+        sid = f'SM{"d" * 32}'
+        self.buffer.flush = mock.Mock(side_effect=[RuntimeError('database down'), None])
+        self.callback(sid, 'sent')
+        with self.assertLogs('App.message_status', 'ERROR'):
+            self.buffer.flush_now()
+        self.callback(sid, 'delivered')
+        self.buffer.flush_now()
+        self.assertEqual(self.buffer.flush.call_args[0][1][sid][0], 'delivered')
+        self.assertEqual(metrics.counter('sms.status_flush_failed'), 1)
+
+
+# ========== Queued logging ==========
+class BoundedQueueHandlerTests(SimpleTestCase):
+    class Blocking(logging.Handler):
+        """Records what it handles, holding the listener until released."""
+
+        def __init__(self):
+            super().__init__()
+            self.entered = threading.Event()
+            self.unblock = threading.Event()
+            self.records = []
+
+        def emit(self, record):
+            self.entered.set()
+            self.unblock.wait(5)
+            self.records.append((record, self.format(record)))
+
+    def setUp(self):
+        metrics.reset()
+        self.target = self.Blocking()
+        self.handler = BoundedQueueHandler(queue.Queue(2))
+        self.handler.name = 'test'
+        self.handler.listener = logging.handlers.QueueListener(
+            self.handler.queue, self.target, respect_handler_level=True,
+        )
+        self.logger = logging.getLogger('App.tests.log_queue')
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(self.target.unblock.set)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        self.logger.warning('first')
+        self.assertTrue(self.target.entered.wait(5))
+        # The listener is stuck in a slow handler: two fit, the rest are dropped.
+        started = time.perf_counter()
+        for i in range(5):
+            self.logger.warning('record %d', i)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(self.handler.dropped, 3)
+        self.assertEqual(metrics.counter('logging.dropped.test'), 3)
+        self.assertEqual(metrics.snapshot()['gauges']['logging.queued.test'], 2)
+
+        self.target.unblock.set()
+        self.handler.stop()
+        self.assertEqual([text for _, text in self.target.records], ['first', 'record 0', 'record 1'])
+
+    def test_traceback_and_request_reach_the_listener(self):
+        self.target.unblock.set()
+        details = ['before']
+        request = RequestFactory().get('/api/medicines/')
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            self.logger.error('Failed with %s', details, exc_info=True, extra={'request': request})
+        details.append('after')
+        self.handler.stop()
+
+        (record, text), = self.target.records
+        self.assertIs(record.request, request)
+        self.assertIs(record.exc_info[0], ZeroDivisionError)
+        self.assertTrue(text.startswith("Failed with ['before']\nTraceback"))
+
+    def test_production_queue_handlers_configure_through_dictconfig(self):
+        # settings_production.LOGGING as loaded in production, without its
+        # required secrets and the directories it creates.
+        path = os.path.join(settings.BASE_DIR, 'settings_production.py')
+        spec = importlib.util.spec_from_file_location('Project.settings_production', path)
+        production = importlib.util.module_from_spec(spec)
+        environ = {'DB_PASSWORD': 'x', 'LOG_QUEUE_SIZE': '50', 'LOG_MAIL_QUEUE_SIZE': '5'}
+        with mock.patch.dict(os.environ, environ), mock.patch('os.makedirs'):
+            spec.loader.exec_module(production)
+        handlers = production.LOGGING['handlers']
+
+        self.addCleanup(configure_logging, settings.LOGGING_CONFIG, settings.LOGGING)
+        logging.config.dictConfig({
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {
+                # The real file and mail handlers stand in for memory buffers.
+                'file': {'class': 'logging.handlers.BufferingHandler', 'capacity': 100},
+                'mail_admins': {'class': 'logging.handlers.BufferingHandler', 'capacity': 100, 'level': 'ERROR'},
+                'file_queue': handlers['file_queue'],
+                'mail_queue': handlers['mail_queue'],
+            },
+            'loggers': {
+                'App.tests.production_logging': {
+                    'handlers': ['file_queue', 'mail_queue'], 'level': 'INFO', 'propagate': False,
+                },
+            },
+        })
+        logger = logging.getLogger('App.tests.production_logging')
+        file_queue, mail_queue = logger.handlers
+        for handler, maxsize in ((file_queue, 50), (mail_queue, 5)):
+            self.assertIsInstance(handler, BoundedQueueHandler)
+            self.assertEqual(handler.queue.maxsize, maxsize)
+
+        logger.info('noted')
+        logger.error('failed')
+        file_queue.stop()
+        mail_queue.stop()
+        file_target, = file_queue.listener.handlers
+        mail_target, = mail_queue.listener.handlers
+        self.assertEqual([record.msg for record in file_target.buffer], ['noted', 'failed'])
+        self.assertEqual([record.msg for record in mail_target.buffer], ['failed'])
+
+
+# ========== Cold start ==========
+class StartupTests(SimpleTestCase):
+    def test_cold_start_stays_within_budget(self):
+        profile = min((profile_startup() for _ in range(3)), key=lambda run: run['total_ms'])
+        self.assertLess(profile['total_ms'], settings.STARTUP_BUDGET_MS, profile['phases'])
+        # Only imported by the endpoints and commands that use them
+        self.assertEqual(loaded_heavy_modules(profile['imports']), [])
+        modules = {module for module, _, _, _ in profile['imports']}
+        self.assertNotIn('App.archive', modules)
+        self.assertNotIn('App.forecasting', modules)
+
+
+# ========== Static build ==========
+class StaticBuildTests(TestCase):
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.build_dir)
+
+    def test_minify_js_keeps_literals_and_line_breaks_that_matter(self):
+        source = (
+            '// comment\n'
+            'const a = "  // not a comment  ";\n'
+            'const b = `line one\n   ${a + "}"}  line two`;\n'
+            'const c = /\\/\\*[ ]+/g.test(a) ? 1 / 2 : 3;  /* block */\n'
+            'let d = a\n'
+            '++b\n'
+            'return x - -y\n'
+        )
+        self.assertEqual(minify_js(source), (
+            'const a="  // not a comment  ";'
+            'const b=`line one\n   ${a + "}"}  line two`;'
+            'const c=/\\/\\*[ ]+/g.test(a)?1 / 2:3;'
+            'let d=a\n'
+            '++b\n'
+            'return x - -y\n'
+        ))
+
+    def test_minify_css_keeps_meaningful_spaces(self):
+        source = 'a :hover , b > c {\n  content: "a , b ; }" ;\n  width: calc(1px + 2%);\n}\n/* x */\n.d { margin: 0 auto }'
+        self.assertEqual(
+            minify_css(source), 'a :hover,b>c{content:"a , b ; }";width:calc(1px + 2%)}.d{margin:0 auto}\n',
+        )
+
+    def test_build_writes_hashed_precompressed_bundles(self):
+        results = build(settings.STATICFILES_DIRS[0], self.build_dir)
+        manifest = read_manifest(self.build_dir)
+        self.assertEqual(set(manifest), {name for name, *_ in results})
+        for name, hashed, source, minified, gzipped, _ in results:
+            self.assertRegex(hashed, r'^[\w]+\.[0-9a-f]{12}\.(js|css)$')
+            self.assertLess(minified, source)
+            with open(os.path.join(self.build_dir, hashed), 'rb') as plain, \
+                    open(os.path.join(self.build_dir, f'{hashed}.gz'), 'rb') as compressed:
+                self.assertEqual(gzip.decompress(compressed.read()), plain.read())
+        # Same sources, same names: a rebuild does not bust browser caches
+        build(settings.STATICFILES_DIRS[0], self.build_dir)
+        self.assertEqual(read_manifest(self.build_dir), manifest)
+
+    def test_rebuild_keeps_previous_build_only(self):
+        source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source_dir)
+        hashed = []
+        for version in range(3):
+            with open(os.path.join(source_dir, 'a.js'), 'w') as handle:
+                handle.write(f'var version = {version};\n')
+            build(source_dir, self.build_dir, {'a.js': ['a.js']})
+            hashed.append(read_manifest(self.build_dir)['a.js'])
+        files = set(os.listdir(self.build_dir))
+        self.assertNotIn(hashed[0], files)
+        self.assertTrue({hashed[1], hashed[2], f'{hashed[2]}.gz', 'manifest.json'} <= files)
+
+    def test_bundle_tag_uses_the_build_or_the_sources(self):
+        template = Template("{% load assets %}{% bundle 'home.js' %}{% bundle 'site.css' %}")
+        with override_settings(STATIC_BUILD_DIR=self.build_dir):
+            html = template.render(Context())
+            self.assertIn('<script src="/static/script.js"></script>\n<script src="/static/home.js"></script>', html)
+            self.assertIn('<link rel="stylesheet" href="/static/style.css" />', html)
+
+            build(settings.STATICFILES_DIRS[0], self.build_dir)
+            manifest = read_manifest(self.build_dir)
+            html = template.render(Context())
+        self.assertEqual(html, (
+            f'<script src="/static/dist/{manifest["home.js"]}"></script>'
+            f'<link rel="stylesheet" href="/static/dist/{manifest["site.css"]}" />'
+        ))
+
+    def test_pages_render_with_bundles(self):
+        with override_settings(STATIC_BUILD_DIR=self.build_dir):
+            build(settings.STATICFILES_DIRS[0], self.build_dir)
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, f'/static/dist/{read_manifest(self.build_dir)["home.js"]}')
+        self.assertNotContains(response, '<script>')
+
+    def test_asset_served_precompressed_and_immutable(self):
+        with override_settings(STATIC_BUILD_DIR=self.build_dir):
+            build(settings.STATICFILES_DIRS[0], self.build_dir)
+            name = read_manifest(self.build_dir)['admin.js']
+            url = reverse('static_asset', kwargs={'name': name})
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+            plain = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+            missing = self.client.get(reverse('static_asset', kwargs={'name': 'manifest.json'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertTrue(response['Content-Type'].startswith('text/javascript'))
+        body = b''.join(plain.streaming_content)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), body)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_malformed_quality_values_count_as_accepted(self):
+        with override_settings(STATIC_BUILD_DIR=self.build_dir):
+            build(settings.STATICFILES_DIRS[0], self.build_dir)
+            name = read_manifest(self.build_dir)['admin.js']
+            url = reverse('static_asset', kwargs={'name': name})
+            responses = [
+                self.client.get(url, HTTP_ACCEPT_ENCODING=header)
+                for header in ('gzip;q=.', 'gzip;q=1.2.3', 'br;q=0, gzip;q=..')
+            ]
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_extract_inline_scripts_leaves_template_syntax_inline(self):
+        template_path = os.path.join(self.build_dir, 'page.html')
+        script_path = os.path.join(self.build_dir, 'page.js')
+        with open(template_path, 'w', newline='') as handle:
+            handle.write(
+                '<body>\r\n    <script>\r\n      var a = 1;\r\n    </script>\r\n'
+                '    <script>\r\n      var b = {{ count }};\r\n    </script>\r\n'
+                '    <script>\r\n      var c = 3;\r\n    </script>\r\n</body>\r\n'
+            )
+        self.assertEqual(extract_inline_scripts(template_path, script_path, 'page.js'), 2)
+        with open(template_path, newline='') as handle:
+            self.assertEqual(handle.read(), (
+                '<body>\r\n    <script src="{% static \'page.js\' %}"></script>\r\n'
+                '    <script>\r\n      var b = {{ count }};\r\n    </script>\r\n\r\n</body>\r\n'
+            ))
+        with open(script_path, newline='') as handle:
+            self.assertEqual(handle.read(), 'var a = 1;\r\n\r\nvar c = 3;\r\n')
+
+
+# ========== Object cache ==========
+class ObjectCacheTests(TransactionTestCase):
+    """Real commits, as the cache is invalidated when a write commits."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.object_cache = Medicine.objects.object_cache
+        self.object_cache.clear_local()
+        self.addCleanup(self.object_cache.clear_local)
+        self.medicine = Medicine.objects.create(
+            name='Ashwagandha', image='m.png', description='d', stock_quantity=5, price=1,
+        )
+
+    def lookup(self, pk, queries):
+        with self.assertNumQueries(queries):
+            return Medicine.objects.get_cached(pk)
+
+    def test_tiers(self):
+        self.assertEqual(self.lookup(self.medicine.pk, 1).name, 'Ashwagandha')
+        self.lookup(self.medicine.pk, 0)
+        self.lookup(str(self.medicine.pk), 0)
+        # Another worker: only the shared tier has it
+        self.object_cache.clear_local()
+        self.lookup(self.medicine.pk, 0)
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['object_cache.App.medicine.local_hit'], 2)
+        self.assertEqual(counters['object_cache.App.medicine.shared_hit'], 1)
+        self.assertEqual(counters['object_cache.App.medicine.miss'], 1)
+        self.assertEqual(metrics.snapshot()['gauges']['object_cache.App.medicine.hit_ratio'], 0.75)
+
+    def test_callers_get_their_own_copy(self):
+        self.lookup(self.medicine.pk, 1).name = 'Changed'
+        self.assertEqual(self.lookup(self.medicine.pk, 0).name, 'Ashwagandha')
+
+    def test_writes_invalidate(self):
+        self.lookup(self.medicine.pk, 1)
+        self.medicine.name = 'Renamed'
+        self.medicine.save()
+        self.assertEqual(self.lookup(self.medicine.pk, 1).name, 'Renamed')
+
+        Medicine.objects.filter(pk=self.medicine.pk).update(stock_quantity=9)
+        self.assertEqual(self.lookup(self.medicine.pk, 1).stock_quantity, 9)
+
+        self.medicine.delete()
+        with self.assertRaises(Medicine.DoesNotExist):
+            self.lookup(self.medicine.pk, 1)
+
+    def test_write_in_another_worker(self):
+        self.lookup(self.medicine.pk, 1)
+        # Another worker's write bumps the shared version; this one's local
+        # copy is trusted for OBJECT_CACHE_LOCAL_SECONDS, then rechecked.
+        cache.incr(self.object_cache._version_key(self.medicine.pk))
+        self.lookup(self.medicine.pk, 0)
+        with mock.patch('App.object_cache.time.monotonic', return_value=time.monotonic() + 2):
+            self.lookup(self.medicine.pk, 1)
+
+    def test_missing_rows_are_cached(self):
+        with self.assertRaises(Medicine.DoesNotExist):
+            self.lookup(self.medicine.pk + 1, 1)
+        with self.assertRaises(Medicine.DoesNotExist):
+            self.lookup(self.medicine.pk + 1, 0)
+        with self.assertRaises(Medicine.DoesNotExist):
+            self.lookup('not-an-id', 0)
+        # Created later: the insert invalidates the cached absence
+        created = Medicine.objects.create(name='New', image='m.png', description='d', price=1)
+        self.assertEqual(self.lookup(created.pk, 1).name, 'New')
+
+    def test_get_many(self):
+        other = Medicine.objects.create(name='Tulsi', image='m.png', description='d', price=1)
+        self.lookup(self.medicine.pk, 1)
+        with self.assertNumQueries(1):
+            found = Medicine.objects.get_many_cached([self.medicine.pk, other.pk, other.pk + 1])
+        self.assertEqual({pk: medicine.name for pk, medicine in found.items()},
+                         {self.medicine.pk: 'Ashwagandha', other.pk: 'Tulsi'})
+
+    def test_uncommitted_writes_are_not_cached(self):
+        self.lookup(self.medicine.pk, 1)
+        with transaction.atomic():
+            self.medicine.name = 'Uncommitted'
+            self.medicine.save()
+            # This transaction sees its own write; nobody else may
+            self.assertEqual(self.lookup(self.medicine.pk, 1).name, 'Uncommitted')
+            transaction.set_rollback(True)
+        self.assertEqual(self.lookup(self.medicine.pk, 1).name, 'Ashwagandha')
+
+    def test_async_lookups(self):
+        self.lookup(self.medicine.pk, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(Medicine.objects.aget_cached)(self.medicine.pk).name, 'Ashwagandha')
+
+        # Async bookings find the doctor in the cache too
+        patch_sms(self)
+        doctor = Doctor.objects.create(name='Lee', specialty='GP')
+        Doctor.objects.get_cached(doctor.pk)
+        OTP.objects.create(phone_number=PHONE, otp_code='123456', is_verified=True,
+                           expires_at=timezone.now() + timedelta(minutes=10))
+        data = {'phone_number': PHONE, 'customer_name': 'Asha', 'doctor': doctor.pk, 'date': '2030-01-01T10:00:00Z'}
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/async/create-appointment/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([query for query in captured if 'FROM "App_doctor"' in query['sql']])
+
+    def test_concurrent_misses_read_the_database_once(self):
+        fetches = []
+
+        def slow_fetch(pks, using):
+            fetches.append(pks)
+            time.sleep(0.2)
+            return {self.medicine.pk: self.medicine}
+
+        names = []
+        with mock.patch.object(self.object_cache, '_fetch', side_effect=slow_fetch):
+            threads = [
+                threading.Thread(target=lambda: names.append(Medicine.objects.get_cached(self.medicine.pk).name))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(fetches, [[self.medicine.pk]])
+        self.assertEqual(names, ['Ashwagandha'] * 8)
+        self.assertEqual(metrics.counter('object_cache.App.medicine.waited'), 7)
+
+    def test_api_reads(self):
+        client = APIClient()
+        doctor = Doctor.objects.create(name='Lee', specialty='GP')
+        for url in (f'/api/medicines/{self.medicine.pk}/', f'/api/doctors/{doctor.pk}/'):
+            with self.subTest(url=url):
+                client.get(url)
+                with self.assertNumQueries(0):
+                    self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.get(f'/api/doctors/{doctor.pk + 1}/').status_code, 404)
+
+        SaleRecord.objects.create(medicine=self.medicine, quantity_sold=1)
+        with self.assertNumQueries(1):
+            response = client.get('/api/sales-feed/')
+        self.assertEqual(response.json()[0]['medicine_name'], 'Ashwagandha')
+
+
+# ========== Bulk writes ==========
+@override_settings(LOW_STOCK_ALERT_PHONE=PHONE, LOW_STOCK_THRESHOLD=10)
+class BulkWriteTests(TransactionTestCase):
+    """Real commits, so that object cache lookups of committed rows are hits."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        self.medicines = [
+            Medicine.objects.create(name=f'Medicine {i}', image='m.png', description='d', stock_quantity=50, price=1)
+            for i in range(3)
+        ]
+        self.start = ChangeLog.objects.order_by('seq').last().seq
+
+    def log(self):
+        return list(ChangeLog.objects.filter(seq__gt=self.start).values_list('model', 'action'))
+
+    def bulk(self, method, prefix, items):
+        return getattr(self.client, method)(f'/api/{prefix}/bulk/', items, format='json')
+
+    def test_create_update_and_delete(self):
+        response = self.bulk('post', 'doctors', [{'name': f'Doctor {i}', 'specialty': 'GP'} for i in range(3)])
+        self.assertEqual(response.status_code, 201)
+        ids = [result['id'] for result in response.data['results']]
+        self.assertEqual(sorted(Doctor.objects.values_list('pk', flat=True)), sorted(ids))
+
+        response = self.bulk('patch', 'doctors', [
+            {'id': ids[0], 'is_available': False}, {'id': ids[1], 'name': 'Renamed'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Doctor.objects.get(pk=ids[0]).is_available, False)
+        self.assertEqual(Doctor.objects.get(pk=ids[1]).name, 'Renamed')
+
+        response = self.bulk('delete', 'doctors', [ids[0], ids[2], ids[2] + 100])
+        self.assertEqual([result['status'] for result in response.data['results']], ['deleted', 'deleted', 'not_found'])
+        self.assertEqual(list(Doctor.objects.values_list('pk', flat=True)), [ids[1]])
+        self.assertEqual(self.log(), [('App.doctor', 'create')] * 3 + [('App.doctor', 'update')] * 2
+                         + [('App.doctor', 'delete')] * 2)
+
+    def test_invalid_items_change_nothing(self):
+        first, second, third = self.medicines
+        response = self.bulk('patch', 'medicines', [
+            {'id': first.pk, 'price': '5.00'},
+            {'id': second.pk, 'price': 'free'},
+            {'id': third.pk + 100, 'price': '5.00'},
+            {'price': '5.00'},
+            {'id': first.pk, 'price': '6.00'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], '4 of 5 items are invalid; nothing was changed')
+        self.assertEqual([(result['index'], list(result['errors'])) for result in response.data['results']],
+                         [(1, ['price']), (2, ['id']), (3, ['id']), (4, ['id'])])
+        self.assertEqual(set(Medicine.objects.values_list('price', flat=True)), {Decimal('1.00')})
+        self.assertEqual(self.log(), [])
+
+        for items in ({'id': first.pk}, [], [True], ['x']):
+            with self.subTest(items=items):
+                self.assertEqual(self.bulk('delete', 'medicines', items).status_code, 400)
+        with override_settings(BULK_MAX_ITEMS=2):
+            self.assertEqual(self.bulk('delete', 'medicines', [1, 2, 3]).status_code, 400)
+        self.assertEqual(Medicine.objects.count(), 3)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.bulk('delete', 'medicines', [first.pk]).status_code, 401)
+
+    def test_queries_do_not_grow_with_items(self):
+        doctor = Doctor.objects.create(name='Lee', specialty='GP')
+        Doctor.objects.get_cached(doctor.pk)  # Items are checked against the object cache
+        counts = []
+        for size in (2, 40):
+            items = [
+                {'doctor': doctor.pk, 'customer_name': f'Customer {i}', 'phone_number': PHONE,
+                 'date': '2030-01-01T10:00:00Z'}
+                for i in range(size)
+            ]
+            with CaptureQueriesContext(connection) as created:
+                ids = [result['id'] for result in self.bulk('post', 'appointments', items).data['results']]
+            with CaptureQueriesContext(connection) as updated:
+                self.bulk('patch', 'appointments', [{'id': pk, 'is_verified': True} for pk in ids])
+            with CaptureQueriesContext(connection) as deleted:
+                self.bulk('delete', 'appointments', ids)
+            counts.append([len(budgeted_queries(captured.captured_queries))
+                           for captured in (created, updated, deleted)])
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_deletes_log_cascades_in_one_insert_per_model(self):
+        doctors = Doctor.objects.bulk_create([Doctor(name=f'Doctor {i}', specialty='GP') for i in range(3)])
+        Appointment.objects.bulk_create([
+            Appointment(doctor=doctor, customer_name='Asha', phone_number=PHONE, date=timezone.now())
+            for doctor in doctors for _ in range(2)
+        ])
+        self.start = ChangeLog.objects.order_by('seq').last().seq
+        with CaptureQueriesContext(connection) as captured:
+            response = self.bulk('delete', 'doctors', [doctor.pk for doctor in doctors])
+        self.assertEqual(response.data['deleted'], {'App.Appointment': 6, 'App.Doctor': 3})
+        inserts = [query for query in captured.captured_queries if 'INSERT INTO "App_changelog"' in query['sql']]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(sorted(self.log()), [('App.appointment', 'delete')] * 6 + [('App.doctor', 'delete')] * 3)
+
+    def test_stock_updates_alert_and_invalidate_the_cache(self):
+        first, second, _ = self.medicines
+        Medicine.objects.get_many_cached([first.pk, second.pk])
+        with mock.patch.object(alerts.low_stock_alerts, 'add') as add:
+            response = self.bulk('patch', 'medicines', [
+                {'id': first.pk, 'stock_quantity': 4}, {'id': second.pk, 'stock_quantity': 40},
+            ])
+        self.assertEqual(response.status_code, 200)
+        add.assert_called_once_with(first.pk, ('Medicine 0', 4, 10))
+        self.assertEqual(Medicine.objects.get_cached(first.pk).stock_quantity, 4)
+        self.assertEqual(Medicine.objects.get_cached(second.pk).stock_quantity, 40)
@@ -0,0 +1,146 @@
+"""
+Front-line rate limits for the OTP endpoints.
+
+send_otp and customer_send_otp are open to anyone and every call costs DB
+writes and a paid SMS, so limits are checked before the view touches the
+database: per phone number, per client IP, and a daily cap per number.
+
+Each limit is a sliding-window counter kept in the shared cache. A request
+increments the counter for the current window with an atomic cache.incr and
+weighs in the previous window by how much of it still overlaps the sliding
+window, so bursts at a window boundary cannot double the rate, and workers
+never race on read-modify-write. A request costs one incr per limit plus one
+get_many for all the previous-window counts.
+"""
+
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Which limits apply to which kind of request, and what each one is keyed by.
+# The rates themselves come from settings.OTP_RATE_LIMITS.
+RULES = {
+    'send': [('send', 'phone'), ('send_ip', 'ip'), ('send_daily', 'phone')],
+    'verify': [('verify', 'phone'), ('verify_ip', 'ip')],
+}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'5/10m' -> (5, 600). The period is an optional count and one of s, m, h, d."""
+    count, period = rate.split('/')
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(count), multiplier * PERIODS[period[-1]]
+
+
+def client_ip(request):
+    """Client address, trusting X-Forwarded-For the same way DRF throttles do."""
+    xff = request.META.get('HTTP_X_FORWARDED_FOR')
+    remote_addr = request.META.get('REMOTE_ADDR')
+    num_proxies = api_settings.NUM_PROXIES
+    if num_proxies is not None:
+        if num_proxies == 0 or xff is None:
+            return remote_addr
+        addrs = xff.split(',')
+        return addrs[-min(num_proxies, len(addrs))].strip()
+    return ''.join(xff.split()) if xff else remote_addr
+
+
+def increment(key, window):
+    """Atomically count one request in a window counter and return the new count."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # First hit in this window. add() loses to a concurrent add, so fall
+        # back to incr rather than overwriting someone else's count.
+        return 1 if cache.add(key, 1, 2 * window) else cache.incr(key)
+
+
+def wait_time(limit, window, elapsed, count, previous):
+    """Seconds until a sliding window holding these counts has room, or 0 if it has now."""
+    estimate = previous * (window - elapsed) / window + count
+    if estimate <= limit:
+        return 0
+    if count >= limit:
+        return window - elapsed
+    # Time until the previous window's weight has decayed enough to fit.
+    return max(1, window - elapsed - (limit - count) * window / previous)
+
+
+def hit(name, ident, rate, now=None):
+    """
+    Count one request against a sliding-window limit.
+
+    Returns 0 if the request is allowed, otherwise the number of seconds after
+    which it would be.
+    """
+    return hit_many([(name, ident, rate)], now)
+
+
+def hit_many(limits, now=None):
+    """
+    Count one request against several (name, ident, rate) limits at once.
+
+    One incr per limit plus a single get_many for all the previous windows.
+    Returns the longest wait, or 0 if every limit allows the request.
+    """
+    now = time.time() if now is None else now
+    counted = []
+    for name, ident, rate in limits:
+        limit, window = parse_rate(rate)
+        current = int(now // window)
+        count = increment(f'otp-rl:{name}:{ident}:{current}', window)
+        counted.append((limit, window, now - current * window, count, f'otp-rl:{name}:{ident}:{current - 1}'))
+
+    previous = cache.get_many([entry[-1] for entry in counted])
+    return max(
+        wait_time(limit, window, elapsed, count, previous.get(previous_key, 0))
+        for limit, window, elapsed, count, previous_key in counted
+    )
+
+
+def check(kind, phone_number, ip):
+    """
+    Apply every limit for ``kind`` ('send' or 'verify').
+
+    Returns 0 when the request may proceed, otherwise the seconds to wait.
+    """
+    rates = settings.OTP_RATE_LIMITS
+    idents = {'phone': phone_number, 'ip': ip}
+    limits = [
+        (name, idents[keyed_by], rates[name])
+        for name, keyed_by in RULES[kind]
+        if idents[keyed_by] and rates.get(name)
+    ]
+    return hit_many(limits) if limits else 0
+
+
+class OTPRateThrottle(BaseThrottle):
+    """DRF throttle running the OTP limits in APIView.initial, before the view body."""
+
+    kind = None
+
+    def allow_request(self, request, view):
+        # A JSON body need not be an object; anything else has no phone number
+        data = request.data if isinstance(request.data, dict) else {}
+        phone_number = data.get('phone_number', '')
+        phone_number = phone_number.strip() if isinstance(phone_number, str) else ''
+        self.retry_after = check(self.kind, phone_number, client_ip(request))
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
+
+
+class OTPSendThrottle(OTPRateThrottle):
+    kind = 'send'
+
+
+class OTPVerifyThrottle(OTPRateThrottle):
+    kind = 'verify'
@@ -0,0 +1,131 @@
+"""
+Per-view transaction policies, replacing ATOMIC_REQUESTS.
+
+ATOMIC_REQUESTS wrapped every request in a transaction: read-only pages
+paid for BEGIN/COMMIT, and send_otp kept its transaction open for the whole
+Twilio round trip. Instead each view declares one of three policies:
+
+READ_ONLY
+    No transaction. Every query runs in autocommit.
+ATOMIC
+    The whole view body runs in one transaction. For views that only touch
+    the database.
+ATOMIC_DB_ONLY
+    The view wraps its database section in ``db_section()`` itself and does
+    external I/O (SMS, HTTP) after the commit, inside ``external_io()``,
+    which refuses to run while that view's transaction is still open.
+
+Function views use the decorators under @api_view, so authentication and
+throttling run before any transaction opens::
+
+    @api_view(['POST'])
+    @atomic_db_only
+    def send_otp(request): ...
+
+Viewsets mix in TransactionPolicyMixin and map actions to policies in
+``transaction_policies``; list and retrieve default to READ_ONLY and every
+other action to ATOMIC.
+"""
+
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+READ_ONLY = 'read_only'
+ATOMIC = 'atomic'
+ATOMIC_DB_ONLY = 'atomic_db_only'
+POLICIES = (READ_ONLY, ATOMIC, ATOMIC_DB_ONLY)
+
+# Policy of the view being run and how many atomic blocks were already open
+# when it started (tests and ATOMIC_REQUESTS open some outside the view).
+current_policy = ContextVar('current_policy', default=None)
+_base_depth = ContextVar('transaction_base_depth', default=None)
+
+
+class TransactionPolicyError(Exception):
+    """A view broke its declared transaction policy."""
+
+
+def _depth(using=DEFAULT_DB_ALIAS):
+    return len(connections[using].atomic_blocks)
+
+
+def apply_policy(policy, func):
+    """Wrap ``func`` so it runs under ``policy``."""
+    if policy not in POLICIES:
+        raise ValueError(f'Unknown transaction policy {policy!r}')
+
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        policy_token = current_policy.set(policy)
+        depth_token = _base_depth.set(_depth())
+        try:
+            if policy == ATOMIC:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            return func(*args, **kwargs)
+        finally:
+            _base_depth.reset(depth_token)
+            current_policy.reset(policy_token)
+
+    wrapped.transaction_policy = policy
+    return wrapped
+
+
+def transaction_policy(policy):
+    """Decorator form of apply_policy."""
+    return functools.partial(apply_policy, policy)
+
+
+read_only = transaction_policy(READ_ONLY)
+atomic = transaction_policy(ATOMIC)
+atomic_db_only = transaction_policy(ATOMIC_DB_ONLY)
+
+
+def db_section(using=None, savepoint=True):
+    """The transaction an ATOMIC_DB_ONLY view wraps its database work in."""
+    return transaction.atomic(using=using, savepoint=savepoint)
+
+
+@contextmanager
+def external_io(using=DEFAULT_DB_ALIAS):
+    """
+    Mark a block that talks to the outside world.
+
+    Raises TransactionPolicyError if the view running it still has a
+    transaction of its own open, which would hold the connection for the
+    length of the call.
+    """
+    base = _base_depth.get()
+    if base is not None and _depth(using) > base:
+        raise TransactionPolicyError(
+            'External I/O inside a transaction; commit the db_section() first'
+        )
+    yield
+
+
+class TransactionPolicyMixin:
+    """
+    Run each viewset action under the policy named in ``transaction_policies``.
+
+    The handler is wrapped in initial(), after authentication, permission
+    and throttle checks, so those never run inside the transaction.
+    """
+
+    transaction_policies = {}
+    default_policies = {'list': READ_ONLY, 'retrieve': READ_ONLY}
+
+    def get_transaction_policy(self):
+        action = getattr(self, 'action', None)
+        if action in self.transaction_policies:
+            return self.transaction_policies[action]
+        return self.default_policies.get(action, ATOMIC)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        method = request.method.lower()
+        handler = getattr(self, method, None)
+        if handler is not None:
+            setattr(self, method, apply_policy(self.get_transaction_policy(), handler))
@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     MedicineViewSet, DoctorViewSet, AppointmentViewSet, RecentSalesViewSet,
     register, login, logout, send_otp, verify_otp, create_appointment,
-    customer_send_otp, customer_verify_otp, customer_logout, customer_appointments
+    customer_send_otp, customer_verify_otp, customer_logout, customer_appointments, metrics,
+    sales_analytics, reorder_report, export, changes, dashboard_summary,
+    message_status,
 )
 
 router = DefaultRouter()
@@ -12,20 +16,43 @@ router.register(r'doctors', DoctorViewSet)
 router.register(r'appointments', AppointmentViewSet)
 router.register(r'sales-feed', RecentSalesViewSet)
 
+
+def otp_view(sync_view, async_view):
+    """Pick the native async variant when settings.ASYNC_OTP_VIEWS is on"""
+    return async_view if settings.ASYNC_OTP_VIEWS else sync_view
+
+
+# Async variants are always reachable under async/ for benchmarking and rollout
+async_urlpatterns = [
+    path('send-otp/', async_views.send_otp, name='async_send_otp'),
+    path('verify-otp/', async_views.verify_otp, name='async_verify_otp'),
+    path('create-appointment/', async_views.create_appointment, name='async_create_appointment'),
+    path('customer/send-otp/', async_views.customer_send_otp, name='async_customer_send_otp'),
+    path('customer/verify-otp/', async_views.customer_verify_otp, name='async_customer_verify_otp'),
+]
+
 urlpatterns = [
     # Authentication endpoints
     path('register/', register, name='register'),
     path('login/', login, name='login'),
     path('logout/', logout, name='logout'),
     # Customer authentication endpoints
-    path('customer/send-otp/', customer_send_otp, name='customer_send_otp'),
-    path('customer/verify-otp/', customer_verify_otp, name='customer_verify_otp'),
+    path('customer/send-otp/', otp_view(customer_send_otp, async_views.customer_send_otp), name='customer_send_otp'),
+    path('customer/verify-otp/', otp_view(customer_verify_otp, async_views.customer_verify_otp), name='customer_verify_otp'),
     path('customer/logout/', customer_logout, name='customer_logout'),
     path('customer/appointments/', customer_appointments, name='customer_appointments'),
     # OTP endpoints
-    path('send-otp/', send_otp, name='send_otp'),
-    path('verify-otp/', verify_otp, name='verify_otp'),
-    path('create-appointment/', create_appointment, name='create_appointment'),
+    path('send-otp/', otp_view(send_otp, async_views.send_otp), name='send_otp'),
+    path('verify-otp/', otp_view(verify_otp, async_views.verify_otp), name='verify_otp'),
+    path('create-appointment/', otp_view(create_appointment, async_views.create_appointment), name='create_appointment'),
+    path('async/', include(async_urlpatterns)),
+    path('metrics/', metrics, name='metrics'),
+    path('sales/analytics/', sales_analytics, name='sales_analytics'),
+    path('reorder-report/', reorder_report, name='reorder_report'),
+    path('export/<slug:dataset>.<slug:fmt>', export, name='export'),
+    path('changes/', changes, name='changes'),
+    path('dashboard/summary/', dashboard_summary, name='dashboard_summary'),
+    path('messages/status/', message_status, name='message_status'),
     # This includes all the routes registered above
     path('', include(router.urls)),
 ]
\ No newline at end of file
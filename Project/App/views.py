@@ -1,27 +1,48 @@
 from django.shortcuts import render
+from django.db import router
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, filters, status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 import random
 import string
 
-from .models import Medicine, Doctor, Appointment, SaleRecord, OTP, Customer, UserProfile
+from .models import Medicine, Doctor, Appointment, SaleRecord, OTP, Customer
 from .serializers import *
+from .instrumentation import metrics as app_metrics
+from .analytics import AnalyticsError, sales_series
+from .changelog import FEEDS, changes_since, head
+from .dashboard import dashboard_summary as summarize_dashboard
+from .db_routers import ReplicaReadMixin, replica_reads
+from .exports import ExportError, export_stream
+from .idempotency import idempotent
+from .message_status import STATUS_RANKS, record_callback, valid_sid, validate_callback
 from .messages import MessageHandler
+from .services import OTPVerificationError, customer_login
+from .throttling import OTPSendThrottle, OTPVerifyThrottle
+from .transactions import (
+    TransactionPolicyMixin, atomic, atomic_db_only, db_section, external_io, read_only,
+)
 
 # ========== OTP Functions ==========
 def generate_otp():
     """Generate a random 6-digit OTP"""
     return ''.join(random.choices(string.digits, k=6))
 
+@idempotent
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([OTPSendThrottle])
+@atomic_db_only
 def send_otp(request):
     """Generate and send OTP to phone number"""
     phone_number = request.data.get('phone_number', '').strip()
@@ -39,23 +60,23 @@ def send_otp(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Delete previous OTPs for this phone number
-    OTP.objects.filter(phone_number=phone_number).delete()
-    
     # Generate OTP
     otp_code = generate_otp()
     expires_at = timezone.now() + timedelta(minutes=10)
     
-    # Create OTP record
-    otp = OTP.objects.create(
-        phone_number=phone_number,
-        otp_code=otp_code,
-        expires_at=expires_at
-    )
+    # Replace previous OTPs for this phone number; committed before the SMS goes out
+    with db_section():
+        OTP.objects.filter(phone_number=phone_number).delete()
+        otp = OTP.objects.create(
+            phone_number=phone_number,
+            otp_code=otp_code,
+            expires_at=expires_at
+        )
     
     # Send OTP using MessageHandler
-    handler = MessageHandler(phone_number, otp_code)
-    result = handler.send_otp_to_phone()
+    with external_io():
+        handler = MessageHandler(phone_number, otp_code)
+        result = handler.send_otp_to_phone()
     
     if result['success']:
         return Response({
@@ -70,6 +91,8 @@ def send_otp(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([OTPVerifyThrottle])
+@atomic
 def verify_otp(request):
     """Verify OTP for phone number"""
     phone_number = request.data.get('phone_number', '').strip()
@@ -108,8 +131,10 @@ def verify_otp(request):
         'is_verified': True
     }, status=status.HTTP_200_OK)
 
+@idempotent
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@atomic_db_only
 def create_appointment(request):
     """Create appointment with OTP-verified phone number"""
     phone_number = request.data.get('phone_number', '').strip()
@@ -124,43 +149,40 @@ def create_appointment(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Check if OTP is verified
-    try:
-        otp = OTP.objects.get(phone_number=phone_number, is_verified=True)
-    except OTP.DoesNotExist:
-        return Response(
-            {'error': 'Phone number not verified. Please verify OTP first.'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
     # Verify doctor exists
     try:
-        doctor = Doctor.objects.get(id=doctor_id)
+        doctor = Doctor.objects.get_cached(doctor_id)
     except Doctor.DoesNotExist:
         return Response(
             {'error': 'Doctor not found'},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Create appointment
-    appointment = Appointment.objects.create(
-        doctor=doctor,
-        customer_name=customer_name,
-        phone_number=phone_number,
-        date=appointment_date,
-        is_verified=True
-    )
+    # Consume the verified OTP and create the appointment. Deleting is the
+    # check, so two concurrent requests with one OTP cannot both book.
+    with db_section():
+        consumed, _ = OTP.objects.filter(phone_number=phone_number, is_verified=True).delete()
+        if not consumed:
+            return Response(
+                {'error': 'Phone number not verified. Please verify OTP first.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        appointment = Appointment.objects.create(
+            doctor=doctor,
+            customer_name=customer_name,
+            phone_number=phone_number,
+            date=appointment_date,
+            is_verified=True
+        )
     
     # Send appointment confirmation via SMS
-    handler = MessageHandler(phone_number)
-    handler.send_appointment_confirmation(
-        doctor_name=doctor.name,
-        appointment_date=appointment_date,
-        appointment_id=appointment.id
-    )
-    
-    # Mark OTP as used by deleting it
-    otp.delete()
+    with external_io():
+        handler = MessageHandler(phone_number)
+        handler.send_appointment_confirmation(
+            doctor_name=doctor.name,
+            appointment_date=appointment_date,
+            appointment_id=appointment.id
+        )
     
     serializer = AppointmentSerializer(appointment)
     return Response({
@@ -169,8 +191,10 @@ def create_appointment(request):
     }, status=status.HTTP_201_CREATED)
 
 # ========== Authentication Views ==========
+@idempotent
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@atomic
 def register(request):
     """Register a new admin user"""
     username = request.data.get('username')
@@ -198,6 +222,7 @@ def register(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@atomic
 def login(request):
     """Login an admin user"""
     username = request.data.get('username')
@@ -226,14 +251,18 @@ def login(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@atomic
 def logout(request):
     """Logout an admin user"""
     request.user.auth_token.delete()
     return Response({'message': 'Logged out successfully'})
 
 # ========== Customer Authentication Views ==========
+@idempotent
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([OTPSendThrottle])
+@atomic_db_only
 def customer_send_otp(request):
     """Send OTP for customer login"""
     phone_number = request.data.get('phone_number', '').strip()
@@ -251,23 +280,23 @@ def customer_send_otp(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Delete previous OTPs for this phone number
-    OTP.objects.filter(phone_number=phone_number).delete()
-    
     # Generate OTP
     otp_code = generate_otp()
     expires_at = timezone.now() + timedelta(minutes=10)
     
-    # Create OTP record
-    otp = OTP.objects.create(
-        phone_number=phone_number,
-        otp_code=otp_code,
-        expires_at=expires_at
-    )
+    # Replace previous OTPs for this phone number; committed before the SMS goes out
+    with db_section():
+        OTP.objects.filter(phone_number=phone_number).delete()
+        otp = OTP.objects.create(
+            phone_number=phone_number,
+            otp_code=otp_code,
+            expires_at=expires_at
+        )
     
     # Send OTP using MessageHandler
-    handler = MessageHandler(phone_number, otp_code)
-    result = handler.send_otp_to_phone()
+    with external_io():
+        handler = MessageHandler(phone_number, otp_code)
+        result = handler.send_otp_to_phone()
     
     if result['success']:
         return Response({
@@ -282,6 +311,8 @@ def customer_send_otp(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([OTPVerifyThrottle])
+@atomic_db_only
 def customer_verify_otp(request):
     """Verify OTP and login customer"""
     phone_number = request.data.get('phone_number', '').strip()
@@ -294,54 +325,25 @@ def customer_verify_otp(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Find the OTP record
+    # Consume the OTP and upsert customer, user and token in one transaction
     try:
-        otp = OTP.objects.get(phone_number=phone_number, otp_code=otp_code)
-    except OTP.DoesNotExist:
+        login = customer_login(phone_number, otp_code, customer_name)
+    except OTPVerificationError as e:
         return Response(
-            {'error': 'Invalid OTP'},
+            {'error': str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Check if OTP is expired
-    if timezone.now() > otp.expires_at:
-        otp.delete()
-        return Response(
-            {'error': 'OTP has expired'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Get or create customer
-    customer, created = Customer.objects.get_or_create(
-        phone_number=phone_number,
-        defaults={'name': customer_name or f'Customer {phone_number}'}
-    )
-    
-    # If customer exists and name provided, update name
-    if not created and customer_name:
-        customer.name = customer_name
-        customer.save()
-    
-    # Mark OTP as verified and delete it
-    otp.is_verified = True
-    otp.save()
-    otp.delete()
-    
-    # Create or get token for customer
-    token, created = Token.objects.get_or_create(user=User.objects.get_or_create(
-        username=f'customer_{customer.id}',
-        defaults={'is_staff': False, 'is_superuser': False}
-    )[0])
-    
     return Response({
         'message': 'Login successful',
-        'token': token.key,
-        'customer': CustomerSerializer(customer).data,
-        'is_new_customer': created
+        'token': login['token'],
+        'customer': CustomerSerializer(login['customer']).data,
+        'is_new_customer': login['is_new_customer']
     }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@atomic
 def customer_logout(request):
     """Logout a customer"""
     try:
@@ -352,6 +354,7 @@ def customer_logout(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_only
 def customer_appointments(request):
     """Get customer's appointments"""
     # Since we don't have customer linked to user, we'll need to get phone from customer profile
@@ -390,7 +393,124 @@ def customer_appointments(request):
     return Response({'appointments': serializer.data})
 
 # ========== API ViewSets with Authentication ==========
-class MedicineViewSet(viewsets.ModelViewSet):
+class CachedRetrieveMixin:
+    """Serve retrieve from the model's read-through cache (App/object_cache.py)."""
+
+    def get_object(self):
+        if self.action != 'retrieve':
+            return super().get_object()
+        try:
+            obj = self.queryset.model.objects.get_cached(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ObjectDoesNotExist:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+class BulkWriteMixin:
+    """
+    <prefix>/bulk/ creates (POST), partially updates (PATCH) or deletes
+    (DELETE) up to BULK_MAX_ITEMS objects in one request and one transaction.
+
+    POST takes a list of objects, PATCH a list of partial objects with their
+    "id", DELETE a list of ids. Every item is validated before anything is
+    written; if any is invalid nothing is, and the 400 response lists the
+    errors by index. The writes are one bulk_create, bulk_update or delete,
+    logged to ChangeLog and invalidating the caches like single writes.
+    """
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'At most {settings.BULK_MAX_ITEMS} items per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        handler = {'POST': self.bulk_create, 'PATCH': self.bulk_update, 'DELETE': self.bulk_delete}[request.method]
+        return handler(items)
+
+    def bulk_create(self, items):
+        serializer = self.get_serializer(data=items, many=True)
+        errors = self.bulk_errors(serializer, items)
+        if any(errors):
+            return self.bulk_invalid(errors)
+        model = self.queryset.model
+        objs = model.objects.bulk_create(
+            [model(**data) for data in serializer.validated_data], batch_size=settings.BULK_BATCH_SIZE,
+        )
+        return Response({'results': [{'id': obj.pk, 'status': 'created'} for obj in objs]}, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, items):
+        serializer = self.get_serializer(data=items, many=True, partial=True)
+        errors = self.bulk_errors(serializer, items)
+        model = self.queryset.model
+        pks = []
+        for index, item in enumerate(items):
+            pk = self.bulk_pk(item.get('id') if isinstance(item, dict) else None)
+            if pk is None:
+                errors[index]['id'] = ['A valid id is required.']
+            elif pk in pks:
+                errors[index]['id'] = ['Duplicate id.']
+            pks.append(pk)
+        # Locked, so a concurrent write is not overwritten with what was read here
+        objs = self.get_queryset().select_for_update().in_bulk([pk for pk in pks if pk is not None])
+        for index, pk in enumerate(pks):
+            if pk is not None and pk not in objs:
+                errors[index].setdefault('id', ['Not found.'])
+        if any(errors):
+            return self.bulk_invalid(errors)
+
+        fields = set()
+        for pk, data in zip(pks, serializer.validated_data):
+            for field, value in data.items():
+                setattr(objs[pk], field, value)
+            fields.update(data)
+        if fields:
+            model.objects.bulk_update([objs[pk] for pk in pks], sorted(fields), batch_size=settings.BULK_BATCH_SIZE)
+        return Response({'results': [{'id': pk, 'status': 'updated'} for pk in pks]})
+
+    def bulk_delete(self, items):
+        pks = [self.bulk_pk(item) for item in items]
+        errors = [{} if pk is not None else {'id': ['A valid id is required.']} for pk in pks]
+        if any(errors):
+            return self.bulk_invalid(errors)
+        queryset = self.get_queryset().filter(pk__in=pks)
+        existing = set(queryset.values_list('pk', flat=True))
+        _, deleted = queryset.delete() if existing else (0, {})
+        return Response({
+            'results': [{'id': pk, 'status': 'deleted' if pk in existing else 'not_found'} for pk in pks],
+            # Rows per model, cascades included
+            'deleted': deleted,
+        })
+
+    def bulk_pk(self, value):
+        if value is None or isinstance(value, bool):
+            return None
+        try:
+            return self.queryset.model._meta.pk.to_python(value)
+        except ValidationError:
+            return None
+
+    def bulk_errors(self, serializer, items):
+        """Each item's validation errors, {} for a valid one."""
+        errors = [{} for _ in items]
+        if not serializer.is_valid():
+            found = serializer.errors
+            # A partial list serializer reports only the invalid items, by index
+            for index, error in found.items() if isinstance(found, dict) else enumerate(found):
+                errors[index] = dict(error)
+        return errors
+
+    def bulk_invalid(self, errors):
+        invalid = [{'index': index, 'errors': error} for index, error in enumerate(errors) if error]
+        return Response({
+            'error': f'{len(invalid)} of {len(errors)} items are invalid; nothing was changed',
+            'results': invalid,
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+class MedicineViewSet(BulkWriteMixin, CachedRetrieveMixin, ReplicaReadMixin, TransactionPolicyMixin, viewsets.ModelViewSet):
     queryset = Medicine.objects.all()
     serializer_class = MedicineSerializer
     filter_backends = [filters.SearchFilter]
@@ -403,7 +523,7 @@ class MedicineViewSet(viewsets.ModelViewSet):
         # Require authentication for create/update/delete
         return [IsAuthenticated()]
 
-class DoctorViewSet(viewsets.ModelViewSet):
+class DoctorViewSet(BulkWriteMixin, CachedRetrieveMixin, ReplicaReadMixin, TransactionPolicyMixin, viewsets.ModelViewSet):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
     filter_backends = [filters.SearchFilter]
@@ -416,7 +536,7 @@ class DoctorViewSet(viewsets.ModelViewSet):
         # Require authentication for create/update/delete
         return [IsAuthenticated()]
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(BulkWriteMixin, TransactionPolicyMixin, viewsets.ModelViewSet):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     
@@ -427,8 +547,179 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         # Require authentication for create/update/delete
         return [IsAuthenticated()]
 
-class RecentSalesViewSet(viewsets.ReadOnlyModelViewSet):
+class RecentSalesViewSet(ReplicaReadMixin, TransactionPolicyMixin, viewsets.ReadOnlyModelViewSet):
     # This provides the "Live Update" data feed
-    queryset = SaleRecord.objects.all()[:10] 
+    # medicine_name comes from the object cache, one lookup per page
+    queryset = SaleRecord.objects.order_by('-timestamp')
     serializer_class = SaleRecordSerializer
     permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Only the feed is limited; slicing here would also break retrieve
+        if self.action == 'list':
+            return queryset[:10]
+        return queryset
+
+# ========== Sales Analytics ==========
+# Default range per bucket size when 'from' is not given
+ANALYTICS_DEFAULT_SPAN = {'hour': timedelta(days=2), 'day': timedelta(days=30), 'week': timedelta(weeks=26)}
+
+def parse_moment(value):
+    """ISO date or datetime from a query parameter; naive values are local time"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise AnalyticsError(f'Invalid date: {value}')
+        moment = datetime.combine(day, time.min)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_only
+@replica_reads
+def sales_analytics(request):
+    """Sales per medicine per hour, day or week, served from the rollup tables"""
+    bucket = request.GET.get('bucket', 'day')
+    try:
+        end = parse_moment(request.GET['to']) if request.GET.get('to') else timezone.now()
+        start = (
+            parse_moment(request.GET['from']) if request.GET.get('from')
+            else end - ANALYTICS_DEFAULT_SPAN.get(bucket, timedelta(days=30))
+        )
+        medicine_ids = [int(m) for m in request.GET.get('medicine', '').split(',') if m.strip()]
+        if start > end:
+            raise AnalyticsError("'from' must not be after 'to'")
+        series = sales_series(bucket, start, end, medicine_ids)
+    except ValueError:
+        return Response({'error': 'medicine must be a comma separated list of ids'}, status=400)
+    except AnalyticsError as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response({
+        'bucket': bucket,
+        'from': start,
+        'to': end,
+        **series,
+    })
+
+# ========== Reordering ==========
+REORDER_PARAMETERS = {
+    'method': str, 'history_days': int, 'window': int, 'alpha': float,
+    'lead_time_days': float, 'service_level': float, 'cover_days': float,
+}
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@read_only
+@replica_reads
+def reorder_report(request):
+    """Medicines at or below their reorder point, from demand forecasts over the whole catalog"""
+    # NumPy is only loaded by the endpoints that need it
+    from .forecasting import ForecastError, reorder_plan
+
+    try:
+        parameters = {
+            name: cast(request.GET[name])
+            for name, cast in REORDER_PARAMETERS.items() if request.GET.get(name)
+        }
+        limit = int(request.GET.get('limit', 100))
+    except ValueError:
+        return Response({'error': 'Invalid number in query parameters'}, status=400)
+
+    try:
+        plan = reorder_plan(limit=limit, include_all=request.GET.get('all') == '1', **parameters)
+    except ForecastError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response(plan)
+
+# ========== Exports ==========
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+
+def parse_export_end(value):
+    """Exclusive end of an export range; a bare date includes that whole day"""
+    moment = parse_moment(value)
+    return moment + timedelta(days=1) if parse_datetime(value) is None else moment
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@read_only
+@replica_reads
+def export(request, dataset, fmt):
+    """Stream appointments, sales or the catalog as CSV or JSON Lines, optionally gzipped"""
+    compress = request.GET.get('gzip') == '1'
+    id_param = 'doctor' if dataset == 'appointments' else 'medicine'
+    try:
+        start = parse_moment(request.GET['from']) if request.GET.get('from') else None
+        end = parse_export_end(request.GET['to']) if request.GET.get('to') else None
+        ids = [int(i) for i in request.GET.get(id_param, '').split(',') if i.strip()]
+        # The body is read after this view returns, outside @replica_reads,
+        # so pick the database now.
+        using = router.db_for_read(Medicine)
+        stream = export_stream(dataset, fmt, start, end, ids, using, compress)
+    except (AnalyticsError, ExportError) as e:
+        return Response({'error': str(e)}, status=400)
+    except ValueError:
+        return Response({'error': f"'{id_param}' must be a comma separated list of ids"}, status=400)
+
+    response = StreamingHttpResponse(
+        stream, content_type='application/gzip' if compress else EXPORT_CONTENT_TYPES[fmt],
+    )
+    filename = f'{dataset}.{fmt}' + ('.gz' if compress else '')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# ========== Change Log ==========
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_only
+def changes(request):
+    """Compacted changes to the tracked tables since ?after=<seq>, for incremental sync"""
+    after = request.GET.get('after', '')
+    if not after:
+        # Starting point for a client about to load the full lists
+        return Response({'seq': head(), 'reset': True, 'more': False, 'changes': {}})
+    if not after.isdigit():
+        return Response({'error': "'after' must be a sequence number"}, status=400)
+    # Customer phone numbers are for staff only
+    feeds = [feed for feed in FEEDS if feed != 'customers' or request.user.is_staff]
+    return Response(changes_since(int(after), feeds=feeds, request=request))
+
+# ========== Dashboard ==========
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_only
+def dashboard_summary(request):
+    """Counts, low stock, today's appointments and recent sales for the admin dashboard"""
+    # Not @replica_reads: sections are cached by model version, and a
+    # lagging replica would cache stale data under the new version.
+    return Response(summarize_dashboard())
+
+# ========== SMS Delivery Status ==========
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@read_only
+def message_status(request):
+    """Twilio status callback for a sent SMS; buffered and written in bulk"""
+    params = request.POST.dict()
+    # Twilio signs the URL it was given, which behind a proxy is not the one
+    # this request arrived on.
+    url = settings.TWILIO_STATUS_CALLBACK_URL or request.build_absolute_uri()
+    if not validate_callback(url, params, request.META.get('HTTP_X_TWILIO_SIGNATURE', '')):
+        return Response({'error': 'Invalid signature'}, status=status.HTTP_403_FORBIDDEN)
+    sid = params.get('MessageSid', '')
+    delivery_status = params.get('MessageStatus', '')
+    if not valid_sid(sid) or delivery_status not in STATUS_RANKS:
+        return Response({'error': 'Unknown message or status'}, status=status.HTTP_400_BAD_REQUEST)
+    record_callback(sid, delivery_status, params.get('ErrorCode', '')[:10])
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+# ========== Metrics ==========
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@read_only
+def metrics(request):
+    """Counters and timings recorded by this worker process"""
+    return Response(app_metrics.snapshot())
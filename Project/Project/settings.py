@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'App.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'Project.urls'
@@ -84,6 +85,72 @@ DATABASES = {
     }
 }
 
+# Catalog and reporting reads can go to read replicas (App/db_routers.py).
+# Locally, point SQLITE_REPLICA at a second SQLite file, e.g. a copy of
+# db.sqlite3, to try the routing out.
+DATABASE_ROUTERS = ['App.db_routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+if config('SQLITE_REPLICA', default=''):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': config('SQLITE_REPLICA'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+
+# Seconds a client reads from the primary after it writes, so it never sees
+# its own write missing from a lagging replica.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# Closed months of SaleRecord are moved into compressed files here by the
+# archive_sales command (App/archive.py). The current month and the
+# previous SALES_ARCHIVE_KEEP_MONTHS stay in the database.
+SALES_ARCHIVE_DIR = config('SALES_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive', 'sales'))
+SALES_ARCHIVE_KEEP_MONTHS = config('SALES_ARCHIVE_KEEP_MONTHS', default=2, cast=int)
+
+# Change log behind /api/changes/ (App/changelog.py). Cursors only move past
+# a gap in the sequence once it is SETTLE seconds old, which must exceed the
+# longest write transaction. compact_changes collapses entries older than
+# COLLAPSE seconds to the latest per object and drops those older than
+# RETENTION days; clients further behind reload everything.
+CHANGE_LOG_SETTLE_SECONDS = config('CHANGE_LOG_SETTLE_SECONDS', default=10, cast=int)
+CHANGE_LOG_COLLAPSE_SECONDS = config('CHANGE_LOG_COLLAPSE_SECONDS', default=300, cast=int)
+CHANGE_LOG_RETENTION_DAYS = config('CHANGE_LOG_RETENTION_DAYS', default=7, cast=int)
+
+# Admin dashboard summary (App/dashboard.py). Medicines with at most
+# LOW_STOCK_THRESHOLD units, or their own low_stock_threshold, are low on
+# stock. Sections are cached by model
+# version; DASHBOARD_CACHE_SECONDS bounds how stale one can get through
+# writes that bypass the version bumps, such as bulk-created sales.
+LOW_STOCK_THRESHOLD = config('LOW_STOCK_THRESHOLD', default=10, cast=int)
+DASHBOARD_CACHE_SECONDS = config('DASHBOARD_CACHE_SECONDS', default=300, cast=int)
+
+# Read-through cache of Medicine and Doctor rows by primary key
+# (App/object_cache.py): seconds an entry lives in the shared cache, and the
+# per-process tier's size per model and how long it trusts an entry before
+# checking the row's version again (the staleness bound across workers).
+OBJECT_CACHE_SECONDS = config('OBJECT_CACHE_SECONDS', default=3600, cast=int)
+OBJECT_CACHE_LOCAL_SIZE = config('OBJECT_CACHE_LOCAL_SIZE', default=1000, cast=int)
+OBJECT_CACHE_LOCAL_SECONDS = config('OBJECT_CACHE_LOCAL_SECONDS', default=1, cast=float)
+
+# Bulk writes at /api/<medicines|doctors|appointments>/bulk/: items accepted
+# per request, and rows per INSERT/UPDATE statement.
+BULK_MAX_ITEMS = config('BULK_MAX_ITEMS', default=5000, cast=int)
+BULK_BATCH_SIZE = config('BULK_BATCH_SIZE', default=1000, cast=int)
+
+# Low-stock alerts (App/alerts.py): a medicine falling to its threshold is
+# texted to LOW_STOCK_ALERT_PHONE (empty: no alerts), at most one digest
+# per LOW_STOCK_ALERT_SECONDS per worker.
+LOW_STOCK_ALERT_PHONE = config('LOW_STOCK_ALERT_PHONE', default='')
+LOW_STOCK_ALERT_SECONDS = config('LOW_STOCK_ALERT_SECONDS', default=900, cast=int)
+
+# Appointment reminder scheduler (App/reminders.py, the send_reminders
+# command): reminders claimed and sent per batch, SMS requests in flight at
+# once, and the longest sleep between checks for changed appointments.
+REMINDER_BATCH_SIZE = config('REMINDER_BATCH_SIZE', default=200, cast=int)
+REMINDER_CONCURRENCY = config('REMINDER_CONCURRENCY', default=20, cast=int)
+REMINDER_POLL_SECONDS = config('REMINDER_POLL_SECONDS', default=15, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -121,6 +188,11 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# Output of the build_static command (App/static_build.py): minified,
+# content-hashed bundles with .gz/.br siblings, served from
+# STATIC_URL + 'dist/'. Not committed; templates fall back to the source
+# files until it has been built.
+STATIC_BUILD_DIR = os.path.join(BASE_DIR, 'static', 'dist')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -137,4 +209,48 @@ REST_FRAMEWORK = {
 # Twilio Configuration
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
-TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER', default='')
\ No newline at end of file
+TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER', default='')
+# Absolute URL of the status webhook (App/message_status.py), passed with
+# every SMS so Twilio reports delivery, e.g.
+# https://pharmacy.example.com/api/messages/status/. Empty: no callbacks.
+# Callback signatures are checked against this URL, so it has to be the
+# public one even when a proxy terminates TLS or rewrites the host.
+TWILIO_STATUS_CALLBACK_URL = config('TWILIO_STATUS_CALLBACK_URL', default='')
+
+# Serve the native async OTP and booking views (App/async_views.py) on the
+# regular URLs. Only worth it under ASGI; they are always at /api/async/.
+ASYNC_OTP_VIEWS = config('ASYNC_OTP_VIEWS', default=False, cast=bool)
+
+# Rate limits for the OTP endpoints (App/throttling.py), as "count/period"
+# with periods like 30s, 10m, 1h or 1d. Counters live in the default cache.
+OTP_RATE_LIMITS = {
+    'send': '3/10m',        # OTP sends per phone number
+    'send_ip': '20/1h',     # OTP sends per client IP
+    'send_daily': '10/1d',  # OTP sends per phone number per day
+    'verify': '5/10m',      # verify attempts per phone number
+    'verify_ip': '30/1h',   # verify attempts per client IP
+}
+
+# Idempotency-Key handling (App/idempotency.py) for booking, registration
+# and OTP sends. Successful responses are replayed for TTL seconds; a
+# duplicate of an async view waits up to WAIT seconds for the first request
+# (sync views answer 409 at once), whose lock expires after LOCK seconds
+# should its worker die.
+IDEMPOTENCY_TTL = config('IDEMPOTENCY_TTL', default=86400, cast=int)
+IDEMPOTENCY_WAIT_SECONDS = config('IDEMPOTENCY_WAIT_SECONDS', default=10, cast=float)
+IDEMPOTENCY_LOCK_SECONDS = config('IDEMPOTENCY_LOCK_SECONDS', default=60, cast=int)
+
+# SMS delivery status (App/message_status.py). Sends and status callbacks
+# are buffered per worker and written in bulk every FLUSH_MS milliseconds,
+# or as soon as MAX_PENDING are waiting.
+MESSAGE_STATUS_FLUSH_MS = config('MESSAGE_STATUS_FLUSH_MS', default=250, cast=int)
+MESSAGE_STATUS_MAX_PENDING = config('MESSAGE_STATUS_MAX_PENDING', default=2000, cast=int)
+
+# Cold start budget in ms: django.setup() plus loading the URLconf in a fresh
+# interpreter (App/startup.py). Checked by the tests and by
+# ``manage.py startup_profile --budget``.
+STARTUP_BUDGET_MS = config('STARTUP_BUDGET_MS', default=1500, cast=int)
+
+# Medicines per page of the home page's all-medicines table; later pages
+# are fetched as the visitor scrolls (Project/views.catalog_rows).
+HOME_CATALOG_PAGE_SIZE = config('HOME_CATALOG_PAGE_SIZE', default=50, cast=int)
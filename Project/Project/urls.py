@@ -31,25 +31,18 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework.routers import DefaultRouter
-from App.views import *
 from . import views
 
-router = DefaultRouter()
-router.register(r'medicines', MedicineViewSet)
-router.register(r'doctors', DoctorViewSet)
-router.register(r'appointments', AppointmentViewSet)
-router.register(r'sales-feed', RecentSalesViewSet)
-
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include(router.urls)),
-    path('api/send-otp/', send_otp, name='send_otp'),
-    path('api/verify-otp/', verify_otp, name='verify_otp'),
-    path('api/create-appointment/', create_appointment, name='create_appointment'),
+    # The API routes and router live in App/urls.py
+    path('api/', include('App.urls')),
     path('', views.home, name='home'),
+    path('catalog/rows/', views.catalog_rows, name='catalog_rows'),
     path('book-appointment/', views.book_appointment, name='book_appointment'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    # build_static output; the rest of STATIC_URL is left to the web server
+    path(f"{settings.STATIC_URL.lstrip('/')}dist/<str:name>", views.static_asset, name='static_asset'),
 ] 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,31 +1,85 @@
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseBadRequest
 from django.shortcuts import render, redirect
-from django.db.models import Sum
-from App.models import Medicine, Doctor, Appointment, SaleRecord
+from App.models import Medicine, Doctor, Appointment
 from datetime import datetime
+from App.analytics import with_total_sold
+from App.db_routers import replica_reads
+from App.static_build import read_manifest
+from App.transactions import atomic, read_only
+
+# The columns of the all-medicines table
+CATALOG_FIELDS = ('id', 'name', 'description', 'price', 'stock_quantity')
+
+
+def catalog_page(after=0):
+    """
+    The page of the all-medicines table after medicine id ``after``, and the
+    id the next page starts after (None on the last page). Pages are read by
+    id from the primary key index, so any page costs the same however large
+    the catalog grows.
+    """
+    size = settings.HOME_CATALOG_PAGE_SIZE
+    # One extra row tells whether there is a next page
+    medicines = list(Medicine.objects.only(*CATALOG_FIELDS).filter(id__gt=after).order_by('id')[:size + 1])
+    if len(medicines) > size:
+        return medicines[:size], medicines[size - 1].id
+    return medicines, None
 
+
+def _after(request):
+    after = request.GET.get('after', '0')
+    return int(after) if after.isdigit() else None
+
+
+@read_only
+@replica_reads
 def home(request):
     # Get top 5 medicines by sales quantity
-    top_medicines = Medicine.objects.annotate(
-        total_sold=Sum('salerecord__quantity_sold')
-    ).order_by('-total_sold')[:5]
+    # (from the rollups, so archived sales still count)
+    top_medicines = with_total_sold(Medicine.objects.all()).order_by('-total_sold')[:5]
     
     # Get available doctors
     available_doctors = Doctor.objects.filter(is_available=True)
     
+    # Only the first page of the catalog; home.js loads the rest on scroll
+    medicines, next_after = catalog_page(_after(request) or 0)
+
     context = {
-        'medicines': Medicine.objects.all(),
+        'medicines': medicines,
+        'next_after': next_after,
         'top_medicines': top_medicines,
         'doctors': available_doctors,
     }
     return render(request, 'home.html', context)
 
+@read_only
+@replica_reads
+def catalog_rows(request):
+    """
+    The next page of rows for the home page's all-medicines table, after
+    ?after=<medicine id>. The X-Next-After header holds the id to ask for
+    next, empty on the last page.
+    """
+    after = _after(request)
+    if after is None:
+        return HttpResponseBadRequest("'after' must be a medicine id")
+    medicines, next_after = catalog_page(after)
+    response = render(request, 'catalog_rows.html', {'medicines': medicines})
+    response['X-Next-After'] = next_after or ''
+    return response
+
+@atomic
 def book_appointment(request):
     if request.method == 'POST':
         doctor_id = request.POST.get('doctor_id')
         customer_name = request.POST.get('customer_name')
         appointment_date = request.POST.get('appointment_date')
         
-        doctor = Doctor.objects.get(id=doctor_id)
+        doctor = Doctor.objects.get_cached(doctor_id)
         appointment = Appointment(
             doctor=doctor,
             customer_name=customer_name,
@@ -37,6 +91,58 @@ def book_appointment(request):
     doctors = Doctor.objects.filter(is_available=True)
     return render(request, 'book_appointment.html', {'doctors': doctors})
 
+@read_only
 def admin_dashboard(request):
     """Admin dashboard for managing medicines, doctors, and appointments"""
-    return render(request, 'admin_dashboard.html')
\ No newline at end of file
+    return render(request, 'admin_dashboard.html')
+
+
+# Encodings build_static precompresses to, best first
+_PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+_CONTENT_TYPES = {'.js': 'text/javascript; charset=utf-8', '.css': 'text/css; charset=utf-8'}
+
+
+def _accepted_encodings(header):
+    """
+    Codings an Accept-Encoding header allows (q=0 excluded). A q value that
+    does not parse counts as 1, so a malformed header never fails a request.
+    """
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        match = re.search(r'q=([\d.]+)', params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 1.0
+        if coding and quality != 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def static_asset(request, name):
+    """
+    A file of the last build_static run, precompressed if the client
+    accepts it. Its name carries its content hash, so it never changes and
+    browsers may cache it for good.
+    """
+    # Only files the manifest names, which also rules out paths
+    if name not in read_manifest(settings.STATIC_BUILD_DIR).values():
+        raise Http404('Unknown asset')
+    path = os.path.join(settings.STATIC_BUILD_DIR, name)
+    accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding = None
+    for coding, suffix in _PRECOMPRESSED:
+        if coding in accepted and os.path.exists(path + suffix):
+            path, encoding = path + suffix, coding
+            break
+    try:
+        response = FileResponse(open(path, 'rb'), content_type=_CONTENT_TYPES[os.path.splitext(name)[1]])
+    except FileNotFoundError:
+        raise Http404('Unknown asset')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
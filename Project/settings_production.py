@@ -32,17 +32,45 @@ SECURE_HSTS_PRELOAD = True
 # Use PostgreSQL in production
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql plus pool wait/held timings
+        'ENGINE': 'App.db_backends.postgresql',
         'NAME': config('DB_NAME', default='pharmacy_db'),
         'USER': config('DB_USER', default='postgres'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
-        'ATOMIC_REQUESTS': True,  # Each request in a transaction
-        'CONN_MAX_AGE': 600,  # Connection pooling
+        # No ATOMIC_REQUESTS: views declare a policy in App/transactions.py
+        # Connections come from psycopg's pool, so they must not persist.
+        'CONN_MAX_AGE': 0,
+        # Pre-ping each connection as the pool hands it out.
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                # Per worker process; size max_size to the threads or
+                # concurrent async requests a worker serves.
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                # Seconds a request waits for a free connection before failing.
+                'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+                'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+                'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800, cast=float),
+            },
+        },
     }
 }
 
+# Read replicas for catalog and reporting reads (App/db_routers.py): one
+# alias per host in DB_REPLICA_HOSTS, same credentials as the primary.
+DATABASE_REPLICAS = []
+for number, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
 # ========== STATIC AND MEDIA FILES ==========
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -93,18 +121,39 @@ LOGGING = {
             'level': 'ERROR',
             'filters': ['require_debug_false'],
             'class': 'django.utils.log.AdminEmailHandler'
-        }
+        },
+        # Request threads only queue records; a listener thread per queue
+        # writes the file or sends the mail (App/log_queue.py). Mail has its
+        # own queue so a stalled SMTP server cannot hold up the log file.
+        # Records beyond maxsize are dropped and counted. dictConfig only
+        # accepts the 'handlers' and 'queue' keys from Python 3.12 on.
+        'file_queue': {
+            'class': 'App.log_queue.BoundedQueueHandler',
+            'handlers': ['file'],
+            'queue': {'()': 'queue.Queue', 'maxsize': config('LOG_QUEUE_SIZE', default=10000, cast=int)},
+            'respect_handler_level': True,
+        },
+        'mail_queue': {
+            'class': 'App.log_queue.BoundedQueueHandler',
+            'handlers': ['mail_admins'],
+            'queue': {'()': 'queue.Queue', 'maxsize': config('LOG_MAIL_QUEUE_SIZE', default=100, cast=int)},
+            'respect_handler_level': True,
+        },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['console', 'file_queue'],
             'level': 'INFO',
         },
         'django.request': {
-            'handlers': ['mail_admins', 'file'],
+            'handlers': ['mail_queue', 'file_queue'],
             'level': 'ERROR',
             'propagate': False,
         },
+        'App': {
+            'handlers': ['console', 'file_queue'],
+            'level': 'INFO',
+        },
     },
 }
 
@@ -128,10 +177,20 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 
 # ========== CACHE SETTINGS ==========
+# One SQLite file shared by every worker on the host, so rate limits and
+# cached lookups agree between workers and survive restarts.
+CACHE_DIR = config('CACHE_DIR', default=os.path.join(BASE_DIR, 'cache'))
+os.makedirs(CACHE_DIR, exist_ok=True)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'App.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'default.sqlite3'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=100000, cast=int),
+            'EVICTION_INTERVAL': config('CACHE_EVICTION_INTERVAL', default=30, cast=int),
+        },
     }
 }
 
@@ -17,6 +17,10 @@ function setAuthToken(token) {
     isAuthenticated = true;
     localStorage.setItem('adminAuthToken', token);
     updateAuthLink();
+    if (changeSeq === null) {
+        startSync();
+    }
+    loadSummary();
 }
 
 function clearAuthToken() {
@@ -213,44 +217,209 @@ function showNotification(message, type = 'info') {
     }, 3000);
 }
 
-// ========== Medicines Functions ==========
-function searchMedicines() {
-    const searchTerm = document.getElementById('medicineSearch').value.trim();
-    
-    if (!searchTerm) {
-        loadAllMedicines();
-        return;
+// ========== Dashboard Summary ==========
+// Counts and summaries come from /api/dashboard/summary/, which the server
+// computes with aggregate queries and caches; the full lists are only
+// fetched when their tab is opened.
+function loadSummary() {
+    const container = document.getElementById('dashboardSummary');
+    if (!container || !isAuthenticated) {
+        return Promise.resolve();
     }
+    return fetch(`${API_BASE}/dashboard/summary/`, { headers: { 'Authorization': `Token ${authToken}` } })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Summary failed');
+            }
+            return response.json();
+        })
+        .then(displaySummary)
+        .catch(error => console.error('Summary error:', error));
+}
+
+function summaryField(label, value) {
+    return `
+        <div class="field-group">
+            <div class="field-label">${escapeHtml(label)}</div>
+            <div class="field-value">${value}</div>
+        </div>
+    `;
+}
 
-    showLoading('medicinesResults');
+function summaryCard(title, fields) {
+    return `
+        <div class="result-card">
+            <div class="card-header">
+                <h3 class="card-title">${escapeHtml(title)}</h3>
+            </div>
+            <div class="card-content">${fields.join('')}</div>
+        </div>
+    `;
+}
 
-    fetch(`${API_BASE}/medicines/?search=${encodeURIComponent(searchTerm)}`)
+function displaySummary(summary) {
+    const counts = summary.counts;
+    const lowStock = summary.low_stock.items.map(item =>
+        summaryField(item.name, `${item.stock_quantity} left (threshold ${item.threshold})`));
+    const appointments = summary.appointments_today.map(row =>
+        summaryField(`Dr. ${row.doctor}`, `${row.appointments} (${row.verified} verified)`));
+    const sales = summary.recent_sales.latest.map(sale =>
+        summaryField(sale.medicine, `${sale.quantity_sold} at ${new Date(sale.timestamp).toLocaleTimeString()}`));
+
+    document.getElementById('dashboardSummary').innerHTML = [
+        summaryCard('Overview', [
+            summaryField('Medicines', `${counts.medicines.total} (${counts.medicines.out_of_stock} out of stock)`),
+            summaryField('Doctors', `${counts.doctors.total} (${counts.doctors.available} available)`),
+            summaryField('Upcoming appointments', `${counts.appointments.upcoming} (${counts.appointments.unverified} unverified)`),
+            summaryField('Customers', counts.customers.total),
+        ]),
+        summaryCard(`Low Stock (${counts.medicines.low_stock})`,
+            lowStock.length ? lowStock : [summaryField('All stocked', '-')]),
+        summaryCard(`Appointments Today (${summary.date})`,
+            appointments.length ? appointments : [summaryField('None booked', '-')]),
+        summaryCard(`Recent Sales (${summary.recent_sales.today.quantity} units today)`,
+            sales.length ? sales : [summaryField('No sales yet', '-')]),
+    ].join('');
+}
+
+// ========== Local Copy and Incremental Sync ==========
+// Each list is fetched in full once. After that only the changes since
+// changeSeq are fetched from /api/changes/ and applied to the local copy,
+// after every edit or delete and every SYNC_INTERVAL_MS.
+const SYNC_INTERVAL_MS = 15000;
+const store = { medicines: new Map(), doctors: new Map(), appointments: new Map() };
+const loaded = { medicines: false, doctors: false, appointments: false };
+let changeSeq = null;
+let syncInFlight = null;
+let syncTimer = null;
+
+function startSync() {
+    // The cursor is taken before the full loads; changes made in between
+    // are applied again, which is harmless because deltas are current rows.
+    return fetch(`${API_BASE}/changes/`, { headers: { 'Authorization': `Token ${authToken}` } })
         .then(response => response.json())
         .then(data => {
-            displayMedicines(data);
+            changeSeq = data.seq;
+            if (!syncTimer) {
+                syncTimer = setInterval(syncChanges, SYNC_INTERVAL_MS);
+            }
         })
-        .catch(error => {
-            console.error('Error:', error);
-            showNotification('Failed to search medicines', 'error');
-            document.getElementById('medicinesResults').innerHTML = 
-                '<div class="empty-state"><p>Error loading medicines</p></div>';
-        });
+        .catch(error => console.error('Sync error:', error));
 }
 
-function loadAllMedicines() {
-    showLoading('medicinesResults');
-
-    fetch(`${API_BASE}/medicines/`)
+function loadTable(feed) {
+    if (loaded[feed]) {
+        renderTable(feed);
+        return Promise.resolve();
+    }
+    showLoading(`${feed}Results`);
+    return fetch(`${API_BASE}/${feed}/`)
         .then(response => response.json())
+        .then(rows => {
+            store[feed] = new Map(rows.map(row => [String(row.id), row]));
+            loaded[feed] = true;
+            renderTable(feed);
+        });
+}
+
+function syncChanges() {
+    if (changeSeq === null || !isAuthenticated) {
+        return Promise.resolve();
+    }
+    if (syncInFlight) {
+        return syncInFlight;
+    }
+    syncInFlight = fetch(`${API_BASE}/changes/?after=${changeSeq}`, {
+        headers: { 'Authorization': `Token ${authToken}` }
+    })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Sync failed');
+            }
+            return response.json();
+        })
         .then(data => {
-            displayMedicines(data);
+            const advanced = data.seq !== changeSeq;
+            changeSeq = data.seq;
+            if (data.reset) {
+                // Further behind than the server keeps changes: reload
+                Object.keys(loaded).forEach(feed => { loaded[feed] = false; });
+                Object.keys(loaded).filter(isVisible).forEach(feed => loadTable(feed));
+                return false;
+            }
+            applyChanges(data.changes);
+            return data.more && advanced;
         })
         .catch(error => {
-            console.error('Error:', error);
-            showNotification('Failed to load medicines', 'error');
-            document.getElementById('medicinesResults').innerHTML = 
-                '<div class="empty-state"><p>Error loading medicines</p></div>';
+            console.error('Sync error:', error);
+            return false;
+        })
+        .then(more => {
+            syncInFlight = null;
+            return more ? syncChanges() : undefined;
         });
+    return syncInFlight;
+}
+
+function applyChanges(changes) {
+    if (Object.keys(changes).length) {
+        loadSummary();
+    }
+    Object.entries(changes).forEach(([feed, delta]) => {
+        // Lists not loaded yet will get the current rows when they are
+        if (!loaded[feed]) {
+            return;
+        }
+        delta.upserted.forEach(row => store[feed].set(String(row.id), row));
+        delta.deleted.forEach(id => store[feed].delete(String(id)));
+        if (isVisible(feed)) {
+            renderTable(feed);
+        }
+    });
+}
+
+function isVisible(feed) {
+    const tab = document.getElementById(`${feed}-tab`);
+    return !!tab && tab.classList.contains('active');
+}
+
+function filteredRows(feed, inputId, fields) {
+    const input = document.getElementById(inputId);
+    const term = input ? input.value.trim().toLowerCase() : '';
+    const rows = Array.from(store[feed].values());
+    if (!term) {
+        return rows;
+    }
+    return rows.filter(row => fields(row).some(value => String(value || '').toLowerCase().includes(term)));
+}
+
+function renderTable(feed) {
+    if (feed === 'medicines') {
+        displayMedicines(filteredRows(feed, 'medicineSearch', medicine => [medicine.name]));
+    } else if (feed === 'doctors') {
+        displayDoctors(filteredRows(feed, 'doctorSearch', doctor => [doctor.name, doctor.specialty]));
+    } else if (feed === 'appointments') {
+        displayAppointments(filteredRows(feed, 'appointmentSearch', appointment => [appointment.customer_name]));
+    }
+}
+
+function loadFailed(feed, label) {
+    return error => {
+        console.error('Error:', error);
+        showNotification(`Failed to load ${label}`, 'error');
+        document.getElementById(`${feed}Results`).innerHTML =
+            `<div class="empty-state"><p>Error loading ${label}</p></div>`;
+    };
+}
+
+// ========== Medicines Functions ==========
+// Search filters the local copy on the same fields as the API's ?search=
+function searchMedicines() {
+    loadAllMedicines();
+}
+
+function loadAllMedicines() {
+    loadTable('medicines').catch(loadFailed('medicines', 'medicines'));
 }
 
 function displayMedicines(medicines) {
@@ -302,42 +471,11 @@ function displayMedicines(medicines) {
 
 // ========== Doctors Functions ==========
 function searchDoctors() {
-    const searchTerm = document.getElementById('doctorSearch').value.trim();
-
-    if (!searchTerm) {
-        loadAllDoctors();
-        return;
-    }
-
-    showLoading('doctorsResults');
-
-    fetch(`${API_BASE}/doctors/?search=${encodeURIComponent(searchTerm)}`)
-        .then(response => response.json())
-        .then(data => {
-            displayDoctors(data);
-        })
-        .catch(error => {
-            console.error('Error:', error);
-            showNotification('Failed to search doctors', 'error');
-            document.getElementById('doctorsResults').innerHTML = 
-                '<div class="empty-state"><p>Error loading doctors</p></div>';
-        });
+    loadAllDoctors();
 }
 
 function loadAllDoctors() {
-    showLoading('doctorsResults');
-
-    fetch(`${API_BASE}/doctors/`)
-        .then(response => response.json())
-        .then(data => {
-            displayDoctors(data);
-        })
-        .catch(error => {
-            console.error('Error:', error);
-            showNotification('Failed to load doctors', 'error');
-            document.getElementById('doctorsResults').innerHTML = 
-                '<div class="empty-state"><p>Error loading doctors</p></div>';
-        });
+    loadTable('doctors').catch(loadFailed('doctors', 'doctors'));
 }
 
 function displayDoctors(doctors) {
@@ -379,46 +517,11 @@ function displayDoctors(doctors) {
 
 // ========== Appointments Functions ==========
 function searchAppointments() {
-    const searchTerm = document.getElementById('appointmentSearch').value.trim();
-
-    if (!searchTerm) {
-        loadAllAppointments();
-        return;
-    }
-
-    showLoading('appointmentsResults');
-
-    fetch(`${API_BASE}/appointments/`)
-        .then(response => response.json())
-        .then(data => {
-            // Filter appointments by customer name on client side
-            const filtered = data.filter(apt => 
-                apt.customer_name.toLowerCase().includes(searchTerm.toLowerCase())
-            );
-            displayAppointments(filtered);
-        })
-        .catch(error => {
-            console.error('Error:', error);
-            showNotification('Failed to search appointments', 'error');
-            document.getElementById('appointmentsResults').innerHTML = 
-                '<div class="empty-state"><p>Error loading appointments</p></div>';
-        });
+    loadAllAppointments();
 }
 
 function loadAllAppointments() {
-    showLoading('appointmentsResults');
-
-    fetch(`${API_BASE}/appointments/`)
-        .then(response => response.json())
-        .then(data => {
-            displayAppointments(data);
-        })
-        .catch(error => {
-            console.error('Error:', error);
-            showNotification('Failed to load appointments', 'error');
-            document.getElementById('appointmentsResults').innerHTML = 
-                '<div class="empty-state"><p>Error loading appointments</p></div>';
-        });
+    loadTable('appointments').catch(loadFailed('appointments', 'appointments'));
 }
 
 function displayAppointments(appointments) {
@@ -583,14 +686,8 @@ function submitEdit(event) {
         showNotification('Item updated successfully!', 'success');
         closeEditModal();
         
-        // Reload the current tab
-        if (currentEditEndpoint === 'medicines') {
-            loadAllMedicines();
-        } else if (currentEditEndpoint === 'doctors') {
-            loadAllDoctors();
-        } else if (currentEditEndpoint === 'appointments') {
-            loadAllAppointments();
-        }
+        // Pull just the change into the local copy
+        syncChanges();
     })
     .catch(error => {
         console.error('Error:', error);
@@ -642,14 +739,8 @@ function confirmDelete() {
         showNotification('Item deleted successfully!', 'success');
         closeDeleteModal();
         
-        // Reload the current tab
-        if (currentDeleteEndpoint === 'medicines') {
-            loadAllMedicines();
-        } else if (currentDeleteEndpoint === 'doctors') {
-            loadAllDoctors();
-        } else if (currentDeleteEndpoint === 'appointments') {
-            loadAllAppointments();
-        }
+        // Pull just the change into the local copy
+        syncChanges();
     })
     .catch(error => {
         console.error('Error:', error);
@@ -711,6 +802,11 @@ window.addEventListener('load', function() {
     
     // Only load data if authenticated
     if (isAuthenticated) {
-        loadAllMedicines();
+        loadSummary();
+        startSync().then(() => {
+            if (isVisible('medicines')) {
+                loadAllMedicines();
+            }
+        });
     }
 });
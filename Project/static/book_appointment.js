@@ -0,0 +1,298 @@
+// API Base URL
+const API_BASE = "/api";
+let otpResendTimer = null;
+let otpExpiryTimer = null;
+let currentPhoneNumber = "";
+let isPhoneVerified = false;
+
+// ========== Show Notification ==========
+function showNotification(message, type = "success") {
+  const notification = document.getElementById("appointmentNotification");
+  notification.textContent = message;
+  notification.className = `notification ${type} show`;
+
+  setTimeout(() => {
+    notification.classList.remove("show");
+  }, 4000);
+}
+
+// ========== Send OTP ==========
+function sendOTP() {
+  const phoneNumber = document.getElementById("phoneNumber").value.trim();
+
+  if (!phoneNumber) {
+    showNotification("Please enter a phone number", "error");
+    return;
+  }
+
+  if (phoneNumber.replace(/\D/g, "").length < 10) {
+    showNotification(
+      "Please enter a valid phone number (at least 10 digits)",
+      "error",
+    );
+    return;
+  }
+
+  // Store phone number
+  currentPhoneNumber = phoneNumber;
+
+  // Disable send button
+  const sendBtn = event.target;
+  sendBtn.disabled = true;
+  sendBtn.textContent = "Sending...";
+
+  fetch(`${API_BASE}/send-otp/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ phone_number: phoneNumber }),
+  })
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.error) {
+        showNotification(data.error, "error");
+        sendBtn.disabled = false;
+        sendBtn.textContent = "Send OTP";
+      } else {
+        showNotification("OTP sent successfully!", "success");
+
+        // Show OTP section
+        document.getElementById("otpSection").classList.add("show");
+        document.getElementById("phoneDisplay").innerHTML =
+          `📱 OTP sent to: <strong>${phoneNumber}</strong>`;
+        document.getElementById("phoneNumber").disabled = true;
+        sendBtn.style.display = "none";
+
+        // If otp_for_testing is provided, show it (remove in production)
+        if (data.otp_for_testing) {
+          console.log(`🧪 Testing OTP: ${data.otp_for_testing}`);
+        }
+
+        // Start resend timer
+        startResendTimer();
+        startOTPExpiryTimer();
+      }
+    })
+    .catch((error) => {
+      console.error("Error:", error);
+      showNotification("Failed to send OTP", "error");
+      sendBtn.disabled = false;
+      sendBtn.textContent = "Send OTP";
+    });
+}
+
+// ========== Verify OTP ==========
+function verifyOTP() {
+  const otpCode = document.getElementById("otpCode").value.trim();
+
+  if (!otpCode || otpCode.length !== 6) {
+    showNotification("Please enter a 6-digit OTP", "error");
+    return;
+  }
+
+  const verifyBtn = event.target;
+  verifyBtn.disabled = true;
+  verifyBtn.textContent = "Verifying...";
+
+  fetch(`${API_BASE}/verify-otp/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      phone_number: currentPhoneNumber,
+      otp_code: otpCode,
+    }),
+  })
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.error) {
+        showNotification(data.error, "error");
+        verifyBtn.disabled = false;
+        verifyBtn.textContent = "Verify";
+      } else {
+        showNotification(
+          "Phone number verified successfully!",
+          "success",
+        );
+        isPhoneVerified = true;
+
+        // Hide OTP section
+        document.getElementById("otpSection").classList.remove("show");
+        document.getElementById(
+          "phoneVerificationSection",
+        ).style.display = "none";
+
+        // Show appointment form
+        document
+          .getElementById("appointmentFormSection")
+          .classList.add("show");
+
+        // Load doctors
+        loadDoctors();
+
+        // Clear timers
+        clearInterval(otpResendTimer);
+        clearInterval(otpExpiryTimer);
+      }
+    })
+    .catch((error) => {
+      console.error("Error:", error);
+      showNotification("Failed to verify OTP", "error");
+      verifyBtn.disabled = false;
+      verifyBtn.textContent = "Verify";
+    });
+}
+
+// ========== Start Resend Timer ==========
+function startResendTimer() {
+  let seconds = 30;
+  const resendBtn = document.getElementById("resendBtn");
+  resendBtn.disabled = true;
+
+  otpResendTimer = setInterval(() => {
+    seconds--;
+    resendBtn.textContent = `Resend OTP (${seconds}s)`;
+
+    if (seconds <= 0) {
+      clearInterval(otpResendTimer);
+      resendBtn.disabled = false;
+      resendBtn.textContent = "Resend OTP";
+    }
+  }, 1000);
+}
+
+// ========== Start OTP Expiry Timer ==========
+function startOTPExpiryTimer() {
+  let minutes = 10;
+  let seconds = 0;
+  const timerDiv = document.getElementById("otpTimer");
+
+  otpExpiryTimer = setInterval(() => {
+    if (seconds === 0) {
+      if (minutes === 0) {
+        clearInterval(otpExpiryTimer);
+        timerDiv.textContent = "OTP Expired - Request a new OTP";
+        timerDiv.classList.add("expired");
+        document.getElementById("otpCode").disabled = true;
+        document.querySelector(".btn-verify-otp").disabled = true;
+        return;
+      }
+      minutes--;
+      seconds = 59;
+    } else {
+      seconds--;
+    }
+
+    timerDiv.textContent = `Expires in: ${minutes}:${String(seconds).padStart(2, "0")}`;
+  }, 1000);
+}
+
+// ========== Load Doctors ==========
+function loadDoctors() {
+  fetch(`${API_BASE}/doctors/`)
+    .then((response) => response.json())
+    .then((data) => {
+      const select = document.getElementById("doctor");
+      select.innerHTML =
+        '<option value="">-- Choose a Doctor --</option>';
+
+      data.forEach((doctor) => {
+        const option = document.createElement("option");
+        option.value = doctor.id;
+        option.textContent = `Dr. ${doctor.name} (${doctor.specialty})`;
+        select.appendChild(option);
+      });
+
+      // Select doctor if provided in URL
+      const urlParams = new URLSearchParams(window.location.search);
+      const doctorId = urlParams.get("doctor_id");
+      if (doctorId) {
+        select.value = doctorId;
+      }
+    })
+    .catch((error) => {
+      console.error("Error loading doctors:", error);
+      showNotification("Failed to load doctors", "error");
+    });
+}
+
+// ========== Submit Appointment ==========
+function submitAppointment(event) {
+  event.preventDefault();
+
+  if (!isPhoneVerified) {
+    showNotification("Please verify your phone number first", "error");
+    return;
+  }
+
+  const formData = {
+    phone_number: currentPhoneNumber,
+    customer_name: document.getElementById("name").value,
+    doctor: document.getElementById("doctor").value,
+    date: document.getElementById("date").value,
+  };
+
+  const submitBtn = event.target.querySelector('button[type="submit"]');
+  submitBtn.disabled = true;
+  submitBtn.textContent = "Booking...";
+
+  fetch(`${API_BASE}/create-appointment/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify(formData),
+  })
+    .then((response) => response.json())
+    .then((data) => {
+      if (data.error) {
+        showNotification(data.error, "error");
+      } else {
+        showNotification(
+          "Appointment booked successfully! Your Appointment ID: " +
+            data.appointment.id,
+          "success",
+        );
+        setTimeout(() => {
+          window.location.href = "/";
+        }, 3000);
+      }
+      submitBtn.disabled = false;
+      submitBtn.textContent = "Confirm Appointment";
+    })
+    .catch((error) => {
+      console.error("Error:", error);
+      showNotification("Failed to book appointment", "error");
+      submitBtn.disabled = false;
+      submitBtn.textContent = "Confirm Appointment";
+    });
+}
+
+// ========== Set Minimum Date for Appointment ==========
+document.addEventListener("DOMContentLoaded", function () {
+  // Prefill phone number if provided in URL
+  const urlParams = new URLSearchParams(window.location.search);
+  const phone = urlParams.get("phone");
+  if (phone) {
+    document.getElementById("phoneNumber").value = phone;
+  }
+
+  // Load doctors on page load (only if phone is already verified, but for now load anyway)
+  loadDoctors();
+
+  const appointmentInput = document.getElementById("date");
+
+  // Set minimum date to today + 1 hour
+  const now = new Date();
+  now.setHours(now.getHours() + 1);
+
+  const year = now.getFullYear();
+  const month = String(now.getMonth() + 1).padStart(2, "0");
+  const day = String(now.getDate()).padStart(2, "0");
+  const hours = String(now.getHours()).padStart(2, "0");
+  const minutes = String(now.getMinutes()).padStart(2, "0");
+
+  appointmentInput.min = `${year}-${month}-${day}T${hours}:${minutes}`;
+});
@@ -0,0 +1,59 @@
+function proceedWithPhone() {
+  const phone = document.getElementById("modalPhone").value.trim();
+  if (!phone) {
+    alert("Please enter a phone number");
+    return;
+  }
+  if (phone.replace(/\D/g, "").length < 10) {
+    alert("Please enter a valid phone number (at least 10 digits)");
+    return;
+  }
+  const doctorId = document.getElementById("doctorId").value;
+  const doctorName = document.getElementById("doctorName").value;
+  const params = new URLSearchParams({
+    phone: phone,
+    doctor_id: doctorId,
+    doctor_name: doctorName,
+  });
+  window.location.href = `/book-appointment/?${params.toString()}`;
+}
+
+// ========== All Medicines: load later pages on scroll ==========
+document.addEventListener("DOMContentLoaded", function () {
+  const more = document.querySelector(".catalog-more");
+  if (!more) return;
+  const rows = document.querySelector(".medicines-table tbody");
+  let loading = false;
+
+  async function loadMore() {
+    if (loading || !more.dataset.after) return;
+    loading = true;
+    try {
+      const response = await fetch(`${more.dataset.rowsUrl}?after=${more.dataset.after}`);
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      rows.insertAdjacentHTML("beforeend", await response.text());
+      more.dataset.after = response.headers.get("X-Next-After") || "";
+      if (!more.dataset.after) {
+        observer.disconnect();
+        more.remove();
+      } else {
+        // Observing afresh reports the link again if it is still in view
+        observer.unobserve(more);
+        observer.observe(more);
+      }
+    } catch (error) {
+      console.error("Could not load more medicines:", error);
+    } finally {
+      loading = false;
+    }
+  }
+
+  const observer = new IntersectionObserver(function (entries) {
+    if (entries.some((entry) => entry.isIntersecting)) loadMore();
+  }, { rootMargin: "400px" });
+  observer.observe(more);
+  more.addEventListener("click", function (e) {
+    e.preventDefault();
+    loadMore();
+  });
+});